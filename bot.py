@@ -32,6 +32,8 @@ from core.games.mapgame_cog import MapGameCog
 from core.games.flaggame_cog import FlagGameCog
 from core.games.redgreen_cog import RedGreenCog
 from core.utilities.cog import UtilitiesCog
+from core.utilities.respcache import response_cache
+from core.utilities.sessions import sessions as http_sessions
 
 logging.basicConfig(level=logging.INFO)
 
@@ -203,4 +205,7 @@ async def run() -> None:
     try:
         await bot.start(settings.token)
     finally:
+        # drain the pooled provider connections before the loop goes away
+        await http_sessions.close()
+        response_cache.close()
         await db_manager.close()
\ No newline at end of file
@@ -3,6 +3,10 @@ from __future__ import annotations
 
 import io
 import json
+import os
+import time
+import shutil
+import tempfile
 
 import discord
 from discord.ext import commands
@@ -82,7 +86,8 @@ class AdminCog(commands.Cog):
                 f"`{p}admin givesob @user <n>` *(gs)* — add/remove sobs\n"
                 f"`{p}admin givetoken @user [n]` *(gt)* — grant a snitch token\n"
                 f"`{p}admin reset @user` — wipe a user's sobs here\n"
-                f"`{p}admin recount` — rebuild totals from raw reactions"
+                f"`{p}admin recount` — rebuild totals from raw reactions\n"
+                f"`{p}admin rollup` — rebuild the ledger totals behind stats cards"
             ),
             inline=False,
         )
@@ -217,6 +222,34 @@ class AdminCog(commands.Cog):
             e.set_footer(text=f"Showing 25 of {len(rows)}")
         await ctx.reply(embed=e)
 
+    @admin_group.command(name="providers", aliases=["health"])
+    async def admin_providers(self, ctx: commands.Context):
+        """Health of the Utilities providers: circuit state, errors, latency."""
+        if not await self._require_owner(ctx):
+            return
+        from core.utilities.health import health
+        snap = health.snapshot()
+        if not snap:
+            await ctx.reply(embed=_embed("🩺 Providers", "No provider calls since startup."))
+            return
+        icon = {"closed": "🟢", "half-open": "🟡", "open": "🔴"}
+        lines = []
+        for name, h in snap.items():
+            lat = (f"p50 {h['p50_ms']:.0f}ms · p95 {h['p95_ms']:.0f}ms"
+                   if h["p50_ms"] is not None else "no timings")
+            line = (f"{icon.get(h['state'], '⚪')} **{name}** — {h['calls']} calls, "
+                    f"{h['errors']} errors · {lat}")
+            if h["state"] == "open":
+                line += f" · retry in {h['retry_after']:.0f}s"
+            if h["rejected"]:
+                line += f" · {h['rejected']} failed fast"
+            if h["last_error"]:
+                line += f"\n  last error: `{h['last_error']}`"
+            lines.append(line)
+        e = _embed("🩺 Providers", "\n".join(lines)[:4000])
+        e.set_footer(text="🟢 closed · 🟡 probing · 🔴 open (failing fast)")
+        await ctx.reply(embed=e)
+
     # ======================================================================
     # data ops
     # ======================================================================
@@ -277,6 +310,20 @@ class AdminCog(commands.Cog):
         e.add_field(name="Reactions scanned", value=f"`{summary['events_scanned']}`", inline=True)
         await ctx.reply(embed=e)
 
+    @admin_group.command(name="rollup")
+    async def admin_rollup(self, ctx: commands.Context):
+        if ctx.guild is None:
+            await ctx.reply(embed=_err("Run this in a server."))
+            return
+        if not await self._require(ctx, "manageconfig"): return
+        from core import ledger as _ledger
+        db = await self.db_manager.get()
+        async with db.transaction() as conn:
+            rows = await _ledger.rebuild_rollup(conn, ctx.guild.id)
+        e = _ok("Ledger rollup rebuilt", "Recomputed the earned/spent totals behind `!sob stats` from the ledger.")
+        e.add_field(name="Rollup rows", value=f"`{rows}`", inline=True)
+        await ctx.reply(embed=e)
+
     # ======================================================================
     # settings
     # ======================================================================
@@ -934,6 +981,7 @@ class AdminCog(commands.Cog):
         gid, uid = ctx.guild.id, member.id
         db = await self.db_manager.get()
         import time as _t
+        from core import ledger as _ledger
         now = int(_t.time())
         flags = []
 
@@ -946,9 +994,11 @@ class AdminCog(commands.Cog):
 
         # rapid reaction add/remove toggles (mint attempts) from the ledger
         adds = await _safe1("SELECT COUNT(*) FROM economy_ledger WHERE guild_id=? AND subject_id=? "
-                            "AND event_type='sob_reaction_added' AND created_at>=?", (gid, uid, now - 3600))
+                            "AND event_id=? AND created_at>=?",
+                            (gid, uid, _ledger.event_code(_ledger.EVT_REACTION_ADD), now - 3600))
         rems = await _safe1("SELECT COUNT(*) FROM economy_ledger WHERE guild_id=? AND subject_id=? "
-                            "AND event_type='sob_reaction_removed' AND created_at>=?", (gid, uid, now - 3600))
+                            "AND event_id=? AND created_at>=?",
+                            (gid, uid, _ledger.event_code(_ledger.EVT_REACTION_REMOVE), now - 3600))
         if rems > 10 and adds > 0 and rems >= adds * 0.5:
             flags.append(f"⚠️ {rems} reaction removals vs {adds} adds in 1h — toggle/mint probing")
 
@@ -980,7 +1030,6 @@ class AdminCog(commands.Cog):
             pass
 
         # reconciliation mismatch is itself suspicious
-        from core import ledger as _ledger
         stats = await self.repo.get_user_stats(gid, uid)
         recon = await _ledger.reconcile_user(db, gid, uid, int(stats["sobs_alltime"]))
         if not recon["reconciled"]:
@@ -1123,16 +1172,18 @@ class AdminCog(commands.Cog):
             await ctx.reply(embed=_err("Provide a guild_id (or run this in a server)."))
             return
         db = await self.db_manager.get()
-        payload = await transfer.export_guild(db, gid)
-        total = sum(len(v) for v in payload["tables"].values())
-        if total == 0:
-            await ctx.reply(embed=_err(f"No data found for guild `{gid}`."))
-            return
-        buf = io.BytesIO(json.dumps(payload, ensure_ascii=False, indent=2).encode("utf-8"))
-        file = discord.File(buf, filename=f"ignio_export_{gid}.json")
-        counts = "\n".join(f"`{t}` — {len(v)}" for t, v in payload["tables"].items())
-        e = _embed("📦 Export ready", f"Guild `{gid}`\n{counts}")
-        await ctx.reply(embed=e, file=file)
+        tmp = tempfile.mkdtemp(prefix="ignio_export_")
+        path = os.path.join(tmp, f"ignio_export_{gid}.ndjson.gz")
+        try:
+            counts = await transfer.export_guild_to_file(db, gid, path)
+            if sum(counts.values()) == 0:
+                await ctx.reply(embed=_err(f"No data found for guild `{gid}`."))
+                return
+            lines = "\n".join(f"`{t}` — {n}" for t, n in counts.items())
+            e = _embed("📦 Export ready", f"Guild `{gid}`\n{lines}")
+            await ctx.reply(embed=e, file=discord.File(path, filename=os.path.basename(path)))
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
 
     @admin_group.command(name="import")
     async def admin_import(self, ctx: commands.Context, mode: str = "merge", target_guild_id: int | None = None):
@@ -1142,20 +1193,37 @@ class AdminCog(commands.Cog):
             await ctx.reply(embed=_err("Mode must be `merge` or `replace`."))
             return
         if not ctx.message.attachments:
-            await ctx.reply(embed=_err("Attach the exported `.json` file to your message."))
-            return
-        raw = await ctx.message.attachments[0].read()
-        try:
-            payload = json.loads(raw.decode("utf-8"))
-        except Exception as exc:
-            await ctx.reply(embed=_err(f"Couldn't parse file: {exc}"))
+            await ctx.reply(embed=_err("Attach the exported `.ndjson.gz` (or older `.json`) file to your message."))
             return
         db = await self.db_manager.get()
+        tmp = tempfile.mkdtemp(prefix="ignio_import_")
+        path = os.path.join(tmp, "import")
+        status = await ctx.reply(embed=_embed("📥 Importing…", "Reading the file."))
+        last_edit = 0.0
+
+        async def _progress(table: str, done: int):
+            nonlocal last_edit
+            if time.monotonic() - last_edit < 3:
+                return
+            last_edit = time.monotonic()
+            try:
+                await status.edit(embed=_embed("📥 Importing…", f"`{table}` — {done:,} rows"))
+            except discord.HTTPException:
+                pass
+
         try:
-            inserted = await transfer.import_guild(db, payload, mode=mode, target_guild_id=target_guild_id)
+            await ctx.message.attachments[0].save(path)
+            inserted = await transfer.import_guild_from_file(
+                db, path, mode=mode, target_guild_id=target_guild_id, progress=_progress)
         except Exception as exc:
-            await ctx.reply(embed=_err(f"Import failed (no changes committed): {exc}"))
-            return
-        gid = target_guild_id or payload.get("guild_id")
+            wiped = ("\n⚠️ `replace` mode had already wiped this server's old rows for the "
+                     "tables it reached — they are not restored." if mode == "replace" else "")
+            await status.edit(embed=_err(
+                f"Import stopped: {exc}\nRows committed before the error are kept — "
+                f"re-run with `merge` to finish.{wiped}"))
+            return
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        into = f" into `{target_guild_id}`" if target_guild_id else ""
         counts = "\n".join(f"`{t}` — +{n}" for t, n in inserted.items())
-        await ctx.reply(embed=_ok(f"Imported into `{gid}` [{mode}]", counts))
\ No newline at end of file
+        await status.edit(embed=_ok(f"Imported{into} [{mode}]", counts))
\ No newline at end of file
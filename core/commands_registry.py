@@ -55,7 +55,7 @@ COMMANDS = [
     {"name": "rate", "cat": "economy", "desc": "Show this server's sob⇄$ rate", "usage": "rate"},
     {"name": "value", "cat": "economy", "desc": "What some sobs are worth in $", "usage": "value <sobs>"},
     {"name": "worth", "cat": "economy", "desc": "How many sobs a $ amount is", "usage": "worth <$>"},
-    {"name": "economy", "cat": "economy", "desc": "Economy health card", "usage": "economy"},
+    {"name": "economy", "cat": "economy", "desc": "Economy health card", "usage": "economy [1d|7d|30d|1y|all]"},
     {"name": "rate set", "cat": "economy", "desc": "Set the exchange rate", "usage": "rate set <sobs>", "admin": True},
     {"name": "tax", "cat": "economy", "desc": "Show/set the shop tax (feeds the treasury)", "usage": "tax [percent|auto]", "admin": True},
     {"name": "treasury", "cat": "economy", "desc": "Server tax pot + stats", "usage": "treasury", "admin": True},
@@ -69,12 +69,14 @@ COMMANDS = [
     {"name": "admin givetoken", "cat": "admin", "desc": "Give snitch tokens", "usage": "admin givetoken @user <n>", "admin": True},
     {"name": "admin reset", "cat": "admin", "desc": "Reset a user's sobs", "usage": "admin reset @user", "admin": True},
     {"name": "admin recount", "cat": "admin", "desc": "Recount all sobs", "usage": "admin recount", "admin": True},
+    {"name": "admin rollup", "cat": "admin", "desc": "Rebuild the ledger totals behind !sob stats", "usage": "admin rollup", "admin": True},
     {"name": "admin threshold", "cat": "admin", "desc": "Set sobs-per-token", "usage": "admin threshold <n>", "admin": True},
     {"name": "admin emoji", "cat": "admin", "desc": "Manage accepted sob emojis", "usage": "admin emoji list|add|remove", "admin": True},
     {"name": "admin whoami", "cat": "admin", "desc": "Show your admin/owner status & perms", "usage": "admin whoami", "admin": True},
     {"name": "admin config", "cat": "admin", "desc": "This server's full sob config", "usage": "admin config", "admin": True},
     {"name": "admin stats", "cat": "admin", "desc": "Bot-wide stats (owner)", "usage": "admin stats", "owner": True},
     {"name": "admin servers", "cat": "admin", "desc": "List servers the bot is in (owner)", "usage": "admin servers", "owner": True},
+    {"name": "admin providers", "cat": "admin", "desc": "Utilities provider health: circuits, errors, latency (owner)", "usage": "admin providers", "owner": True},
 
     # ---- Admin: economy controls (disable / limit) ----
     {"name": "admin freeze", "cat": "admin", "desc": "Emergency: pause ALL earning/economy server-wide", "usage": "admin freeze on|off", "admin": True},
@@ -4,6 +4,7 @@ from __future__ import annotations
 import asyncio
 from contextlib import asynccontextmanager
 from pathlib import Path
+from urllib.parse import quote
 
 import aiosqlite
 
@@ -231,6 +232,33 @@ class Database:
             else:
                 await conn.commit()
 
+    @asynccontextmanager
+    async def snapshot(self):
+        """A consistent, read-only view of the database for long reads.
+
+        Opens a second, read-only connection and holds one read transaction on
+        it, so every query sees the same snapshot no matter what commits on the
+        shared connection in the meantime (WAL lets writers carry on). Yields a
+        ``Database`` with the usual query helpers; it's closed on exit.
+        """
+        self._require_conn()
+        uri = "file:" + quote(str(Path(self.db_path).resolve())) + "?mode=ro"
+        conn = await aiosqlite.connect(uri, uri=True, isolation_level=None)
+        conn.row_factory = aiosqlite.Row
+        view = Database(self.db_path)
+        view.conn = conn
+        try:
+            await conn.execute("BEGIN")
+            # a deferred transaction takes its snapshot at the first read
+            await view.fetchone("SELECT 1 FROM sqlite_master LIMIT 1")
+            yield view
+        finally:
+            try:
+                await conn.rollback()
+            except Exception:
+                pass
+            await conn.close()
+
     async def close(self) -> None:
         if self.conn is not None:
             await self.conn.close()
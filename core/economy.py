@@ -2,7 +2,10 @@
 """
 Economy helpers: per-server exchange rate, rate recommendation, daily supply
 snapshots, and inflation signal. All settings live in guild_settings (no
-migration); snapshots use the economy_snapshots table (migration 204).
+migration); snapshots use the economy_snapshots table (migration 204, keyed by
+integer slot since 220) and are downsampled as they age. Money supply comes
+from the trigger-maintained economy_counters row (migration 218), so supply
+reads are O(1) regardless of guild size.
 """
 from __future__ import annotations
 
@@ -16,6 +19,7 @@ TAX_KEY = "economy:tax_pct"
 BURNED_KEY = "economy:total_burned"
 TREASURY_KEY = "economy:treasury"
 REF_KEY = "economy:ref_cached"
+LAST_REBALANCE_KEY = "economy:last_rebalance"
 
 DEFAULT_TAX_PCT = 30        # % of a built-in purchase that is burned
 
@@ -31,6 +35,19 @@ ITEM_TIERS = {
     "lockpick": 0.01, "safelock": 0.02,
 }
 REF_FLOOR = 50              # reference never below this (new-server safety)
+REF_PERCENTILE = 0.65       # reference = this percentile of active (>=10) balances
+# Up to this many balances a percentile is read exactly (index scan + OFFSET);
+# beyond it the trigger-maintained balance_histogram answers instead (<=10% bucket
+# width, interpolated), so big guilds never walk their whole sob_users index.
+HISTOGRAM_MIN_PLAYERS = 2000
+
+# supply snapshot retention: raw half-hour points for 2 days, then one point
+# per hour until 30 days old, then one per day (Economy.compact_snapshots)
+SNAPSHOT_SECONDS = 1800
+HOURLY_AFTER = 2 * 86400
+DAILY_AFTER = 30 * 86400
+# graph buckets supply_series may pick from, finest first
+SERIES_STEPS = (1800, 3600, 3 * 3600, 6 * 3600, 86400, 7 * 86400)
 
 # --- Earning formulas (tuned against real /plat data, economy stays ~flat) ---
 SOB_VALUE_PCT = 0.035      # a sob reaction is worth ~3.5% of reference...
@@ -58,6 +75,76 @@ def _today() -> str:
     return datetime.now(timezone.utc).strftime("%Y-%m-%d")
 
 
+# ---- pure pricing / tuning rules (shared with core.economy_sim) ----
+
+def tier_price(ref: int, tier: float) -> int:
+    """Price of an item at `tier` x reference: exact under 20, else rounded to 10."""
+    raw = ref * tier
+    if raw < 20:
+        return max(1, int(round(raw)))
+    return max(10, int(round(raw / 10) * 10))
+
+
+def inflation_status(pct: float) -> str:
+    """green / yellow / red for a recent supply growth of `pct` percent."""
+    if pct <= 3:
+        return "green"
+    if pct <= 12:
+        return "yellow"
+    return "red"
+
+
+def multiplier_for(ref: int, active: int, status: str) -> float:
+    """The auto sob multiplier (see Economy.suggest_multiplier)."""
+    # New, small server -> boost to get the economy moving.
+    if active < 15:
+        if ref < 100:
+            return 3.0
+        if ref < 300:
+            return 2.0
+    elif active < 40:
+        # small-but-growing: a gentle nudge at most
+        if ref < 100:
+            return 1.5
+
+    # Established server: keep reactions sane and let inflation control it.
+    if status == "red":
+        return 0.5
+    if status == "yellow":
+        return 0.75
+    return 1.0
+
+
+def tax_for(ref: int, status: str) -> int:
+    """The auto shop tax % (see Economy.suggest_tax)."""
+    if ref < 100:
+        base = 5
+    elif ref < 500:
+        base = 10
+    else:
+        base = 15
+    if status == "red":
+        base += 10
+    elif status == "yellow":
+        base += 5
+    return min(base, 30)
+
+
+def bucket_of(balance: int) -> int:
+    """balance_histogram bucket (see migration 219): digits*100 + first two digits."""
+    s = str(int(balance))
+    return len(s) * 100 + int(s[:2])
+
+
+def bucket_bounds(bucket: int) -> tuple[int, int]:
+    """[lo, hi) balance range covered by a histogram bucket."""
+    digits, lead = divmod(int(bucket), 100)
+    if digits <= 1:
+        return lead, lead + 1
+    scale = 10 ** (digits - 2)
+    return lead * scale, (lead + 1) * scale
+
+
 class Economy:
     def __init__(self, sob_repo):
         self.repo = sob_repo
@@ -88,15 +175,83 @@ class Economy:
     async def _db(self):
         return await self.repo._db()
 
+    async def _counters(self, guild_id: int):
+        db = await self._db()
+        return await db.fetchone(
+            "SELECT total_supply, players, active_players FROM economy_counters "
+            "WHERE guild_id = ?", (guild_id,))
+
     async def total_supply(self, guild_id: int) -> tuple[int, int]:
         """(total sobs in circulation, number of players with >0)."""
+        row = await self._counters(guild_id)
+        if row is None:
+            return 0, 0     # no sob_users rows for this guild yet
+        return int(row["total_supply"]), int(row["players"])
+
+    async def verify_counters(self, guild_id: int | None = None, *,
+                              repair: bool = True) -> list[dict]:
+        """Re-derive economy_counters and balance_histogram from sob_users and
+        report (and by default fix) any guild whose running counters drifted.
+        One GROUP BY per table for all guilds (or one guild). Returns the
+        mismatches found."""
         db = await self._db()
-        row = await db.fetchone(
-            "SELECT COALESCE(SUM(sobs_received_alltime),0) AS s, "
-            "COUNT(*) AS c FROM sob_users WHERE guild_id = ? AND sobs_received_alltime > 0",
-            (guild_id,),
-        )
-        return int(row["s"]), int(row["c"])
+        params = (guild_id,) if guild_id is not None else ()
+        where = "WHERE guild_id = ?" if params else ""
+        and_gid = "AND guild_id = ?" if params else ""
+        bad = []
+        # inside one write transaction so no balance moves between the two reads
+        async with db.transaction() as conn:
+            cur = await conn.execute(
+                "SELECT guild_id, "
+                "COALESCE(SUM(CASE WHEN sobs_received_alltime > 0 THEN sobs_received_alltime ELSE 0 END),0) AS s, "
+                "COALESCE(SUM(sobs_received_alltime > 0),0) AS p, "
+                "COALESCE(SUM(sobs_received_alltime >= 10),0) AS a "
+                f"FROM sob_users {where} GROUP BY guild_id", params)
+            want = {int(r["guild_id"]): (int(r["s"]), int(r["p"]), int(r["a"]))
+                    for r in await cur.fetchall()}
+            await cur.close()
+            cur = await conn.execute(
+                f"SELECT guild_id, total_supply, players, active_players FROM economy_counters {where}",
+                params)
+            have = {int(r["guild_id"]): (int(r["total_supply"]), int(r["players"]),
+                                         int(r["active_players"])) for r in await cur.fetchall()}
+            await cur.close()
+            for gid in sorted(set(have) | set(want)):
+                w = want.get(gid, (0, 0, 0))
+                h = have.get(gid, (0, 0, 0))
+                if w != h:
+                    bad.append({"guild_id": gid, "expected": w, "stored": h})
+            if bad and repair:
+                await conn.executemany(
+                    "INSERT OR REPLACE INTO economy_counters "
+                    "(guild_id, total_supply, players, active_players) VALUES (?,?,?,?)",
+                    [(m["guild_id"], *m["expected"]) for m in bad])
+
+            cur = await conn.execute(
+                "SELECT guild_id, length(sobs_received_alltime) * 100 "
+                "+ CAST(substr(sobs_received_alltime, 1, 2) AS INTEGER) AS b, COUNT(*) AS n "
+                f"FROM sob_users WHERE sobs_received_alltime > 0 {and_gid} GROUP BY 1, 2", params)
+            want_h: dict[int, dict] = {}
+            for r in await cur.fetchall():
+                want_h.setdefault(int(r["guild_id"]), {})[int(r["b"])] = int(r["n"])
+            await cur.close()
+            cur = await conn.execute(
+                f"SELECT guild_id, bucket, n FROM balance_histogram WHERE n != 0 {and_gid}", params)
+            have_h: dict[int, dict] = {}
+            for r in await cur.fetchall():
+                have_h.setdefault(int(r["guild_id"]), {})[int(r["bucket"])] = int(r["n"])
+            await cur.close()
+            drifted = [g for g in sorted(set(want_h) | set(have_h))
+                       if want_h.get(g, {}) != have_h.get(g, {})]
+            for gid in drifted:
+                bad.append({"guild_id": gid, "histogram": True})
+            if drifted and repair:
+                await conn.executemany("DELETE FROM balance_histogram WHERE guild_id = ?",
+                                       [(g,) for g in drifted])
+                await conn.executemany(
+                    "INSERT INTO balance_histogram (guild_id, bucket, n) VALUES (?,?,?)",
+                    [(g, b, n) for g in drifted for b, n in want_h.get(g, {}).items()])
+        return bad
 
     # ---- auto-balance: reference, prices, multiplier, tax -----------------
 
@@ -125,40 +280,81 @@ class Economy:
         actually hold sobs) so reactions and snitch rewards stay meaningful and
         the leaderboard doesn't stagnate.
         """
-        db = await self._db()
-        rows = await db.fetchall(
-            "SELECT sobs_received_alltime AS s FROM sob_users "
-            "WHERE guild_id = ? AND sobs_received_alltime >= 10 "
-            "ORDER BY sobs_received_alltime",
-            (guild_id,),
-        )
-        vals = [int(r["s"]) for r in rows]
-        if not vals:
-            ref = REF_FLOOR
-        else:
-            idx = min(len(vals) - 1, int(len(vals) * 0.65))
-            ref = max(REF_FLOOR, int(vals[idx]))
+        v = await self.balance_percentile(guild_id, REF_PERCENTILE, min_balance=10)
+        ref = REF_FLOOR if v is None else max(REF_FLOOR, v)
         await self.repo.set_guild_setting(guild_id, REF_KEY, str(ref))
         return ref
 
+    # ---- balance distribution ----------------------------------------------
+
+    async def balance_percentile(self, guild_id: int, q: float,
+                                 min_balance: int = 10) -> int | None:
+        """The q-th percentile (0..1) of balances >= min_balance, or None if
+        nobody qualifies. Same rank rule as a sorted list: index int(n*q)."""
+        row = await self._counters(guild_id)
+        if min_balance == 10:
+            n = int(row["active_players"]) if row else 0
+        elif min_balance == 1:
+            n = int(row["players"]) if row else 0
+        else:
+            db = await self._db()
+            c = await db.fetchone(
+                "SELECT COUNT(*) AS n FROM sob_users WHERE guild_id=? AND sobs_received_alltime >= ?",
+                (guild_id, min_balance))
+            n = int(c["n"])
+        if n <= 0:
+            return None
+        if n > HISTOGRAM_MIN_PLAYERS:
+            v = await self.histogram_percentile(guild_id, q, min_balance=min_balance)
+            if v is not None:
+                return v
+        # exact: walk the (guild_id, balance) index to the rank, fetch one value
+        db = await self._db()
+        r = await db.fetchone(
+            "SELECT sobs_received_alltime AS s FROM sob_users "
+            "WHERE guild_id = ? AND sobs_received_alltime >= ? "
+            "ORDER BY sobs_received_alltime LIMIT 1 OFFSET ?",
+            (guild_id, min_balance, min(n - 1, int(n * q))))
+        return int(r["s"]) if r else None
+
+    async def histogram_percentile(self, guild_id: int, q: float,
+                                   min_balance: int = 1) -> int | None:
+        """Approximate percentile from balance_histogram (interpolated inside
+        the bucket). Buckets starting below min_balance are skipped."""
+        db = await self._db()
+        rows = await db.fetchall(
+            "SELECT bucket, n FROM balance_histogram WHERE guild_id = ? AND n > 0 ORDER BY bucket",
+            (guild_id,))
+        buckets = [(int(r["bucket"]), int(r["n"])) for r in rows
+                   if bucket_bounds(int(r["bucket"]))[0] >= min_balance]
+        total = sum(n for _, n in buckets)
+        if total <= 0:
+            return None
+        rank = min(total - 1, int(total * q))
+        seen = 0
+        for b, n in buckets:
+            if seen + n > rank:
+                lo, hi = bucket_bounds(b)
+                return int(lo + (hi - lo) * (rank - seen + 0.5) / n)
+            seen += n
+        return None
+
+    async def median_balance(self, guild_id: int) -> int:
+        """Median balance of players holding anything (0 on an empty server)."""
+        v = await self.balance_percentile(guild_id, 0.5, min_balance=1)
+        return v or 0
+
     async def item_price(self, guild_id: int, item_key: str) -> int | None:
         """Auto-scaled price for a built-in item, or None if not a tiered item."""
         tier = ITEM_TIERS.get(item_key)
         if tier is None:
             return None
         ref = await self.reference_balance(guild_id)
-        raw = ref * tier
-        if raw < 20:
-            return max(1, int(round(raw)))
-        return max(10, int(round(raw / 10) * 10))
+        return tier_price(ref, tier)
 
     async def all_item_prices(self, guild_id: int) -> dict:
         ref = await self.reference_balance(guild_id)
-        out = {}
-        for k, t in ITEM_TIERS.items():
-            raw = ref * t
-            out[k] = max(1, int(round(raw))) if raw < 20 else max(10, int(round(raw / 10) * 10))
-        return out
+        return {k: tier_price(ref, t) for k, t in ITEM_TIERS.items()}
 
     async def audit_loss_today(self, guild_id: int, target_id: int) -> int:
         """How many sobs the target has lost to audits today (UTC)."""
@@ -281,34 +477,14 @@ class Economy:
         ref = await self.reference_balance(guild_id)
         sig = await self.inflation_signal(guild_id)
         active = await self._active_user_count(guild_id)
-
-        # New, small server -> boost to get the economy moving.
-        if active < 15:
-            if ref < 100:
-                return 3.0
-            if ref < 300:
-                return 2.0
-        elif active < 40:
-            # small-but-growing: a gentle nudge at most
-            if ref < 100:
-                return 1.5
-
-        # Established server: keep reactions sane and let inflation control it.
-        if sig["status"] == "red":
-            return 0.5
-        if sig["status"] == "yellow":
-            return 0.75
-        return 1.0
+        return multiplier_for(ref, active, sig["status"])
 
     async def _active_user_count(self, guild_id: int) -> int:
         """How many users have a meaningful balance (>= 10 sobs). Used to tell a
         brand-new server from an established one whose median looks low due to
         PvP draining."""
-        db = await self._db()
-        row = await db.fetchone(
-            "SELECT COUNT(*) AS n FROM sob_users WHERE guild_id=? AND sobs_received_alltime >= 10",
-            (guild_id,))
-        return int(row["n"]) if row else 0
+        row = await self._counters(guild_id)
+        return int(row["active_players"]) if row else 0
 
     async def get_tax_pct(self, guild_id: int) -> int:
         """Tax % added ON TOP of a built-in item's price. Auto-suggested from the
@@ -331,17 +507,7 @@ class Economy:
         """Auto tax rate: gentle on new/small economies, higher when inflating."""
         ref = await self.reference_balance(guild_id)
         sig = await self.inflation_signal(guild_id)
-        if ref < 100:
-            base = 5
-        elif ref < 500:
-            base = 10
-        else:
-            base = 15
-        if sig["status"] == "red":
-            base += 10
-        elif sig["status"] == "yellow":
-            base += 5
-        return min(base, 30)
+        return tax_for(ref, sig["status"])
 
     # ---- burned (anti-inflation sink: the base price is destroyed) ----
     async def add_burned(self, guild_id: int, amount: int) -> None:
@@ -463,34 +629,120 @@ class Economy:
     async def record_snapshot(self, guild_id: int) -> None:
         """Write a supply snapshot. Keyed to the half-hour slot so we capture
         ~48 points/day and the inflation graph fills in within hours."""
-        total, players = await self.total_supply(guild_id)
+        await self.record_snapshots([guild_id])
+
+    async def record_snapshots(self, guild_ids) -> int:
+        """Snapshot many guilds at once: one read of every guild's supply
+        counters and one executemany, in a single transaction. Returns the
+        number of rows written."""
+        ids = sorted({int(g) for g in guild_ids})
+        if not ids:
+            return 0
+        db = await self._db()
+        rows = await db.fetchall(
+            "SELECT guild_id, total_supply, players FROM economy_counters")
+        supply = {int(r["guild_id"]): (int(r["total_supply"]), int(r["players"])) for r in rows}
         now = int(time.time())
-        slot = now - (now % 1800)   # round down to a 30-minute slot
+        slot = now - (now % SNAPSHOT_SECONDS)   # round down to a 30-minute slot
+        async with db.transaction() as conn:
+            await conn.executemany(
+                "INSERT INTO economy_snapshots "
+                "(guild_id, slot, resolution, total_sobs, players, created_at) "
+                "VALUES (?,?,?,?,?,?) "
+                "ON CONFLICT(guild_id, slot) DO UPDATE SET total_sobs=excluded.total_sobs, "
+                "players=excluded.players",
+                [(gid, slot, SNAPSHOT_SECONDS, *supply.get(gid, (0, 0)), now) for gid in ids],
+            )
+        return len(ids)
+
+    async def compact_snapshots(self, now: int | None = None) -> dict:
+        """Downsample old snapshots: rows older than HOURLY_AFTER collapse to
+        one per hour, older than DAILY_AFTER to one per day. Each bucket keeps
+        its closing value (supply is a level, not a flow). Cutoffs are aligned
+        to the bucket size so a bucket is only ever collapsed once it's
+        complete. Returns {resolution: rows removed}."""
+        now = int(now if now is not None else time.time())
         db = await self._db()
-        await db.execute(
-            "INSERT INTO economy_snapshots (guild_id, day, total_sobs, players, created_at) "
-            "VALUES (?,?,?,?,?) "
-            "ON CONFLICT(guild_id, day) DO UPDATE SET total_sobs=excluded.total_sobs, "
-            "players=excluded.players",
-            (guild_id, str(slot), total, players, now),
-        )
-        await db.commit()
+        removed = {}
+        for res, age in ((3600, HOURLY_AFTER), (86400, DAILY_AFTER)):
+            cutoff = (now - age) // res * res
+            async with db.transaction() as conn:
+                # bare columns with MAX() come from the row holding the max slot
+                cur = await conn.execute(
+                    "SELECT guild_id, slot / ? * ? AS b, total_sobs, players, created_at, "
+                    "MAX(slot) AS last, COUNT(*) AS n FROM economy_snapshots "
+                    "WHERE resolution < ? AND slot < ? GROUP BY guild_id, b",
+                    (res, res, res, cutoff))
+                rows = await cur.fetchall()
+                await cur.close()
+                if not rows:
+                    removed[res] = 0
+                    continue
+                await conn.execute(
+                    "DELETE FROM economy_snapshots WHERE resolution < ? AND slot < ?",
+                    (res, cutoff))
+                await conn.executemany(
+                    "INSERT INTO economy_snapshots "
+                    "(guild_id, slot, resolution, total_sobs, players, created_at) "
+                    "VALUES (?,?,?,?,?,?) "
+                    "ON CONFLICT(guild_id, slot) DO UPDATE SET resolution=excluded.resolution, "
+                    "total_sobs=excluded.total_sobs, players=excluded.players",
+                    [(r["guild_id"], r["b"], res, r["total_sobs"], r["players"], r["created_at"])
+                     for r in rows])
+                removed[res] = sum(int(r["n"]) for r in rows) - len(rows)
+        return removed
+
+    async def guilds_due_rebalance(self, guild_ids, today: str) -> list[int]:
+        """Which of these guilds haven't had their daily rebalance for `today`
+        (one settings read for all of them)."""
+        db = await self._db()
+        rows = await db.fetchall(
+            "SELECT guild_id, value FROM guild_settings WHERE key = ?",
+            (LAST_REBALANCE_KEY,))
+        done = {int(r["guild_id"]) for r in rows if str(r["value"]) == today}
+        return [int(g) for g in guild_ids if int(g) not in done]
 
     async def supply_history(self, guild_id: int, points: int = 24) -> list[dict]:
         db = await self._db()
         rows = await db.fetchall(
-            "SELECT day, total_sobs, players FROM economy_snapshots "
-            "WHERE guild_id = ? ORDER BY CAST(day AS INTEGER) DESC LIMIT ?",
+            "SELECT slot, total_sobs, players FROM economy_snapshots "
+            "WHERE guild_id = ? ORDER BY slot DESC LIMIT ?",
             (guild_id, points),
         )
-        return [{"slot": r["day"], "total": r["total_sobs"], "players": r["players"]}
+        return [{"slot": r["slot"], "total": r["total_sobs"], "players": r["players"]}
                 for r in reversed(rows)]
 
-    async def inflation_signal(self, guild_id: int) -> dict:
-        """Inflation = RECENT rate of change (last ~day of snapshots vs the day
-        before), NOT growth from the first-ever snapshot. A one-time event no
-        longer reads as permanent inflation."""
-        hist = await self.supply_history(guild_id, 48)   # ~last day at 30-min slots
+    async def supply_series(self, guild_id: int, seconds: int | None = 86400,
+                            max_points: int = 96) -> list[dict]:
+        """Supply over the last `seconds` (None = all history), bucketed at the
+        finest SERIES_STEPS width that keeps it under max_points. Each point is
+        the closing value of its bucket. Buckets finer than what's stored that
+        far back (compacted rows) simply come out sparser."""
+        db = await self._db()
+        now = int(time.time())
+        if seconds is None:
+            row = await db.fetchone(
+                "SELECT MIN(slot) AS first FROM economy_snapshots WHERE guild_id = ?",
+                (guild_id,))
+            if row is None or row["first"] is None:
+                return []
+            seconds = max(SNAPSHOT_SECONDS, now - int(row["first"]))
+        step = next((s for s in SERIES_STEPS if seconds / s <= max_points), SERIES_STEPS[-1])
+        rows = await db.fetchall(
+            "SELECT slot / ? AS b, total_sobs, players, MAX(slot) AS last "
+            "FROM economy_snapshots WHERE guild_id = ? AND slot >= ? "
+            "GROUP BY b ORDER BY b",
+            (step, guild_id, now - seconds),
+        )
+        return [{"slot": r["last"], "total": r["total_sobs"], "players": r["players"]}
+                for r in rows]
+
+    async def inflation_signal(self, guild_id: int, seconds: int | None = 86400) -> dict:
+        """Inflation = RECENT rate of change (the latest quarter of the window
+        vs the quarter before), NOT growth from the first-ever snapshot. A
+        one-time event no longer reads as permanent inflation. The default
+        window is the last day at 30-min slots."""
+        hist = await self.supply_series(guild_id, seconds)
         if len(hist) < 4:
             cur = hist[-1]["total"] if hist else (await self.total_supply(guild_id))[0]
             return {"status": "new", "pct": 0.0, "points": [h["total"] for h in hist] or [cur],
@@ -500,13 +752,7 @@ class Economy:
         recent = sum(h["total"] for h in hist[-q:]) / q
         prior = sum(h["total"] for h in hist[-2 * q:-q]) / q
         pct = ((recent - prior) / prior * 100) if prior else 0.0
-        if pct <= 3:
-            status = "green"
-        elif pct <= 12:
-            status = "yellow"
-        else:
-            status = "red"
-        return {"status": status, "pct": pct,
+        return {"status": inflation_status(pct), "pct": pct,
                 "points": [h["total"] for h in hist],
                 "labels": [h.get("slot", "") for h in hist]}
 
@@ -1,12 +1,22 @@
 # core/economy_cog.py
 from __future__ import annotations
 
+import time
+import random
+import asyncio
+
 import discord
 from discord.ext import commands, tasks
 
-from core.economy import Economy
+from core.economy import Economy, LAST_REBALANCE_KEY
 
 ACCENT = 0xF0B132
+# daily rebalances are jittered across at most this window, ~5s apart
+REBALANCE_SPREAD_SECONDS = 20 * 60
+REBALANCE_SPACING_SECONDS = 5
+# !economy graph windows (seconds; None = all history)
+_WINDOWS = {"1d": 86400, "2d": 2 * 86400, "7d": 7 * 86400, "30d": 30 * 86400,
+            "90d": 90 * 86400, "1y": 365 * 86400, "all": None}
 
 
 def _is_admin(member, settings) -> bool:
@@ -26,38 +36,135 @@ class EconomyCog(commands.Cog):
         self.bot = bot
         self.settings = settings
         self.eco = Economy(sob_repo)
+        self._rebalance_task: asyncio.Task | None = None
         self._snapshot_loop.start()
+        self._counters_loop.start()
+        self._compact_loop.start()
+        self._checkpoint_loop.start()
 
     def cog_unload(self):
         self._snapshot_loop.cancel()
+        self._counters_loop.cancel()
+        self._compact_loop.cancel()
+        self._checkpoint_loop.cancel()
+        if self._rebalance_task is not None:
+            self._rebalance_task.cancel()
 
     @tasks.loop(minutes=30)
     async def _snapshot_loop(self):
-        # snapshot every 30 min (graph), and recompute prices once per UTC day
+        # snapshot every 30 min (graph), and recompute prices once per UTC day.
+        # All guilds are snapshotted in one batch; the daily rebalances are
+        # spread over the next few minutes instead of all landing at midnight.
         from datetime import datetime, timezone
         today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-        for guild in list(self.bot.guilds):
+        ids = [g.id for g in list(self.bot.guilds)]
+        t0 = time.perf_counter()
+        try:
+            await self.eco.record_snapshots(ids)
+        except Exception as e:
+            print(f"[Ignio][Economy] snapshot failed: {e}")
+        snap_ms = (time.perf_counter() - t0) * 1000
+        due: list[int] = []
+        if self._rebalance_task is None or self._rebalance_task.done():
+            try:
+                due = await self.eco.guilds_due_rebalance(ids, today)
+            except Exception as e:
+                print(f"[Ignio][Economy] rebalance lookup failed: {e}")
+        spread = min(REBALANCE_SPREAD_SECONDS, REBALANCE_SPACING_SECONDS * len(due))
+        if due:
+            self._rebalance_task = asyncio.create_task(self._staggered_rebalance(due, today, spread))
+        print(f"[Ignio][Economy] snapshot: {len(ids)} guilds in {snap_ms:.0f} ms; "
+              f"{len(due)} rebalances spread over {spread:.0f}s")
+
+    async def _staggered_rebalance(self, guild_ids, today: str, spread: float):
+        # each guild gets a random offset inside the window so the reference
+        # queries and price-factor writes don't queue up on the DB together
+        plan = sorted((random.uniform(0, spread), gid) for gid in guild_ids)
+        start = time.monotonic()
+        took: list[float] = []
+        for offset, gid in plan:
+            wait = start + offset - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            t0 = time.perf_counter()
             try:
-                await self.eco.record_snapshot(guild.id)
-                # daily rebalance: only if we haven't already today
-                last = await self.eco.repo.get_guild_setting(guild.id, "economy:last_rebalance")
-                if last != today:
-                    await self.eco.recompute_reference(guild.id)
-                    await self.eco.repo.set_guild_setting(guild.id, "economy:last_rebalance", today)
-                    # gently auto-balance protection prices from real behaviour
-                    try:
-                        from core.protection import Protection
-                        prot = Protection(self.eco, self.eco.repo)
-                        res = await prot.auto_balance(guild.id)
-                        if res["reason"] != "stable":
-                            print(f"[Ignio][Protection] {guild.id}: factor "
-                                  f"{res['factor_before']}→{res['factor_after']} ({res['reason']})")
-                    except Exception as e:
-                        print(f"[Ignio][Protection] auto-balance failed for {guild.id}: {e}")
+                await self._rebalance(gid, today)
             except Exception as e:
-                print(f"[Ignio][Economy] snapshot/rebalance failed for {guild.id}: {e}")
+                print(f"[Ignio][Economy] rebalance failed for {gid}: {e}")
+            took.append((time.perf_counter() - t0) * 1000)
+        if took:
+            print(f"[Ignio][Economy] rebalanced {len(took)} guilds: "
+                  f"total {sum(took):.0f} ms, slowest {max(took):.0f} ms")
+
+    async def _rebalance(self, guild_id: int, today: str):
+        await self.eco.recompute_reference(guild_id)
+        await self.eco.repo.set_guild_setting(guild_id, LAST_REBALANCE_KEY, today)
+        # gently auto-balance protection prices from real behaviour
+        try:
+            from core.protection import Protection
+            prot = Protection(self.eco, self.eco.repo)
+            res = await prot.auto_balance(guild_id)
+            if res["reason"] != "stable":
+                print(f"[Ignio][Protection] {guild_id}: factor "
+                      f"{res['factor_before']}→{res['factor_after']} ({res['reason']})")
+        except Exception as e:
+            print(f"[Ignio][Protection] auto-balance failed for {guild_id}: {e}")
+
+    @tasks.loop(hours=6)
+    async def _counters_loop(self):
+        # the supply counters are trigger-maintained; this catches any drift
+        # (e.g. rows edited by hand with triggers dropped) and repairs it
+        try:
+            bad = await self.eco.verify_counters()
+            for m in bad[:10]:
+                if m.get("histogram"):
+                    print(f"[Ignio][Economy] rebuilt balance histogram for {m['guild_id']}")
+                else:
+                    print(f"[Ignio][Economy] repaired supply counters for {m['guild_id']}: "
+                          f"{m['stored']} -> {m['expected']}")
+        except Exception as e:
+            print(f"[Ignio][Economy] counter verify failed: {e}")
+
+    @tasks.loop(hours=6)
+    async def _compact_loop(self):
+        # storage housekeeping: old snapshots are downsampled (hourly after
+        # 2 days, daily after 30) and old ledger rows are archived
+        try:
+            removed = await self.eco.compact_snapshots()
+            if any(removed.values()):
+                print(f"[Ignio][Economy] compacted snapshots: {removed.get(3600, 0)} -> hourly, "
+                      f"{removed.get(86400, 0)} -> daily rows removed")
+        except Exception as e:
+            print(f"[Ignio][Economy] snapshot compaction failed: {e}")
+        # ledger rows past the horizon move to the archive tier, in chunks
+        try:
+            from core import ledger
+            cutoff = int(time.time()) - ledger.ARCHIVE_AFTER_DAYS * 86400
+            moved = await ledger.archive_before(await self.eco._db(), cutoff)
+            if moved:
+                print(f"[Ignio][Economy] archived {moved} ledger rows older than "
+                      f"{ledger.ARCHIVE_AFTER_DAYS} days")
+        except Exception as e:
+            print(f"[Ignio][Economy] ledger archive failed: {e}")
+
+    @tasks.loop(hours=1)
+    async def _checkpoint_loop(self):
+        # fold new ledger rows into the per-user checkpoints so reconciliation
+        # only ever sums the last hour or so of activity
+        try:
+            from core import ledger
+            t0 = time.perf_counter()
+            folded = await ledger.advance_checkpoints(await self.eco._db())
+            if folded:
+                print(f"[Ignio][Economy] ledger checkpoints: {folded} rows folded in "
+                      f"{(time.perf_counter() - t0) * 1000:.0f} ms")
+        except Exception as e:
+            print(f"[Ignio][Economy] ledger checkpoint failed: {e}")
 
     @_snapshot_loop.before_loop
+    @_counters_loop.before_loop
+    @_checkpoint_loop.before_loop
+    @_compact_loop.before_loop
     async def _before(self):
         try:
             await self.bot.wait_until_ready()
@@ -103,8 +210,10 @@ class EconomyCog(commands.Cog):
         old_ref = await self.eco.reference_balance(ctx.guild.id)
         new_ref = await self.eco.recompute_reference(ctx.guild.id)
         prices = await self.eco.all_item_prices(ctx.guild.id)
+        median = await self.eco.median_balance(ctx.guild.id)
         e = discord.Embed(title="✅ Shop rebalanced", color=ACCENT)
         e.description = (f"Reference balance: **{_fmt(old_ref)} → {_fmt(new_ref)}** sobs.\n"
+                         f"Median balance: **{_fmt(median)}** sobs.\n"
                          f"Prices are now locked to the current economy.")
         e.add_field(name="A few new prices", value=(
             f"Shield — {_fmt(prices['shield'])}/sec\n"
@@ -254,8 +363,13 @@ class EconomyCog(commands.Cog):
 
     @commands.command(name="economy", aliases=["eco"])
     @commands.guild_only()
-    async def economy_cmd(self, ctx):
+    async def economy_cmd(self, ctx, window: str = "1d"):
         gid = ctx.guild.id
+        window = window.lower()
+        if window not in _WINDOWS:
+            await ctx.reply(embed=self._err(
+                f"Usage: `{ctx.prefix}economy [{'|'.join(_WINDOWS)}]` — graph window (default 1d)."))
+            return
         try:
             await self.eco.record_snapshot(gid)
         except Exception:
@@ -263,7 +377,10 @@ class EconomyCog(commands.Cog):
 
         rate = await self.eco.get_rate(gid)
         rec = await self.eco.recommend_rate(gid)
+        # status/advice always come from the 1d signal its thresholds were tuned
+        # on; the requested window only picks the plotted series
         sig = await self.eco.inflation_signal(gid)
+        graph = sig if window == "1d" else await self.eco.inflation_signal(gid, _WINDOWS[window])
         mult = await self.eco.get_sob_multiplier(gid)
         burned = await self.eco.get_burned(gid)
 
@@ -282,7 +399,8 @@ class EconomyCog(commands.Cog):
                 "total": rec["total"], "players": rec["players"],
                 "current_rate": rate, "recommended_rate": rec["recommended"],
                 "multiplier": mult, "burned": burned,
-                "status": sig["status"], "pct": sig["pct"], "points": sig["points"],
+                "status": sig["status"], "pct": sig["pct"], "points": graph["points"],
+                "labels": graph["labels"],
                 "advice": advice,
             })
             buf = io.BytesIO(); card.save(buf, format="PNG"); buf.seek(0)
@@ -301,7 +419,7 @@ class EconomyCog(commands.Cog):
         e.add_field(name="Suggested rate", value=f"{_fmt(rec['recommended'])} / $1", inline=True)
         e.add_field(name="Inflation", value=status_word
                     + (f" ({sig['pct']:+.0f}%)" if sig["status"] not in ("new",) else ""), inline=True)
-        e.add_field(name="\u200b", value="\u200b", inline=True)
+        e.add_field(name="Median balance", value=_fmt(await self.eco.median_balance(gid)), inline=True)
         if advice:
             e.add_field(name="Advice", value=advice, inline=False)
         await ctx.reply(embed=e)
@@ -0,0 +1,370 @@
+# core/economy_sim.py
+"""
+Vectorised economy balance simulator (NumPy) for tuning numbers before shipping.
+
+The balance tests drive the real async repos one operation at a time, which is
+exact but slow: a week of a 20-player server is about the limit. This models
+the same money flows on whole arrays of balances, one step per day, so
+thousands of players over months run in seconds:
+
+  reactions   minted: sob_value x multiplier per reaction (economy.py)
+  daily       minted: BASE + streak bonus up to CAP, 48h grace (daily_cog.py)
+  snitch      the message's sobs are wiped (burned), SNITCH_STEAL_PCT of them
+              is taken from the target, plus a minted reward; taxed to treasury
+  audit       basic / heist items bought (base burned, tax to treasury) and the
+              take moved from target to auditor, under the daily immunity cap
+  steal       the real odds, caps, floors and fees from steal.py
+  roulette    conserved between two players, HOUSE_TAX_PCT to treasury
+  shop        buff purchases at tier prices: base burned, tax to treasury
+  protection  risk-priced wards/shields (protection.py), burned; a protected
+              player blocks snitches and audits that day
+
+Every game constant is read from the bot's own modules (namespaced like
+"steal.BASE_CHANCE") and can be overridden per run; how often players DO each
+thing is in BEHAVIOUR. The multiplier, tax and prices go through the same pure
+functions Economy uses.
+
+Within a day, contested actions run in rounds where each player is in at most
+one encounter, so a balance is never spent twice. What this doesn't model:
+cooldowns finer than a round, buff effects (boost/hunter/king), the shop's
+protection auto-balance factor (fixed at 1.0), and treasury payouts (the
+treasury is tracked as money out of circulation).
+
+  python -m core.economy_sim --players 5000 --days 120
+  python -m core.economy_sim --days 60 --set steal.BASE_CHANCE=55 --every 10
+"""
+from __future__ import annotations
+
+import sys
+import argparse
+
+import core.economy as economy
+import core.steal as steal
+import core.protection as protection
+import core.games.engine as engine
+import core.daily_cog as daily
+
+try:
+    import numpy as np
+except ImportError:     # optional: only this tool needs it
+    np = None
+
+_SOURCES = {"economy": economy, "steal": steal, "protection": protection,
+            "engine": engine, "daily": daily}
+
+# How often players do things (per player per day unless noted). These aren't
+# in the bot's code, so they live here; tune them to match a real server.
+BEHAVIOUR = {
+    "reactions": 2.0,             # sob reactions received (activity-weighted mean)
+    "reactions_per_message": 3.0, # sobs on a message that gets snitched
+    "daily_claim": 0.6,           # chance of claiming !daily
+    "snitches": 0.15,
+    "audits": 0.06,
+    "heists": 0.01,
+    "steals": 2.0,                # attempts; at most one per round, steal.ATTACKER_DAILY_ATTEMPTS rounds
+    "lockpick": 0.2,              # share of steal attempts using a lockpick
+    "safelock": 0.05,             # share of players holding a Safe Lock
+    "roulette": 0.3,              # games
+    "roulette_wager": 0.10,       # share of the poorer player's balance
+    "shop": 0.08,                 # buff purchases
+    "protect": 0.25,              # chance an upper-half player is protected that day
+    "activity_sigma": 1.0,        # lognormal spread of player activity
+    "start_balance": 0,
+}
+
+# buff items bought in the "shop" phase (protection, audits, lockpick and
+# safelock are charged where they're used)
+SHOP_ITEMS = ("boost", "boost_adv", "hunter", "lucky", "freeze", "freeze_deep",
+              "slow_curse", "marked", "jail", "king")
+
+SERIES = ("supply", "active", "gini", "p65", "ref", "mult", "tax_pct",
+          "minted", "burned", "to_treasury", "treasury")
+
+
+def constants(overrides: dict | None = None) -> dict:
+    """Every numeric UPPER_CASE constant of the source modules, keyed
+    "<module>.<NAME>", with overrides applied."""
+    out = {}
+    for name, mod in _SOURCES.items():
+        for k, v in vars(mod).items():
+            if k.isupper() and isinstance(v, (int, float)) and not isinstance(v, bool):
+                out[f"{name}.{k}"] = v
+    for k, v in (overrides or {}).items():
+        if k not in out:
+            raise KeyError(f"unknown constant {k!r}")
+        out[k] = type(out[k])(v)
+    return out
+
+
+def gini(bal) -> float:
+    """Gini coefficient of non-negative balances (0 = equal, 1 = one holder)."""
+    x = np.sort(np.asarray(bal, dtype=np.float64))
+    n, total = len(x), x.sum()
+    if n == 0 or total <= 0:
+        return 0.0
+    return float(2 * np.dot(np.arange(1, n + 1), x) / (n * total) - (n + 1) / n)
+
+
+def percentile(bal, q: float, min_balance: int = 10) -> int | None:
+    """Same rank rule as Economy.balance_percentile: sorted index int(n*q)."""
+    x = np.sort(bal[bal >= min_balance])
+    if len(x) == 0:
+        return None
+    return int(x[min(len(x) - 1, int(len(x) * q))])
+
+
+def _encounters(rng, weights, k: int):
+    """Up to k (actor, target) pairs drawn by activity, each player in at most
+    one pair so no balance is touched twice in a round."""
+    n = len(weights)
+    if k <= 0 or n < 2:
+        return np.empty(0, np.int64), np.empty(0, np.int64)
+    a = rng.choice(n, size=k, p=weights)
+    t = rng.choice(n, size=k, p=weights)
+    keep = a != t
+    a, t = a[keep], t[keep]
+    _, first = np.unique(a, return_index=True)
+    a, t = a[np.sort(first)], t[np.sort(first)]
+    _, first = np.unique(t, return_index=True)
+    a, t = a[np.sort(first)], t[np.sort(first)]
+    keep = ~np.isin(a, t)
+    return a[keep], t[keep]
+
+
+def simulate(players: int = 2000, days: int = 90, *, seed: int = 0,
+             behaviour: dict | None = None, overrides: dict | None = None) -> dict:
+    """Run the model. Returns {"day": array, <SERIES name>: array per day,
+    "balances": final balances}."""
+    if np is None:
+        raise RuntimeError("the economy simulator needs numpy (pip install numpy)")
+    c = constants(overrides)
+    b = dict(BEHAVIOUR, **(behaviour or {}))
+    rng = np.random.default_rng(seed)
+    n = int(players)
+
+    bal = np.full(n, int(b["start_balance"]), dtype=np.int64)
+    act = rng.lognormal(0.0, b["activity_sigma"], n)
+    weights = act / act.sum()
+    act = act / act.mean()
+    streak = np.zeros(n, np.int64)
+    idle = np.full(n, 99, np.int64)              # days since last !daily
+    grace_days = c["daily.GRACE"] // c["daily.COOLDOWN"] - 1
+    tiers = economy.ITEM_TIERS
+    out = {k: np.zeros(days) for k in SERIES}
+    treasury = 0
+
+    for d in range(days):
+        minted = burned = to_treasury = 0
+        # daily rebalance: reference, multiplier and tax for the day
+        ref = max(c["economy.REF_FLOOR"],
+                  percentile(bal, c["economy.REF_PERCENTILE"]) or 0)
+        active = int((bal >= 10).sum())
+        pct = 0.0
+        if d >= 2 and out["supply"][d - 2] > 0:
+            # a day step can't see the 6-hour quarters inflation_signal
+            # compares, so spread day-over-day growth evenly over four
+            pct = (out["supply"][d - 1] / out["supply"][d - 2] - 1) * 100 / 4
+        status = economy.inflation_status(pct) if d >= 2 else "new"
+        mult = economy.multiplier_for(ref, active, status)
+        tax_pct = economy.tax_for(ref, status)
+
+        def price(key):
+            return economy.tier_price(ref, tiers[key])
+
+        # reactions (minted)
+        value = max(c["economy.SOB_VALUE_FLOOR"], int(ref * c["economy.SOB_VALUE_PCT"]))
+        per_reaction = max(1, int(round(value * mult)))
+        got = rng.poisson(b["reactions"] * act) * per_reaction
+        bal += got
+        minted += int(got.sum())
+
+        # daily claims (minted)
+        claim = rng.random(n) < b["daily_claim"]
+        streak = np.where(claim, np.where(idle <= grace_days, streak + 1, 1), streak)
+        idle = np.where(claim, 0, idle + 1)
+        reward = np.minimum(c["daily.BASE"] + (streak - 1) * c["daily.STREAK_STEP"], c["daily.CAP"])
+        paid = np.where(claim, reward, 0)
+        bal += paid
+        minted += int(paid.sum())
+
+        start = bal.copy()                       # stands in for the 24h risk balance
+
+        # protection for the day: a vault ward + a shield, risk-priced, burned
+        upper = bal >= np.median(bal)
+        protected = upper & (rng.random(n) < b["protect"])
+        basic = (start * c["economy.AUDIT_BASIC_PCT"]).astype(np.int64)
+        heist = (start * c["economy.AUDIT_HEIST_PCT"]).astype(np.int64)
+        ward = np.maximum(10, np.round(c["protection.VAULT_FRACTION"] * (basic + heist)))
+        ward = np.minimum(ward, np.maximum(1, (basic + heist) * c["protection.MAX_PRICE_VS_DAMAGE"]))
+        snitch_risk = np.maximum(c["protection.MIN_SNITCH_RISK"],
+                                 (start * c["protection.SNITCH_FALLBACK_PCT"]).astype(np.int64))
+        shield = np.maximum(5, np.round(c["protection.SHIELD_FRACTION"] * snitch_risk))
+        cost = (ward + shield).astype(np.int64)
+        protected &= bal >= cost
+        spent = np.where(protected, cost, 0)
+        bal -= spent
+        burned += int(spent.sum())
+
+        # snitches: wipe (burn) + steal share + minted reward, taxed
+        a, t = _encounters(rng, weights, rng.poisson(b["snitches"] * n))
+        hit = ~protected[t]
+        a, t = a[hit], t[hit]
+        wiped = np.minimum(bal[t], rng.poisson(b["reactions_per_message"], len(t)) * per_reaction)
+        bal[t] -= wiped
+        burned += int(wiped.sum())
+        stolen = np.minimum((wiped * c["economy.SNITCH_STEAL_PCT"]).astype(np.int64), bal[t])
+        bal[t] -= stolen
+        base = max(c["economy.SNITCH_REWARD_FLOOR"], int(ref * c["economy.SNITCH_REWARD_PCT"]))
+        gross = stolen + base
+        tax = gross * c["economy.SNITCH_TAX_PCT"] // 100
+        bal[a] += gross - tax
+        minted += base * len(a)
+        to_treasury += int(tax.sum())
+
+        # audits and heists: item bought (burn + tax), take under the immunity cap
+        lost = np.zeros(n, np.int64)
+        for key, rate, pct_key in (("audit", b["audits"], "economy.AUDIT_BASIC_PCT"),
+                                   ("heist", b["heists"], "economy.AUDIT_HEIST_PCT")):
+            p = price(key)
+            tax = p * tax_pct // 100
+            a, t = _encounters(rng, weights, rng.poisson(rate * n))
+            take = (bal[t] * c[pct_key]).astype(np.int64)
+            # only worth it against someone whose loss beats the price
+            go = (bal[a] >= p + tax) & (take > p)
+            a, t, take = a[go], t[go], take[go]
+            bal[a] -= p + tax
+            burned += p * len(a)
+            to_treasury += tax * len(a)
+            blocked = protected[t]
+            if key == "heist":
+                blocked &= rng.random(len(t)) >= c["economy.AUDIT_HEIST_CRIT"]
+            cap = ((bal[t] + lost[t]) * c["economy.AUDIT_DAILY_IMMUNE_PCT"]).astype(np.int64)
+            room = cap - lost[t]
+            take = np.where(blocked | (room <= 0), 0, np.minimum(take, np.minimum(room, bal[t])))
+            bal[t] -= take
+            bal[a] += take
+            lost[t] += take
+
+        # steals: the real odds, caps and fees, one attempt per player per round
+        rounds = max(1, int(c["steal.ATTACKER_DAILY_ATTEMPTS"]))
+        lost = np.zeros(n, np.int64)
+        safelock = rng.random(n) < b["safelock"]
+        holders = safelock & (bal >= price("safelock"))
+        bal -= np.where(holders, price("safelock"), 0)
+        burned += price("safelock") * int(holders.sum())
+        for _ in range(rounds):
+            a, t = _encounters(rng, weights, rng.poisson(b["steals"] / rounds * n))
+            rb = np.maximum(start[t], bal[t])
+            planned = np.clip((rb * c["steal.STEAL_PCT"]).astype(np.int64),
+                              c["steal.STEAL_MIN"], c["steal.STEAL_HARD_CAP"])
+            day_cap = np.minimum((rb * c["steal.DAILY_VICTIM_PCT"]).astype(np.int64),
+                                 c["steal.DAILY_VICTIM_HARD"])
+            ok = (rb >= c["steal.MIN_TARGET_BALANCE"]) & (day_cap - lost[t] >= planned)
+            planned = np.where(bal[t] - planned < c["steal.PROTECTED_FLOOR"],
+                               np.maximum(0, bal[t] - c["steal.PROTECTED_FLOOR"]), planned)
+            fee = (planned * c["steal.FAIL_FEE_PCT"]).astype(np.int64)
+            ok &= (planned >= c["steal.STEAL_MIN"]) & (bal[a] >= fee)
+            a, t, planned, fee = a[ok], t[ok], planned[ok], fee[ok]
+            lock = (rng.random(len(a)) < b["lockpick"]) & (bal[a] >= fee + price("lockpick"))
+            bal[a] -= np.where(lock, price("lockpick"), 0)
+            burned += price("lockpick") * int(lock.sum())
+            chance = (c["steal.BASE_CHANCE"] + np.where(lock, c["steal.LOCKPICK_BONUS"], 0)
+                      - np.where(safelock[t], c["steal.SAFELOCK_REDUCTION"], 0))
+            chance = np.clip(chance, c["steal.CHANCE_FLOOR"], c["steal.CHANCE_CEIL"])
+            win = rng.integers(0, 100, len(a)) < chance
+            move = np.where(win, planned, 0)
+            tax = move - (move * c["steal.HUNTER_SHARE"]).astype(np.int64)
+            pay = np.where(win, 0, np.minimum(fee, bal[a]))
+            bal[t] -= move
+            lost[t] += move
+            bal[a] += move - tax - pay
+            to_treasury += int(tax.sum() + (pay // 2).sum())
+            burned += int((pay - pay // 2).sum())
+
+        # roulette: conserved pot minus the house tax
+        a, t = _encounters(rng, weights, rng.poisson(b["roulette"] / 2 * n))
+        wager = (np.minimum(bal[a], bal[t]) * b["roulette_wager"]).astype(np.int64)
+        house = 2 * wager * c["engine.HOUSE_TAX_PCT"] // 100
+        first = rng.random(len(a)) < 0.5
+        bal[a] += np.where(first, wager - house, -wager)
+        bal[t] += np.where(first, -wager, wager - house)
+        to_treasury += int(house.sum())
+
+        # shop buffs: base burned, tax to treasury
+        buyers = rng.choice(n, size=min(n, rng.poisson(b["shop"] * n)), replace=False, p=weights)
+        items = rng.choice(len(SHOP_ITEMS), size=len(buyers))
+        prices = np.array([price(k) for k in SHOP_ITEMS], np.int64)[items]
+        taxes = prices * tax_pct // 100
+        go = bal[buyers] >= prices + taxes
+        bal[buyers[go]] -= prices[go] + taxes[go]
+        burned += int(prices[go].sum())
+        to_treasury += int(taxes[go].sum())
+
+        treasury += to_treasury
+        row = {"supply": int(bal.sum()), "active": int((bal >= 10).sum()),
+               "gini": gini(bal), "p65": percentile(bal, c["economy.REF_PERCENTILE"]) or 0,
+               "ref": ref, "mult": mult, "tax_pct": tax_pct, "minted": minted,
+               "burned": burned, "to_treasury": to_treasury, "treasury": treasury}
+        for k, v in row.items():
+            out[k][d] = v
+
+    out["day"] = np.arange(1, days + 1)
+    out["balances"] = bal
+    return out
+
+
+def _parse_set(items) -> dict:
+    out = {}
+    for item in items or ():
+        name, _, value = item.partition("=")
+        out[name.strip()] = float(value)
+    return out
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m core.economy_sim",
+                                 description="Simulate the sob economy.")
+    ap.add_argument("--players", type=int, default=2000)
+    ap.add_argument("--days", type=int, default=90)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--every", type=int, default=7, help="print every N days")
+    ap.add_argument("--set", action="append", metavar="module.NAME=VALUE",
+                    help="override a game constant, e.g. steal.BASE_CHANCE=55")
+    ap.add_argument("--behave", action="append", metavar="NAME=VALUE",
+                    help="override a BEHAVIOUR rate, e.g. steals=4")
+    ap.add_argument("--csv", help="write every day's series to this file")
+    ap.add_argument("--list", action="store_true", help="list tunable constants and exit")
+    args = ap.parse_args(argv)
+
+    if args.list:
+        for k, v in sorted(constants().items()):
+            print(f"{k} = {v}")
+        for k, v in BEHAVIOUR.items():
+            print(f"behaviour {k} = {v}")
+        return 0
+    try:
+        res = simulate(args.players, args.days, seed=args.seed,
+                       behaviour=_parse_set(args.behave), overrides=_parse_set(args.set))
+    except (KeyError, RuntimeError) as e:
+        print(f"[Ignio][Sim] {e}", file=sys.stderr)
+        return 2
+
+    print(f"{'day':>5} {'supply':>14} {'active':>7} {'gini':>6} {'p65':>9} "
+          f"{'mult':>5} {'minted':>12} {'burned':>12} {'treasury':>12}")
+    for i in range(args.days):
+        if (i + 1) % max(1, args.every) and i != args.days - 1:
+            continue
+        print(f"{int(res['day'][i]):>5} {int(res['supply'][i]):>14,} {int(res['active'][i]):>7} "
+              f"{res['gini'][i]:>6.3f} {int(res['p65'][i]):>9,} {res['mult'][i]:>5.2f} "
+              f"{int(res['minted'][i]):>12,} {int(res['burned'][i]):>12,} "
+              f"{int(res['treasury'][i]):>12,}")
+    if args.csv:
+        with open(args.csv, "w", encoding="utf-8") as f:
+            f.write(",".join(("day",) + SERIES) + "\n")
+            for i in range(args.days):
+                f.write(",".join(str(res[k][i].item()) for k in ("day",) + SERIES) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -79,6 +79,7 @@ class GamesEngine:
             async with db.key_lock("sob", guild_id, a):
                 async with db.key_lock("sob", guild_id, b):
                     async with db.transaction() as conn:
+                        escrow = []
                         for uid in (challenger, opponent):
                             await self.sob_repo._ensure_user_row(conn, guild_id, uid, ts)
                             before = await self.sob_repo._balance(conn, guild_id, uid)
@@ -100,13 +101,14 @@ class GamesEngine:
                                     "updated_at = ? WHERE guild_id = ? AND user_id = ? AND period_type = ? AND period_key = ?",
                                     (wager, ts, guild_id, uid, ptype, pkey),
                                 )
-                            await ledger.record(
-                                conn, guild_id=guild_id, event_type=ledger.EVT_ROULETTE_ESCROW,
-                                transaction_id=game_id, subject_id=uid, actor_id=uid,
+                            escrow.append(dict(
+                                event_type=ledger.EVT_ROULETTE_ESCROW, subject_id=uid, actor_id=uid,
                                 counterparty_id=(opponent if uid == challenger else challenger),
                                 delta=-wager, balance_before=before, balance_after=before - wager,
                                 game_id=game_id, metadata={"game": game},
-                            )
+                            ))
+                        await ledger.record_many(conn, escrow, guild_id=guild_id,
+                                                 transaction_id=game_id, created_at=ts)
                         await conn.execute(
                             "INSERT INTO game_matches (game_id, guild_id, game, challenger_id, "
                             "opponent_id, wager, challenger_escrow, opponent_escrow, status, created_at, updated_at) "
@@ -182,6 +184,7 @@ class GamesEngine:
                 if m is None or m["status"] != "pending":
                     return False
                 guild_id = int(m["guild_id"])
+                refunds = []
                 for uid, esc in ((int(m["challenger_id"]), int(m["challenger_escrow"])),
                                  (int(m["opponent_id"]), int(m["opponent_escrow"]))):
                     if esc <= 0:
@@ -189,12 +192,13 @@ class GamesEngine:
                     b, a = await self.sob_repo._apply_delta(
                         conn, guild_id=guild_id, user_id=uid, delta=esc, ts=ts,
                     )
-                    await ledger.record(
-                        conn, guild_id=guild_id, event_type=ledger.EVT_ROULETTE_REFUND,
-                        transaction_id=game_id, subject_id=uid, actor_id=uid,
+                    refunds.append(dict(
+                        event_type=ledger.EVT_ROULETTE_REFUND, subject_id=uid, actor_id=uid,
                         delta=esc, balance_before=b, balance_after=a,
                         game_id=game_id, metadata={"reason": reason},
-                    )
+                    ))
+                await ledger.record_many(conn, refunds, guild_id=guild_id,
+                                         transaction_id=game_id, created_at=ts)
                 await conn.execute(
                     "UPDATE game_matches SET status='refunded', updated_at=? WHERE game_id=?",
                     (ts, game_id),
@@ -3,11 +3,14 @@
 country, drawn cleanly with a title bar. Pure PIL (no runtime map libraries)."""
 from __future__ import annotations
 
+import functools
 import io
 import os
+import threading
+from collections import OrderedDict
 
 from PIL import Image, ImageDraw
-from core.profile.render import f_title, f_label, f_reg, _round_mask, _text_w
+from core.profile.render import f_title, f_label, _round_mask, _text_w
 
 HERE = os.path.dirname(os.path.abspath(__file__))
 MAP_PATH = os.path.join(HERE, "assets", "worldmap.png")
@@ -22,38 +25,46 @@ PAD = 24
 BAR_H = 70
 
 
+SPRITE = 72                  # marker sprite half-size (glow + ring + arrow fit)
+BOARD_CACHE_BYTES = 16 * 1024 * 1024   # encoded boards kept (~120 at ~137 KB each)
+
+# (x, y, round, total) -> PNG bytes; order = least recently used first
+_boards: "OrderedDict[tuple, bytes]" = OrderedDict()
+_boards_lock = threading.Lock()
+board_cache_stats = {"bytes": 0, "hits": 0, "misses": 0, "evictions": 0}
+
+
+@functools.lru_cache(maxsize=1)
 def _load_map():
+    """The world map, decoded once per process."""
     return Image.open(MAP_PATH).convert("RGBA")
 
 
-def render_board(country_x: float, country_y: float, round_no: int = 1,
-                 total: int = 5, prompt: str = "Which country is the arrow pointing to?") -> io.BytesIO:
+@functools.lru_cache(maxsize=1)
+def _base_card():
+    """Everything that never changes between rounds: frame, title, the map."""
     base = _load_map()
     mw, mh = base.size
-
     W = mw + 2 * PAD
     H = mh + 2 * PAD + BAR_H
     card = Image.new("RGBA", (W, H), (26, 24, 32, 255))
     d = ImageDraw.Draw(card)
-
-    # title bar
     d.text((PAD, 18), "Map Game", font=f_title(34), fill=INK)
-    rtxt = f"Round {round_no}/{total}"
-    d.text((W - PAD - _text_w(d, rtxt, f_label(20)), 30), rtxt, font=f_label(20), fill=(240, 177, 50))
+    card.alpha_composite(base, (PAD, PAD + BAR_H))
+    return card
 
-    # paste the map
-    mx, my = PAD, PAD + BAR_H
-    card.alpha_composite(base, (mx, my))
 
-    # marker on the country (translate to card coords)
-    cx, cy = mx + country_x, my + country_y
+@functools.lru_cache(maxsize=2)
+def _marker_sprite(from_left: bool):
+    """Glow + target ring + arrow, drawn once around a (SPRITE, SPRITE) anchor."""
+    S = 2 * SPRITE
+    spr = Image.new("RGBA", (S, S), (0, 0, 0, 0))
+    d = ImageDraw.Draw(spr)
+    cx = cy = SPRITE
 
     # soft glow ring
-    glow = Image.new("RGBA", (W, H), (0, 0, 0, 0))
-    gd = ImageDraw.Draw(glow)
     for r, a in ((30, 40), (22, 70), (15, 120)):
-        gd.ellipse([cx - r, cy - r, cx + r, cy + r], fill=(228, 70, 70, a))
-    card.alpha_composite(glow)
+        d.ellipse([cx - r, cy - r, cx + r, cy + r], fill=(228, 70, 70, a))
 
     # crisp target ring
     d.ellipse([cx - 13, cy - 13, cx + 13, cy + 13], outline=MARK, width=4)
@@ -61,7 +72,6 @@ def render_board(country_x: float, country_y: float, round_no: int = 1,
 
     # arrow coming from the open ocean toward the marker (pick a clear direction)
     # default from upper-left; if near the left edge, come from upper-right.
-    from_left = cx > mw * 0.30 + mx
     ax = cx - 64 if from_left else cx + 64
     ay = cy - 64
     tipx = cx - 16 if from_left else cx + 16
@@ -72,12 +82,58 @@ def render_board(country_x: float, country_y: float, round_no: int = 1,
         d.polygon([(tipx, tipy), (tipx - 16, tipy - 2), (tipx - 2, tipy - 16)], fill=MARK)
     else:
         d.polygon([(tipx, tipy), (tipx + 16, tipy - 2), (tipx + 2, tipy - 16)], fill=MARK)
+    return spr
+
+
+def _board_png(country_x: float, country_y: float, round_no: int, total: int) -> bytes:
+    """The encoded board, from a byte-bounded LRU (a full 1024-entry lru_cache
+    of boards held ~140 MB)."""
+    key = (country_x, country_y, round_no, total)
+    with _boards_lock:
+        png = _boards.get(key)
+        if png is not None:
+            _boards.move_to_end(key)
+            board_cache_stats["hits"] += 1
+            return png
+    png = _encode_board(country_x, country_y, round_no, total)
+    with _boards_lock:
+        board_cache_stats["misses"] += 1
+        if key not in _boards:
+            _boards[key] = png
+            board_cache_stats["bytes"] += len(png)
+        while board_cache_stats["bytes"] > BOARD_CACHE_BYTES and len(_boards) > 1:
+            _, old = _boards.popitem(last=False)
+            board_cache_stats["bytes"] -= len(old)
+            board_cache_stats["evictions"] += 1
+    return png
+
+
+def _encode_board(country_x: float, country_y: float, round_no: int, total: int) -> bytes:
+    card = _base_card().copy()
+    W, H = card.size
+    mw = _load_map().size[0]
+    d = ImageDraw.Draw(card)
+
+    rtxt = f"Round {round_no}/{total}"
+    d.text((W - PAD - _text_w(d, rtxt, f_label(20)), 30), rtxt, font=f_label(20), fill=(240, 177, 50))
 
-    # prompt under the map
-    d.text((PAD, H - 0), "", font=f_reg(18), fill=DIM)  # noop keeps layout stable
+    # marker on the country (translate to card coords)
+    mx, my = PAD, PAD + BAR_H
+    cx, cy = mx + country_x, my + country_y
+    from_left = cx > mw * 0.30 + mx
+    spr = _marker_sprite(from_left)
+    # paste (not alpha_composite) so sprites near the edge clip instead of erroring
+    card.paste(spr, (round(cx) - SPRITE, round(cy) - SPRITE), spr)
 
     card.putalpha(_round_mask((W, H), 24))
     buf = io.BytesIO()
     card.convert("RGB").save(buf, format="PNG")
-    buf.seek(0)
-    return buf
+    return buf.getvalue()
+
+
+def render_board(country_x: float, country_y: float, round_no: int = 1,
+                 total: int = 5, prompt: str = "Which country is the arrow pointing to?") -> io.BytesIO:
+    """The round card as PNG. The base map and marker sprites are built once and
+    each (country, round, total) board is encoded once, then served from memory;
+    every call gets its own BytesIO since discord.File consumes it."""
+    return io.BytesIO(_board_png(float(country_x), float(country_y), int(round_no), int(total)))
@@ -41,13 +41,13 @@ def category_embed(cat: str, prefix: str, is_admin: bool, is_owner: bool) -> dis
                                   "tax", "multiplier", "rate set", "rebalance"],
             "Audit & investigation": ["admin audit", "admin audit tx", "admin suspicious",
                                        "admin weekly", "admin export", "admin auditexport"],
-            "Sobs & users": ["admin givesob", "admin givetoken", "admin reset", "admin recount",
+            "Sobs & users": ["admin givesob", "admin givetoken", "admin reset", "admin recount", "admin rollup",
                              "admin threshold", "admin emoji", "treasury", "treasury give"],
             "Shop setup": ["shop additem", "shop setstock", "shop removeitem",
                            "shop setchannel", "shop setrole", "shop boostmult"],
             "Server & access": ["admin profile", "admin config", "admin whoami", "perms",
                                 "disable", "enable", "commandconfig", "announce",
-                                "admin stats", "admin servers", "admin import"],
+                                "admin stats", "admin servers", "admin providers", "admin import"],
         }
         by_name = {c["name"]: c for c in cmds}
         used = set()
@@ -20,12 +20,36 @@ from an open :meth:`Database.transaction` so the ledger writes commit/roll back
 together with the balance change they describe. That atomicity is the whole
 point — a balance can never move without a matching ledger row, and a ledger
 row can never exist without the balance having moved.
+
+Rows are stored compactly: event types as ids from ``ledger_event_types``
+and our hex transaction ids as 16-byte blobs. :func:`record_many` writes all
+the rows of one action in a single INSERT. The read helpers decode both back,
+so callers still see event names and hex transaction ids.
+
+Rows older than ARCHIVE_AFTER_DAYS are moved (not changed) to
+``economy_ledger_archive`` by :func:`archive_before`. The read helpers below
+cover hot + archive, so callers never need to know which tier a row is in. Recent-window queries
+(protection pricing, the last 24h/7d) only ever touch hot rows.
+
+Per-(user, event type) earned/spent/count totals live in ``ledger_rollup``,
+kept current by an insert trigger on ``economy_ledger`` (so in the same
+transaction as the row) and recomputable with :func:`rebuild_rollup`.
+Summaries and the stats card read it instead of grouping a user's history.
+
+Balances reconcile against ``ledger_checkpoints``: per-user running totals up
+to a global watermark, advanced by :func:`advance_checkpoints`. Reconciliation
+only sums the rows after a user's checkpoint, so it doesn't grow with history.
 """
 from __future__ import annotations
 
 import json
 import time
 import uuid
+import asyncio
+from typing import Iterable
+
+ARCHIVE_AFTER_DAYS = 90      # rows older than this move to the archive tier
+ARCHIVE_CHUNK = 5000         # rows moved / folded per transaction
 
 
 def new_tx_id() -> str:
@@ -68,6 +92,118 @@ EVT_IMPORT = "import"
 EVT_RESET = "reset"
 EVT_RECOUNT = "recount"
 EVT_CORRECTION = "manual_correction"
+EVT_PROTECTION_AUTOBALANCE = "protection_autobalance"
+
+# Rows store event types as small integers (ledger_event_types). These ids are
+# seeded by schema migrations 223/225 and must never change — append only, and
+# seed each new one in a migration. Ids below _INTERNED_EVENT_BASE are kept for
+# this list; names not listed here are interned on first use from there up.
+_INTERNED_EVENT_BASE = 1000
+_EVENT_IDS = {name: i for i, name in enumerate((
+    EVT_REACTION_ADD, EVT_REACTION_REMOVE, EVT_REACTION_BLOCKED, EVT_SNITCH_WIPE,
+    EVT_SNITCH_REWARD, EVT_SNITCH_STEAL, EVT_SNITCH_TAX, EVT_DAILY, EVT_ADMIN_GIVE,
+    EVT_ADMIN_REMOVE, EVT_TREASURY_PAYOUT, EVT_SHOP_BASE, EVT_SHOP_TAX, EVT_SHOP_BURN,
+    EVT_INV_ADD, EVT_INV_CONSUME, EVT_SERVER_CLAIM, EVT_AUDIT_STEAL, EVT_SHIELD_BLOCK,
+    EVT_EFFECT_ACTIVATE, EVT_EFFECT_EXPIRE, EVT_EFFECT_CHARGE, EVT_ROULETTE_ESCROW,
+    EVT_ROULETTE_PAYOUT, EVT_ROULETTE_REFUND, EVT_STEAL_SUCCESS, EVT_STEAL_FAIL_FEE,
+    EVT_STEAL_TAX, EVT_STEAL_BURN, EVT_MAPGAME_REWARD, EVT_IMPORT, EVT_RESET,
+    EVT_RECOUNT, EVT_CORRECTION, EVT_PROTECTION_AUTOBALANCE,
+), 1)}
+
+
+def event_code(event_type: str) -> int:
+    """The stored id of a canonical event type, for ``event_id = ?`` filters."""
+    return _EVENT_IDS[event_type]
+
+
+def _tx_key(transaction_id: str):
+    """How a transaction id is stored: our uuid4 hex ids as 16-byte blobs,
+    anything else (game ids, legacy rows) as given."""
+    tx = str(transaction_id)
+    if len(tx) == 32 and tx == tx.lower():
+        try:
+            return bytes.fromhex(tx)
+        except ValueError:
+            pass
+    return tx
+
+
+async def _event_id(conn, event_type: str) -> int:
+    eid = _EVENT_IDS.get(event_type)
+    if eid is not None:
+        return eid
+    await conn.execute(
+        "INSERT OR IGNORE INTO ledger_event_types (event_id, name) "
+        "SELECT MAX(COALESCE(MAX(event_id), 0) + 1, ?), ? FROM ledger_event_types",
+        (_INTERNED_EVENT_BASE, event_type))
+    cur = await conn.execute("SELECT event_id FROM ledger_event_types WHERE name = ?", (event_type,))
+    row = await cur.fetchone()
+    await cur.close()
+    return int(row["event_id"])
+
+
+# Row columns in table order, and the same list decoded for readers: event
+# names instead of ids, blob transaction ids back to hex.
+_COLUMNS = (
+    "transaction_id", "guild_id", "created_at", "event_id",
+    "subject_id", "actor_id", "counterparty_id",
+    "delta", "balance_before", "balance_after",
+    "item_key", "item_name", "quantity", "price",
+    "message_id", "game_id",
+    "tax_amount", "treasury_amount", "burned_amount", "multiplier_ref",
+    "metadata",
+)
+_ENTRY_DEFAULTS = {
+    "subject_id": 0, "actor_id": 0, "counterparty_id": 0,
+    "delta": 0, "balance_before": 0, "balance_after": 0,
+    "item_key": "", "item_name": "", "quantity": 0, "price": 0,
+    "message_id": 0, "game_id": "",
+    "tax_amount": 0, "treasury_amount": 0, "burned_amount": 0, "multiplier_ref": "",
+    "metadata": None,
+}
+_DECODED = ", ".join(
+    ["ledger_id",
+     "CASE WHEN typeof(transaction_id) = 'blob' THEN lower(hex(transaction_id)) "
+     "ELSE transaction_id END AS transaction_id",
+     "guild_id", "created_at",
+     "(SELECT name FROM ledger_event_types t WHERE t.event_id = l.event_id) AS event_type"]
+    + list(_COLUMNS[4:])
+)
+
+
+async def record_many(
+    conn,
+    entries: list[dict],
+    *,
+    guild_id: int,
+    transaction_id: str,
+    created_at: int | None = None,
+) -> None:
+    """Append all the rows of one logical action in a single INSERT.
+
+    Each entry is a dict of :func:`record`'s per-row fields (``event_type``
+    is required). Same rule as :func:`record`: only inside an open
+    Database.transaction().
+    """
+    if not entries:
+        return
+    ts = int(time.time()) if created_at is None else int(created_at)
+    tx = _tx_key(transaction_id)
+    args: list = []
+    for entry in entries:
+        fields = dict(entry)
+        eid = await _event_id(conn, fields.pop("event_type"))
+        unknown = set(fields) - set(_ENTRY_DEFAULTS)
+        if unknown:
+            raise TypeError(f"unknown ledger field(s): {', '.join(sorted(unknown))}")
+        row = {**_ENTRY_DEFAULTS, **fields}
+        meta = row["metadata"]
+        row["metadata"] = json.dumps(meta, ensure_ascii=False, default=str) if meta else ""
+        args += [tx, int(guild_id), ts, eid]
+        args += [row[c] for c in _COLUMNS[4:]]
+    values = ", ".join(["(" + ",".join("?" * len(_COLUMNS)) + ")"] * len(entries))
+    await conn.execute(
+        f"INSERT INTO economy_ledger ({', '.join(_COLUMNS)}) VALUES {values}", tuple(args))
 
 
 async def record(
@@ -76,54 +212,187 @@ async def record(
     guild_id: int,
     event_type: str,
     transaction_id: str,
-    subject_id: int = 0,
-    actor_id: int = 0,
-    counterparty_id: int = 0,
-    delta: int = 0,
-    balance_before: int = 0,
-    balance_after: int = 0,
-    item_key: str = "",
-    item_name: str = "",
-    quantity: int = 0,
-    price: int = 0,
-    message_id: int = 0,
-    game_id: str = "",
-    tax_amount: int = 0,
-    treasury_amount: int = 0,
-    burned_amount: int = 0,
-    multiplier_ref: str = "",
-    metadata: dict | None = None,
     created_at: int | None = None,
+    **fields,
 ) -> None:
     """Append one ledger row on the given (already-open-transaction) connection.
 
     Never call this outside a Database.transaction() — it must commit together
-    with the balance change it records.
+    with the balance change it records. Actions that write several rows should
+    use :func:`record_many`.
     """
-    ts = int(time.time()) if created_at is None else int(created_at)
-    meta = json.dumps(metadata, ensure_ascii=False, default=str) if metadata else ""
+    await record_many(conn, [dict(fields, event_type=event_type)], guild_id=guild_id,
+                      transaction_id=transaction_id, created_at=created_at)
+
+
+def encode_row(row: dict) -> dict:
+    """An exported (decoded) ledger row in the stored encoding, for imports.
+
+    ``event_id`` still holds the event *name*; swap it with
+    :func:`intern_event_ids` on the connection of the transaction that
+    inserts the row, so a rollback elsewhere can't strand the id.
+    """
+    row = dict(row)
+    if "event_type" in row:
+        row["event_id"] = str(row.pop("event_type"))
+    if "transaction_id" in row:
+        row["transaction_id"] = _tx_key(row["transaction_id"])
+    return row
+
+
+async def intern_event_ids(conn, names: Iterable[str]) -> dict[str, int]:
+    """Event name -> event_id, interning unknown names on ``conn``."""
+    return {name: await _event_id(conn, name) for name in set(names)}
+
+
+# ----------------------------------------------------------------------
+# archive tier
+# ----------------------------------------------------------------------
+
+async def archive_before(db, cutoff_ts: int, *, chunk: int = ARCHIVE_CHUNK,
+                         max_chunks: int | None = None) -> int:
+    """Move ledger rows created before cutoff_ts to the archive, oldest first,
+    ``chunk`` rows per transaction so the shared connection is never held for
+    long. Each chunk copies the rows and deletes them from the hot table
+    atomically; ``ledger_rollup`` already counts them. Returns the number of
+    rows moved."""
+    moved = 0
+    done = 0
+    while max_chunks is None or done < max_chunks:
+        async with db.transaction() as conn:
+            cur = await conn.execute(
+                "SELECT MAX(ledger_id) AS hi, COUNT(*) AS n FROM ("
+                "SELECT ledger_id FROM economy_ledger WHERE created_at < ? "
+                "ORDER BY ledger_id LIMIT ?)", (int(cutoff_ts), int(chunk)))
+            row = await cur.fetchone()
+            await cur.close()
+            if row is None or row["hi"] is None:
+                break
+            hi, n = int(row["hi"]), int(row["n"])
+            where = "WHERE ledger_id <= ? AND created_at < ?"
+            args = (hi, int(cutoff_ts))
+            await conn.execute(
+                f"INSERT OR IGNORE INTO economy_ledger_archive SELECT * FROM economy_ledger {where}", args)
+            await conn.execute(f"DELETE FROM economy_ledger {where}", args)
+        moved += n
+        done += 1
+        if n < chunk:
+            break
+        await asyncio.sleep(0)      # let queued work have the connection
+    return moved
+
+
+# ----------------------------------------------------------------------
+# checkpoints
+# ----------------------------------------------------------------------
+
+async def _checkpoint_mark(db) -> int:
+    row = await db.fetchone("SELECT last_ledger_id FROM ledger_checkpoint_mark WHERE id = 0")
+    return int(row["last_ledger_id"]) if row else 0
+
+
+# (guild, subject) totals of the rows in a ledger_id range, across both tiers
+_FOLD_SQL = (
+    "SELECT guild_id, subject_id, MAX(ledger_id) AS last_id, SUM(delta) AS net, "
+    "SUM(CASE WHEN delta > 0 THEN delta ELSE 0 END) AS earned, "
+    "SUM(CASE WHEN delta < 0 THEN -delta ELSE 0 END) AS spent FROM ("
+    "SELECT guild_id, subject_id, ledger_id, delta FROM economy_ledger {where} "
+    "UNION ALL SELECT guild_id, subject_id, ledger_id, delta FROM economy_ledger_archive {where}"
+    ") GROUP BY guild_id, subject_id"
+)
+
+
+async def advance_checkpoints(db, *, chunk: int = ARCHIVE_CHUNK,
+                              max_chunks: int | None = None) -> int:
+    """Fold ledger rows past the watermark into the per-user checkpoints,
+    ``chunk`` rows per transaction. Returns the number of rows folded."""
+    folded = 0
+    done = 0
+    while max_chunks is None or done < max_chunks:
+        async with db.transaction() as conn:
+            cur = await conn.execute("SELECT last_ledger_id FROM ledger_checkpoint_mark WHERE id = 0")
+            row = await cur.fetchone()
+            await cur.close()
+            mark = int(row["last_ledger_id"]) if row else 0
+            cur = await conn.execute(
+                "SELECT MAX(ledger_id) AS hi, COUNT(*) AS n FROM ("
+                "SELECT ledger_id FROM economy_ledger WHERE ledger_id > ? "
+                "UNION ALL SELECT ledger_id FROM economy_ledger_archive WHERE ledger_id > ? "
+                "ORDER BY ledger_id LIMIT ?)", (mark, mark, int(chunk)))
+            row = await cur.fetchone()
+            await cur.close()
+            if row is None or row["hi"] is None:
+                break
+            hi, n = int(row["hi"]), int(row["n"])
+            where = "WHERE ledger_id > ? AND ledger_id <= ?"
+            await conn.execute(
+                "INSERT INTO ledger_checkpoints "
+                "(guild_id, subject_id, last_ledger_id, net, earned, spent, updated_at) "
+                "SELECT guild_id, subject_id, last_id, net, earned, spent, ? FROM ("
+                + _FOLD_SQL.format(where=where) + ") WHERE 1 "
+                "ON CONFLICT(guild_id, subject_id) DO UPDATE SET "
+                "last_ledger_id = excluded.last_ledger_id, net = net + excluded.net, "
+                "earned = earned + excluded.earned, spent = spent + excluded.spent, "
+                "updated_at = excluded.updated_at",
+                (int(time.time()), mark, hi, mark, hi))
+            await conn.execute("UPDATE ledger_checkpoint_mark SET last_ledger_id = ? WHERE id = 0", (hi,))
+        folded += n
+        done += 1
+        if n < chunk:
+            break
+        await asyncio.sleep(0)
+    return folded
+
+
+async def rebuild_checkpoints(conn, guild_id: int) -> None:
+    """Recompute one guild's checkpoints from its rows up to the watermark.
+
+    For when a guild's ledger changes below the watermark (an import). Like
+    :func:`record`, runs on a connection that already has a transaction open.
+    """
+    cur = await conn.execute("SELECT last_ledger_id FROM ledger_checkpoint_mark WHERE id = 0")
+    row = await cur.fetchone()
+    await cur.close()
+    mark = int(row["last_ledger_id"]) if row else 0
+    await conn.execute("DELETE FROM ledger_checkpoints WHERE guild_id = ?", (int(guild_id),))
+    where = "WHERE guild_id = ? AND ledger_id <= ?"
     await conn.execute(
-        """
-        INSERT INTO economy_ledger (
-            transaction_id, guild_id, created_at, event_type,
-            subject_id, actor_id, counterparty_id,
-            delta, balance_before, balance_after,
-            item_key, item_name, quantity, price,
-            message_id, game_id,
-            tax_amount, treasury_amount, burned_amount, multiplier_ref,
-            metadata
-        ) VALUES (?,?,?,?, ?,?,?, ?,?,?, ?,?,?,?, ?,?, ?,?,?,?, ?)
-        """,
-        (
-            transaction_id, int(guild_id), ts, event_type,
-            int(subject_id), int(actor_id), int(counterparty_id),
-            int(delta), int(balance_before), int(balance_after),
-            item_key, item_name, int(quantity), int(price),
-            int(message_id), game_id,
-            int(tax_amount), int(treasury_amount), int(burned_amount), multiplier_ref,
-            meta,
-        ),
+        "INSERT INTO ledger_checkpoints "
+        "(guild_id, subject_id, last_ledger_id, net, earned, spent, updated_at) "
+        "SELECT guild_id, subject_id, last_id, net, earned, spent, ? FROM ("
+        + _FOLD_SQL.format(where=where) + ")",
+        (int(time.time()), int(guild_id), mark, int(guild_id), mark))
+
+
+async def rebuild_rollup(conn, guild_id: int | None = None) -> int:
+    """Recompute ``ledger_rollup`` from the rows of both tiers, for one guild
+    or all of them. Runs on a connection with a transaction open, like
+    :func:`record`. Returns the number of rollup rows written."""
+    where, args = ("WHERE guild_id = ?", (int(guild_id),)) if guild_id is not None else ("", ())
+    await conn.execute(f"DELETE FROM ledger_rollup {where}", args)
+    cur = await conn.execute(
+        "INSERT INTO ledger_rollup (guild_id, subject_id, event_id, earned, spent, n) "
+        "SELECT guild_id, subject_id, event_id, "
+        "SUM(CASE WHEN delta > 0 THEN delta ELSE 0 END), "
+        "SUM(CASE WHEN delta < 0 THEN -delta ELSE 0 END), COUNT(*) FROM ("
+        f"SELECT guild_id, subject_id, event_id, delta FROM economy_ledger {where} "
+        f"UNION ALL SELECT guild_id, subject_id, event_id, delta FROM economy_ledger_archive {where}"
+        ") GROUP BY guild_id, subject_id, event_id",
+        args * 2,
+    )
+    return max(cur.rowcount, 0)
+
+
+async def _by_event(db, guild_id: int, user_id: int) -> dict[str, dict]:
+    """{event_type: {earned, spent, count}} for one user, from the rollup."""
+    rows = await db.fetchall(
+        "SELECT t.name AS event_type, earned, spent, n "
+        "FROM ledger_rollup JOIN ledger_event_types t USING (event_id) "
+        "WHERE guild_id=? AND subject_id=?",
+        (guild_id, user_id),
     )
+    return {str(r["event_type"]): {"earned": int(r["earned"]), "spent": int(r["spent"]),
+                                   "count": int(r["n"])} for r in rows}
 
 
 # ----------------------------------------------------------------------
@@ -132,61 +401,84 @@ async def record(
 
 async def user_summary(db, guild_id: int, user_id: int) -> dict:
     """Total earned/spent by event type for one user, from the ledger."""
-    rows = await db.fetchall(
-        "SELECT event_type, "
-        "COALESCE(SUM(CASE WHEN delta > 0 THEN delta ELSE 0 END),0) AS earned, "
-        "COALESCE(SUM(CASE WHEN delta < 0 THEN -delta ELSE 0 END),0) AS spent, "
-        "COUNT(*) AS n "
-        "FROM economy_ledger WHERE guild_id=? AND subject_id=? GROUP BY event_type",
-        (guild_id, user_id),
-    )
-    by_event = {
-        str(r["event_type"]): {
-            "earned": int(r["earned"]),
-            "spent": int(r["spent"]),
-            "count": int(r["n"]),
-        }
-        for r in rows
-    }
-    totals = await db.fetchone(
-        "SELECT COALESCE(SUM(CASE WHEN delta>0 THEN delta ELSE 0 END),0) AS earned, "
-        "COALESCE(SUM(CASE WHEN delta<0 THEN -delta ELSE 0 END),0) AS spent, "
-        "COALESCE(SUM(delta),0) AS net "
-        "FROM economy_ledger WHERE guild_id=? AND subject_id=?",
-        (guild_id, user_id),
-    )
+    by_event = await _by_event(db, guild_id, user_id)
+    earned = sum(e["earned"] for e in by_event.values())
+    spent = sum(e["spent"] for e in by_event.values())
     return {
         "by_event": by_event,
-        "total_earned": int(totals["earned"]) if totals else 0,
-        "total_spent": int(totals["spent"]) if totals else 0,
-        "ledger_net": int(totals["net"]) if totals else 0,
+        "total_earned": earned,
+        "total_spent": spent,
+        "ledger_net": earned - spent,
     }
 
 
 async def user_entries(db, guild_id: int, user_id: int, *, page: int = 0, per_page: int = 15) -> list[dict]:
     rows = await db.fetchall(
-        "SELECT * FROM economy_ledger WHERE guild_id=? AND subject_id=? "
+        f"SELECT {_DECODED} FROM economy_ledger l WHERE guild_id=? AND subject_id=? "
+        f"UNION ALL SELECT {_DECODED} FROM economy_ledger_archive l WHERE guild_id=? AND subject_id=? "
         "ORDER BY ledger_id DESC LIMIT ? OFFSET ?",
-        (guild_id, user_id, per_page, page * per_page),
+        (guild_id, user_id, guild_id, user_id, per_page, page * per_page),
     )
     return [dict(r) for r in rows]
 
 
 async def transaction_entries(db, transaction_id: str) -> list[dict]:
     rows = await db.fetchall(
-        "SELECT * FROM economy_ledger WHERE transaction_id=? ORDER BY ledger_id ASC",
-        (transaction_id,),
+        f"SELECT {_DECODED} FROM economy_ledger l WHERE transaction_id IN (?, ?) "
+        f"UNION ALL SELECT {_DECODED} FROM economy_ledger_archive l WHERE transaction_id IN (?, ?) "
+        "ORDER BY ledger_id ASC",
+        (_tx_key(transaction_id), transaction_id) * 2,
     )
     return [dict(r) for r in rows]
 
 
-async def reconcile_user(db, guild_id: int, user_id: int, live_balance: int) -> dict:
-    """Compare a user's live balance against the sum of their ledger deltas."""
-    row = await db.fetchone(
-        "SELECT COALESCE(SUM(delta),0) AS net FROM economy_ledger WHERE guild_id=? AND subject_id=?",
+def guild_entries_query(guild_id: int) -> tuple[str, tuple]:
+    """SQL + args selecting every ledger row of a guild (archive + hot), oldest
+    first, decoded — for the export to iterate off a cursor."""
+    return (
+        f"SELECT {_DECODED} FROM economy_ledger_archive l WHERE guild_id=? "
+        f"UNION ALL SELECT {_DECODED} FROM economy_ledger l WHERE guild_id=? "
+        "ORDER BY ledger_id",
+        (guild_id, guild_id),
+    )
+
+
+async def user_net(db, guild_id: int, user_id: int) -> int:
+    """Sum of a user's ledger deltas: their checkpoint plus the rows after it
+    (hot and archive), so the cost is bounded by the checkpoint interval."""
+    cp = await db.fetchone(
+        "SELECT last_ledger_id, net FROM ledger_checkpoints WHERE guild_id=? AND subject_id=?",
         (guild_id, user_id),
     )
-    ledger_net = int(row["net"]) if row else 0
+    last = int(cp["last_ledger_id"]) if cp else 0
+    row = await db.fetchone(
+        "SELECT (SELECT COALESCE(SUM(delta),0) FROM economy_ledger "
+        "        WHERE guild_id=? AND subject_id=? AND ledger_id > ?) + "
+        "       (SELECT COALESCE(SUM(delta),0) FROM economy_ledger_archive "
+        "        WHERE guild_id=? AND subject_id=? AND ledger_id > ?) AS net",
+        (guild_id, user_id, last, guild_id, user_id, last),
+    )
+    return (int(cp["net"]) if cp else 0) + (int(row["net"]) if row else 0)
+
+
+async def guild_net_by_user(db, guild_id: int) -> dict[int, int]:
+    """{subject_id: net delta} for a whole guild: checkpoints plus every row
+    past the global watermark."""
+    mark = await _checkpoint_mark(db)
+    rows = await db.fetchall(
+        "SELECT subject_id, SUM(net) AS net FROM ("
+        "SELECT subject_id, net FROM ledger_checkpoints WHERE guild_id=? "
+        "UNION ALL SELECT subject_id, delta FROM economy_ledger WHERE ledger_id > ? AND guild_id=? "
+        "UNION ALL SELECT subject_id, delta FROM economy_ledger_archive WHERE ledger_id > ? AND guild_id=?"
+        ") GROUP BY subject_id",
+        (guild_id, mark, guild_id, mark, guild_id),
+    )
+    return {int(r["subject_id"]): int(r["net"] or 0) for r in rows}
+
+
+async def reconcile_user(db, guild_id: int, user_id: int, live_balance: int) -> dict:
+    """Compare a user's live balance against the sum of their ledger deltas."""
+    ledger_net = await user_net(db, guild_id, user_id)
     return {
         "user_id": int(user_id),
         "live_balance": int(live_balance),
@@ -202,17 +494,10 @@ async def stats_breakdown(db, guild_id: int, user_id: int) -> dict:
     Earned (positive deltas) and spent (negative deltas) are mapped from the
     ledger event types into player-facing categories.
     """
-    rows = await db.fetchall(
-        "SELECT event_type, "
-        "COALESCE(SUM(CASE WHEN delta>0 THEN delta ELSE 0 END),0) AS earned, "
-        "COALESCE(SUM(CASE WHEN delta<0 THEN -delta ELSE 0 END),0) AS spent "
-        "FROM economy_ledger WHERE guild_id=? AND subject_id=? GROUP BY event_type",
-        (guild_id, user_id),
-    )
     e = {"reactions": 0, "snitch": 0, "audit": 0, "daily": 0, "games": 0}
     s = {"shop": 0, "tax": 0, "audits": 0, "games": 0}
-    for r in rows:
-        ev = str(r["event_type"]); earned = int(r["earned"]); spent = int(r["spent"])
+    for ev, r in (await _by_event(db, guild_id, user_id)).items():
+        earned = r["earned"]; spent = r["spent"]
         if ev in (EVT_REACTION_ADD,):
             e["reactions"] += earned
         elif ev in (EVT_SNITCH_REWARD, EVT_SNITCH_STEAL):
@@ -26,6 +26,8 @@ from __future__ import annotations
 
 import time
 
+from core import ledger
+
 # ---- tunables (chosen for this bot) ----------------------------------------
 # Audit damage (must match economy.py AUDIT_* — imported, not duplicated).
 WARD_FRACTION = 0.35       # Audit Ward  = 35% of one Basic Audit loss
@@ -141,8 +143,8 @@ class Protection:
         row = await db.fetchone(
             "SELECT COALESCE(AVG(-delta),0) AS avg_loss, COUNT(*) AS n "
             "FROM economy_ledger WHERE guild_id=? AND subject_id=? "
-            "AND event_type='snitch_wipe' AND delta<0 AND created_at>=?",
-            (guild_id, user_id, since),
+            "AND event_id=? AND delta<0 AND created_at>=?",
+            (guild_id, user_id, ledger.event_code(ledger.EVT_SNITCH_WIPE), since),
         )
         if row and int(row["n"]) > 0 and float(row["avg_loss"]) > 0:
             return max(MIN_SNITCH_RISK, int(round(float(row["avg_loss"]))))
@@ -256,12 +258,14 @@ class Protection:
         # attacks suffered (snitch wipes + audits) in the last day
         atk = await db.fetchone(
             "SELECT COUNT(*) AS n FROM economy_ledger WHERE guild_id=? AND created_at>=? "
-            "AND event_type IN ('snitch_wipe','audit_steal')", (guild_id, since))
+            "AND event_id IN (?,?)", (guild_id, since, ledger.event_code(ledger.EVT_SNITCH_WIPE),
+                                       ledger.event_code(ledger.EVT_AUDIT_STEAL)))
         # protection purchases in the last day
         buys = await db.fetchone(
             "SELECT COUNT(*) AS n FROM economy_ledger WHERE guild_id=? AND created_at>=? "
-            "AND event_type='shop_purchase_base_cost' AND item_key IN "
-            "('shield','guardian','reflect','audit_ward','vault_ward')", (guild_id, since))
+            "AND event_id=? AND item_key IN "
+            "('shield','guardian','reflect','audit_ward','vault_ward')",
+            (guild_id, since, ledger.event_code(ledger.EVT_SHOP_BASE)))
         attacks = int(atk["n"]) if atk else 0
         purchases = int(buys["n"]) if buys else 0
 
@@ -279,10 +283,9 @@ class Protection:
         new = min(self.FACTOR_MAX, max(self.FACTOR_MIN, round(new, 2)))
         if abs(new - cur) >= 0.01:
             await self.set_price_factor(guild_id, new)
-            from core import ledger
             async with db.transaction() as conn:
                 await ledger.record(
-                    conn, guild_id=guild_id, event_type="protection_autobalance",
+                    conn, guild_id=guild_id, event_type=ledger.EVT_PROTECTION_AUTOBALANCE,
                     transaction_id=ledger.new_tx_id(), delta=0,
                     metadata={"from": cur, "to": new, "reason": reason,
                               "attacks": attacks, "purchases": purchases})
@@ -515,6 +515,468 @@ CREATE TABLE IF NOT EXISTS afk_status (
 """
 
 
+
+# ---------------------------------------------------------------------------
+# Migration 218: running money-supply counters per guild.
+#
+# total_supply / players (>0) / active_players (>=10) used to be aggregated
+# over every sob_users row on each snapshot, multiplier suggestion and rate
+# recommendation. Triggers on sob_users keep these in step inside the SAME
+# transaction as every balance write (reactions, spends, games, resets,
+# recounts, imports), so reads are a single-row lookup. Economy.verify_counters
+# re-derives them and repairs any drift.
+# ---------------------------------------------------------------------------
+_ECONOMY_COUNTERS = """
+CREATE TABLE IF NOT EXISTS economy_counters (
+    guild_id       INTEGER PRIMARY KEY,
+    total_supply   INTEGER NOT NULL DEFAULT 0,   -- SUM of positive balances
+    players        INTEGER NOT NULL DEFAULT 0,   -- users with balance > 0
+    active_players INTEGER NOT NULL DEFAULT 0    -- users with balance >= 10
+);
+
+INSERT OR REPLACE INTO economy_counters (guild_id, total_supply, players, active_players)
+SELECT guild_id,
+       COALESCE(SUM(CASE WHEN sobs_received_alltime > 0 THEN sobs_received_alltime ELSE 0 END), 0),
+       COALESCE(SUM(sobs_received_alltime > 0), 0),
+       COALESCE(SUM(sobs_received_alltime >= 10), 0)
+FROM sob_users GROUP BY guild_id;
+
+CREATE TRIGGER IF NOT EXISTS trg_sob_users_counters_ins
+AFTER INSERT ON sob_users
+BEGIN
+    INSERT INTO economy_counters (guild_id, total_supply, players, active_players)
+    VALUES (NEW.guild_id, MAX(NEW.sobs_received_alltime, 0),
+            NEW.sobs_received_alltime > 0, NEW.sobs_received_alltime >= 10)
+    ON CONFLICT(guild_id) DO UPDATE SET
+        total_supply   = total_supply + excluded.total_supply,
+        players        = players + excluded.players,
+        active_players = active_players + excluded.active_players;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_sob_users_counters_upd
+AFTER UPDATE OF sobs_received_alltime ON sob_users
+WHEN OLD.sobs_received_alltime IS NOT NEW.sobs_received_alltime
+BEGIN
+    INSERT INTO economy_counters (guild_id, total_supply, players, active_players)
+    VALUES (NEW.guild_id,
+            MAX(NEW.sobs_received_alltime, 0) - MAX(OLD.sobs_received_alltime, 0),
+            (NEW.sobs_received_alltime > 0) - (OLD.sobs_received_alltime > 0),
+            (NEW.sobs_received_alltime >= 10) - (OLD.sobs_received_alltime >= 10))
+    ON CONFLICT(guild_id) DO UPDATE SET
+        total_supply   = total_supply + excluded.total_supply,
+        players        = players + excluded.players,
+        active_players = active_players + excluded.active_players;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_sob_users_counters_del
+AFTER DELETE ON sob_users
+BEGIN
+    UPDATE economy_counters SET
+        total_supply   = total_supply - MAX(OLD.sobs_received_alltime, 0),
+        players        = players - (OLD.sobs_received_alltime > 0),
+        active_players = active_players - (OLD.sobs_received_alltime >= 10)
+    WHERE guild_id = OLD.guild_id;
+END;
+"""
+
+
+
+# ---------------------------------------------------------------------------
+# Migration 219: log-bucketed balance histogram per guild.
+#
+# A balance's bucket is (decimal digits * 100 + its first two digits), e.g.
+# 4,730 -> 447 covering [4,700, 4,800). That is ~90 buckets per decade (<=10%
+# wide), computed with plain string functions so no SQLite math extension is
+# needed. Maintained by triggers like economy_counters; lets Economy answer
+# any balance percentile (p65 reference, median) by reading a few hundred
+# rows instead of every sob_users row. Buckets only hold balances > 0.
+# ---------------------------------------------------------------------------
+_BALANCE_HISTOGRAM = """
+CREATE TABLE IF NOT EXISTS balance_histogram (
+    guild_id INTEGER NOT NULL,
+    bucket   INTEGER NOT NULL,
+    n        INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, bucket)
+) WITHOUT ROWID;
+
+INSERT OR REPLACE INTO balance_histogram (guild_id, bucket, n)
+SELECT guild_id,
+       length(sobs_received_alltime) * 100 + CAST(substr(sobs_received_alltime, 1, 2) AS INTEGER),
+       COUNT(*)
+FROM sob_users WHERE sobs_received_alltime > 0
+GROUP BY 1, 2;
+
+CREATE TRIGGER IF NOT EXISTS trg_sob_users_hist_ins
+AFTER INSERT ON sob_users
+WHEN NEW.sobs_received_alltime > 0
+BEGIN
+    INSERT INTO balance_histogram (guild_id, bucket, n)
+    VALUES (NEW.guild_id,
+            length(NEW.sobs_received_alltime) * 100
+                + CAST(substr(NEW.sobs_received_alltime, 1, 2) AS INTEGER), 1)
+    ON CONFLICT(guild_id, bucket) DO UPDATE SET n = n + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_sob_users_hist_upd
+AFTER UPDATE OF sobs_received_alltime ON sob_users
+WHEN OLD.sobs_received_alltime IS NOT NEW.sobs_received_alltime
+BEGIN
+    UPDATE balance_histogram SET n = n - 1
+    WHERE OLD.sobs_received_alltime > 0 AND guild_id = OLD.guild_id
+      AND bucket = length(OLD.sobs_received_alltime) * 100
+                   + CAST(substr(OLD.sobs_received_alltime, 1, 2) AS INTEGER);
+    INSERT INTO balance_histogram (guild_id, bucket, n)
+    SELECT NEW.guild_id,
+           length(NEW.sobs_received_alltime) * 100
+               + CAST(substr(NEW.sobs_received_alltime, 1, 2) AS INTEGER), 1
+    WHERE NEW.sobs_received_alltime > 0
+    ON CONFLICT(guild_id, bucket) DO UPDATE SET n = n + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_sob_users_hist_del
+AFTER DELETE ON sob_users
+WHEN OLD.sobs_received_alltime > 0
+BEGIN
+    UPDATE balance_histogram SET n = n - 1
+    WHERE guild_id = OLD.guild_id
+      AND bucket = length(OLD.sobs_received_alltime) * 100
+                   + CAST(substr(OLD.sobs_received_alltime, 1, 2) AS INTEGER);
+END;
+"""
+
+
+# Economy snapshots keyed by an INTEGER slot (unix start of the period) instead
+# of a stringified timestamp in `day`, so the primary key serves range scans.
+# `resolution` is the period length in seconds: 1800 for raw half-hour points,
+# 3600 / 86400 once Economy.compact_snapshots has downsampled older rows.
+# Legacy YYYY-MM-DD rows become daily points. Rebuilt in one transaction.
+_ECONOMY_SLOTS = """
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS economy_snapshots_new (
+    guild_id   INTEGER NOT NULL,
+    slot       INTEGER NOT NULL,          -- unix start of the period (UTC)
+    resolution INTEGER NOT NULL DEFAULT 1800,
+    total_sobs INTEGER NOT NULL DEFAULT 0,
+    players    INTEGER NOT NULL DEFAULT 0,
+    created_at INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, slot)
+) WITHOUT ROWID;
+
+INSERT OR IGNORE INTO economy_snapshots_new
+    (guild_id, slot, resolution, total_sobs, players, created_at)
+SELECT guild_id, slot, resolution, total_sobs, players, created_at FROM (
+    SELECT guild_id,
+           CASE WHEN day NOT GLOB '*[^0-9]*' AND day <> ''
+                THEN CAST(day AS INTEGER)
+                ELSE CAST(strftime('%s', day) AS INTEGER) END AS slot,
+           CASE WHEN day NOT GLOB '*[^0-9]*' AND day <> ''
+                THEN 1800 ELSE 86400 END AS resolution,
+           total_sobs, players, created_at
+    FROM economy_snapshots
+)
+WHERE slot IS NOT NULL;
+
+DROP TABLE economy_snapshots;
+
+ALTER TABLE economy_snapshots_new RENAME TO economy_snapshots;
+
+COMMIT;
+"""
+
+
+# Cold tier for economy_ledger. ledger.archive_before() moves rows older than
+# the horizon here in chunks (ledger_id is preserved; the hot table is
+# AUTOINCREMENT so ids are never reused). Only two indexes, and per-(guild,
+# subject, event_type) totals of everything archived live in
+# ledger_archive_rollup so summaries never scan the cold rows.
+_LEDGER_ARCHIVE = """
+CREATE TABLE IF NOT EXISTS economy_ledger_archive (
+    ledger_id      INTEGER PRIMARY KEY,
+    transaction_id TEXT    NOT NULL,
+    guild_id       INTEGER NOT NULL,
+    created_at     INTEGER NOT NULL,
+    event_type     TEXT    NOT NULL,
+    subject_id     INTEGER NOT NULL DEFAULT 0,
+    actor_id       INTEGER NOT NULL DEFAULT 0,
+    counterparty_id INTEGER NOT NULL DEFAULT 0,
+    delta          INTEGER NOT NULL DEFAULT 0,
+    balance_before INTEGER NOT NULL DEFAULT 0,
+    balance_after  INTEGER NOT NULL DEFAULT 0,
+    item_key       TEXT    NOT NULL DEFAULT '',
+    item_name      TEXT    NOT NULL DEFAULT '',
+    quantity       INTEGER NOT NULL DEFAULT 0,
+    price          INTEGER NOT NULL DEFAULT 0,
+    message_id     INTEGER NOT NULL DEFAULT 0,
+    game_id        TEXT    NOT NULL DEFAULT '',
+    tax_amount     INTEGER NOT NULL DEFAULT 0,
+    treasury_amount INTEGER NOT NULL DEFAULT 0,
+    burned_amount  INTEGER NOT NULL DEFAULT 0,
+    multiplier_ref TEXT    NOT NULL DEFAULT '',
+    metadata       TEXT    NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_ledger_archive_subject ON economy_ledger_archive(guild_id, subject_id, ledger_id);
+CREATE INDEX IF NOT EXISTS idx_ledger_archive_tx      ON economy_ledger_archive(transaction_id);
+
+CREATE TABLE IF NOT EXISTS ledger_archive_rollup (
+    guild_id   INTEGER NOT NULL,
+    subject_id INTEGER NOT NULL,
+    event_type TEXT    NOT NULL,
+    earned     INTEGER NOT NULL DEFAULT 0,
+    spent      INTEGER NOT NULL DEFAULT 0,
+    n          INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, subject_id, event_type)
+) WITHOUT ROWID;
+"""
+
+
+# Per-user running totals of the ledger up to a global watermark, advanced in
+# the background by ledger.advance_checkpoints(). Reconciliation adds only the
+# rows after a user's last_ledger_id instead of summing their whole history;
+# the (guild, subject, ledger_id) index makes that a short range seek.
+_LEDGER_CHECKPOINTS = """
+CREATE TABLE IF NOT EXISTS ledger_checkpoints (
+    guild_id       INTEGER NOT NULL,
+    subject_id     INTEGER NOT NULL,
+    last_ledger_id INTEGER NOT NULL DEFAULT 0,
+    net            INTEGER NOT NULL DEFAULT 0,
+    earned         INTEGER NOT NULL DEFAULT 0,
+    spent          INTEGER NOT NULL DEFAULT 0,
+    updated_at     INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, subject_id)
+) WITHOUT ROWID;
+
+-- single row: every ledger_id <= last_ledger_id is folded into the checkpoints
+CREATE TABLE IF NOT EXISTS ledger_checkpoint_mark (
+    id             INTEGER PRIMARY KEY CHECK (id = 0),
+    last_ledger_id INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO ledger_checkpoint_mark (id, last_ledger_id) VALUES (0, 0);
+
+CREATE INDEX IF NOT EXISTS idx_ledger_subject_id ON economy_ledger(guild_id, subject_id, ledger_id);
+"""
+
+
+# Compact ledger rows. Event types are interned to small integers in
+# ledger_event_types (the canonical ones with fixed ids, mirrored by
+# ledger._EVENT_IDS; anything else is added on first use), and new
+# transaction ids are stored as 16-byte blobs instead of 32 hex chars. Rows
+# written before this keep their text transaction ids (this SQLite has no
+# unhex()); ledger.py reads both. Both tiers are rebuilt so archive_before()
+# can still copy rows across with SELECT *.
+_LEDGER_COMPACT = """
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS ledger_event_types (
+    event_id INTEGER PRIMARY KEY,
+    name     TEXT    NOT NULL UNIQUE
+);
+INSERT OR IGNORE INTO ledger_event_types (event_id, name) VALUES
+    (1, 'sob_reaction_added'),
+    (2, 'sob_reaction_removed'),
+    (3, 'blocked_sob_reaction'),
+    (4, 'snitch_wipe'),
+    (5, 'snitch_reward'),
+    (6, 'snitch_steal'),
+    (7, 'snitch_tax'),
+    (8, 'daily_claim'),
+    (9, 'admin_givesob'),
+    (10, 'admin_sob_removal'),
+    (11, 'treasury_payout'),
+    (12, 'shop_purchase_base_cost'),
+    (13, 'shop_tax'),
+    (14, 'shop_burn'),
+    (15, 'inventory_added'),
+    (16, 'inventory_consumed'),
+    (17, 'server_item_claim'),
+    (18, 'audit_steal'),
+    (19, 'shield_block'),
+    (20, 'effect_activation'),
+    (21, 'effect_expiration'),
+    (22, 'effect_charge_consumed'),
+    (23, 'roulette_escrow_deposit'),
+    (24, 'roulette_payout'),
+    (25, 'roulette_refund'),
+    (26, 'steal_success'),
+    (27, 'steal_fail_fee'),
+    (28, 'steal_tax'),
+    (29, 'steal_burn'),
+    (30, 'mapgame_reward'),
+    (31, 'import'),
+    (32, 'reset'),
+    (33, 'recount'),
+    (34, 'manual_correction');
+INSERT OR IGNORE INTO ledger_event_types (name)
+    SELECT DISTINCT event_type FROM economy_ledger;
+INSERT OR IGNORE INTO ledger_event_types (name)
+    SELECT DISTINCT event_type FROM economy_ledger_archive;
+
+CREATE TABLE economy_ledger_new (
+    ledger_id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    transaction_id BLOB    NOT NULL,
+    guild_id       INTEGER NOT NULL,
+    created_at     INTEGER NOT NULL,
+    event_id       INTEGER NOT NULL,
+    subject_id     INTEGER NOT NULL DEFAULT 0,
+    actor_id       INTEGER NOT NULL DEFAULT 0,
+    counterparty_id INTEGER NOT NULL DEFAULT 0,
+    delta          INTEGER NOT NULL DEFAULT 0,
+    balance_before INTEGER NOT NULL DEFAULT 0,
+    balance_after  INTEGER NOT NULL DEFAULT 0,
+    item_key       TEXT    NOT NULL DEFAULT '',
+    item_name      TEXT    NOT NULL DEFAULT '',
+    quantity       INTEGER NOT NULL DEFAULT 0,
+    price          INTEGER NOT NULL DEFAULT 0,
+    message_id     INTEGER NOT NULL DEFAULT 0,
+    game_id        TEXT    NOT NULL DEFAULT '',
+    tax_amount     INTEGER NOT NULL DEFAULT 0,
+    treasury_amount INTEGER NOT NULL DEFAULT 0,
+    burned_amount  INTEGER NOT NULL DEFAULT 0,
+    multiplier_ref TEXT    NOT NULL DEFAULT '',
+    metadata       TEXT    NOT NULL DEFAULT ''
+);
+
+INSERT INTO economy_ledger_new (ledger_id, transaction_id, guild_id, created_at, event_id, subject_id, actor_id, counterparty_id, delta, balance_before, balance_after, item_key, item_name, quantity, price, message_id, game_id, tax_amount, treasury_amount, burned_amount, multiplier_ref, metadata)
+SELECT l.ledger_id, transaction_id, guild_id, created_at, t.event_id, subject_id, actor_id, counterparty_id, delta, balance_before, balance_after, item_key, item_name, quantity, price, message_id, game_id, tax_amount, treasury_amount, burned_amount, multiplier_ref, metadata
+FROM economy_ledger l JOIN ledger_event_types t ON t.name = l.event_type;
+
+-- keep the id sequence even if every hot row has been archived
+INSERT INTO sqlite_sequence (name, seq)
+    SELECT 'economy_ledger_new', 0
+    WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'economy_ledger_new');
+UPDATE sqlite_sequence SET seq = (
+    SELECT MAX(seq) FROM sqlite_sequence WHERE name IN ('economy_ledger', 'economy_ledger_new'))
+    WHERE name = 'economy_ledger_new';
+
+DROP TABLE economy_ledger;
+ALTER TABLE economy_ledger_new RENAME TO economy_ledger;
+
+CREATE INDEX IF NOT EXISTS idx_ledger_guild_time  ON economy_ledger(guild_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_ledger_subject     ON economy_ledger(guild_id, subject_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_ledger_subject_id  ON economy_ledger(guild_id, subject_id, ledger_id);
+CREATE INDEX IF NOT EXISTS idx_ledger_tx          ON economy_ledger(transaction_id);
+CREATE INDEX IF NOT EXISTS idx_ledger_event       ON economy_ledger(guild_id, event_id);
+CREATE INDEX IF NOT EXISTS idx_ledger_message     ON economy_ledger(guild_id, message_id);
+CREATE INDEX IF NOT EXISTS idx_ledger_game        ON economy_ledger(guild_id, game_id);
+
+CREATE TABLE economy_ledger_archive_new (
+    ledger_id      INTEGER PRIMARY KEY,
+    transaction_id BLOB    NOT NULL,
+    guild_id       INTEGER NOT NULL,
+    created_at     INTEGER NOT NULL,
+    event_id       INTEGER NOT NULL,
+    subject_id     INTEGER NOT NULL DEFAULT 0,
+    actor_id       INTEGER NOT NULL DEFAULT 0,
+    counterparty_id INTEGER NOT NULL DEFAULT 0,
+    delta          INTEGER NOT NULL DEFAULT 0,
+    balance_before INTEGER NOT NULL DEFAULT 0,
+    balance_after  INTEGER NOT NULL DEFAULT 0,
+    item_key       TEXT    NOT NULL DEFAULT '',
+    item_name      TEXT    NOT NULL DEFAULT '',
+    quantity       INTEGER NOT NULL DEFAULT 0,
+    price          INTEGER NOT NULL DEFAULT 0,
+    message_id     INTEGER NOT NULL DEFAULT 0,
+    game_id        TEXT    NOT NULL DEFAULT '',
+    tax_amount     INTEGER NOT NULL DEFAULT 0,
+    treasury_amount INTEGER NOT NULL DEFAULT 0,
+    burned_amount  INTEGER NOT NULL DEFAULT 0,
+    multiplier_ref TEXT    NOT NULL DEFAULT '',
+    metadata       TEXT    NOT NULL DEFAULT ''
+);
+
+INSERT INTO economy_ledger_archive_new (ledger_id, transaction_id, guild_id, created_at, event_id, subject_id, actor_id, counterparty_id, delta, balance_before, balance_after, item_key, item_name, quantity, price, message_id, game_id, tax_amount, treasury_amount, burned_amount, multiplier_ref, metadata)
+SELECT l.ledger_id, transaction_id, guild_id, created_at, t.event_id, subject_id, actor_id, counterparty_id, delta, balance_before, balance_after, item_key, item_name, quantity, price, message_id, game_id, tax_amount, treasury_amount, burned_amount, multiplier_ref, metadata
+FROM economy_ledger_archive l JOIN ledger_event_types t ON t.name = l.event_type;
+
+DROP TABLE economy_ledger_archive;
+ALTER TABLE economy_ledger_archive_new RENAME TO economy_ledger_archive;
+
+CREATE INDEX IF NOT EXISTS idx_ledger_archive_subject ON economy_ledger_archive(guild_id, subject_id, ledger_id);
+CREATE INDEX IF NOT EXISTS idx_ledger_archive_tx      ON economy_ledger_archive(transaction_id);
+
+COMMIT;
+"""
+
+
+# Per-(guild, subject, event) earned/spent/count over the whole ledger, kept
+# current by a trigger on economy_ledger inserts (same transaction as the
+# row), so summaries and the !sob stats card read a handful of rows instead of
+# grouping a user's history. Archiving moves rows without touching it, so it
+# supersedes ledger_archive_rollup. ledger.rebuild_rollup() recomputes it.
+_LEDGER_ROLLUP = """
+CREATE TABLE IF NOT EXISTS ledger_rollup (
+    guild_id   INTEGER NOT NULL,
+    subject_id INTEGER NOT NULL,
+    event_id   INTEGER NOT NULL,
+    earned     INTEGER NOT NULL DEFAULT 0,
+    spent      INTEGER NOT NULL DEFAULT 0,
+    n          INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, subject_id, event_id)
+) WITHOUT ROWID;
+
+INSERT OR REPLACE INTO ledger_rollup (guild_id, subject_id, event_id, earned, spent, n)
+SELECT guild_id, subject_id, event_id, SUM(earned), SUM(spent), SUM(n) FROM (
+    SELECT guild_id, subject_id, event_id,
+           SUM(CASE WHEN delta > 0 THEN delta ELSE 0 END) AS earned,
+           SUM(CASE WHEN delta < 0 THEN -delta ELSE 0 END) AS spent,
+           COUNT(*) AS n
+    FROM economy_ledger GROUP BY guild_id, subject_id, event_id
+    UNION ALL
+    SELECT r.guild_id, r.subject_id, t.event_id, r.earned, r.spent, r.n
+    FROM ledger_archive_rollup r JOIN ledger_event_types t ON t.name = r.event_type
+) GROUP BY guild_id, subject_id, event_id;
+
+DROP TABLE IF EXISTS ledger_archive_rollup;
+
+CREATE TRIGGER IF NOT EXISTS trg_ledger_rollup_ins
+AFTER INSERT ON economy_ledger
+BEGIN
+    INSERT INTO ledger_rollup (guild_id, subject_id, event_id, earned, spent, n)
+    VALUES (NEW.guild_id, NEW.subject_id, NEW.event_id,
+            MAX(NEW.delta, 0), MAX(-NEW.delta, 0), 1)
+    ON CONFLICT(guild_id, subject_id, event_id) DO UPDATE SET
+        earned = earned + excluded.earned,
+        spent  = spent + excluded.spent,
+        n      = n + 1;
+END;
+"""
+
+
+# Canonical event ids (ledger._EVENT_IDS) are appended over time, but 223 let
+# every other name take the next free id from 35, so the next canonical type
+# would have landed on an id already holding some interned name. Pin
+# protection_autobalance at 35 and move the interned names to 1000 + their old
+# id, keeping everything below 1000 for canonical types; ledger._event_id()
+# interns new names from 1000 up. Rollup ids go through negative values first
+# so no primary key is briefly held twice.
+_LEDGER_EVENT_RANGE = """
+BEGIN;
+
+CREATE TEMP TABLE event_remap AS
+    SELECT event_id AS old_id,
+           CASE WHEN name = 'protection_autobalance' THEN 35 ELSE 1000 + event_id END AS new_id
+    FROM ledger_event_types WHERE event_id >= 35 AND event_id < 1000;
+
+UPDATE economy_ledger SET event_id = (SELECT new_id FROM event_remap WHERE old_id = economy_ledger.event_id)
+    WHERE event_id IN (SELECT old_id FROM event_remap);
+UPDATE economy_ledger_archive SET event_id = (SELECT new_id FROM event_remap WHERE old_id = economy_ledger_archive.event_id)
+    WHERE event_id IN (SELECT old_id FROM event_remap);
+
+UPDATE ledger_rollup SET event_id = -event_id WHERE event_id IN (SELECT old_id FROM event_remap);
+UPDATE ledger_rollup SET event_id = (SELECT new_id FROM event_remap WHERE old_id = -ledger_rollup.event_id)
+    WHERE event_id < 0;
+
+UPDATE ledger_event_types SET event_id = -event_id WHERE event_id IN (SELECT old_id FROM event_remap);
+UPDATE ledger_event_types SET event_id = (SELECT new_id FROM event_remap WHERE old_id = -ledger_event_types.event_id)
+    WHERE event_id < 0;
+INSERT OR IGNORE INTO ledger_event_types (event_id, name) VALUES (35, 'protection_autobalance');
+
+DROP TABLE event_remap;
+
+COMMIT;
+"""
+
+
 MIGRATIONS = [
     (200, "infra_keep", _INFRA),
     (201, "sob_clean_tables", _SOB_CORE),
@@ -534,6 +996,14 @@ MIGRATIONS = [
     (215, "protection_inventory_expiry", _PROTECTION_EXPIRY),
     (216, "steal_events", _STEAL_EVENTS),
     (217, "afk_status", _AFK_STATUS),
+    (218, "economy_counters", _ECONOMY_COUNTERS),
+    (219, "balance_histogram", _BALANCE_HISTOGRAM),
+    (220, "economy_snapshot_slots", _ECONOMY_SLOTS),
+    (221, "ledger_archive", _LEDGER_ARCHIVE),
+    (222, "ledger_checkpoints", _LEDGER_CHECKPOINTS),
+    (223, "ledger_compact", _LEDGER_COMPACT),
+    (224, "ledger_rollup", _LEDGER_ROLLUP),
+    (225, "ledger_event_range", _LEDGER_EVENT_RANGE),
 ]
 
 # Legacy tables the backfill reads from. The migration runner skips the
@@ -350,36 +350,28 @@ class ShopRepo:
 
                 # ledger: base cost (burn for built-ins), tax, inventory add
                 burn = cost if is_builtin else 0
-                await ledger.record(
-                    conn, guild_id=guild_id, event_type=ledger.EVT_SHOP_BASE,
-                    transaction_id=tx, subject_id=user_id, actor_id=user_id,
+                who = dict(subject_id=user_id, actor_id=user_id, item_key=canonical_key)
+                rows = [dict(
+                    who, event_type=ledger.EVT_SHOP_BASE,
                     delta=-total_charge, balance_before=before, balance_after=after,
-                    item_key=canonical_key, item_name=item.get("name", canonical_key),
+                    item_name=item.get("name", canonical_key),
                     quantity=qty, price=int(item["price"]),
                     tax_amount=tax_amount, burned_amount=burn,
-                    metadata={"builtin": is_builtin}, created_at=ts,
-                )
+                    metadata={"builtin": is_builtin},
+                )]
                 if tax_amount > 0:
-                    await ledger.record(
-                        conn, guild_id=guild_id, event_type=ledger.EVT_SHOP_TAX,
-                        transaction_id=tx, subject_id=user_id, actor_id=user_id,
-                        delta=0, balance_before=after, balance_after=after,
-                        item_key=canonical_key, treasury_amount=tax_amount, created_at=ts,
-                    )
+                    rows.append(dict(who, event_type=ledger.EVT_SHOP_TAX,
+                                     balance_before=after, balance_after=after,
+                                     treasury_amount=tax_amount))
                 if burn > 0:
-                    await ledger.record(
-                        conn, guild_id=guild_id, event_type=ledger.EVT_SHOP_BURN,
-                        transaction_id=tx, subject_id=user_id, actor_id=user_id,
-                        delta=0, balance_before=after, balance_after=after,
-                        item_key=canonical_key, burned_amount=burn, created_at=ts,
-                    )
-                await ledger.record(
-                    conn, guild_id=guild_id, event_type=ledger.EVT_INV_ADD,
-                    transaction_id=tx, subject_id=user_id, actor_id=user_id,
-                    delta=0, balance_before=after, balance_after=after,
-                    item_key=canonical_key, item_name=item.get("name", canonical_key),
-                    quantity=qty, created_at=ts,
-                )
+                    rows.append(dict(who, event_type=ledger.EVT_SHOP_BURN,
+                                     balance_before=after, balance_after=after,
+                                     burned_amount=burn))
+                rows.append(dict(who, event_type=ledger.EVT_INV_ADD,
+                                 balance_before=after, balance_after=after,
+                                 item_name=item.get("name", canonical_key), quantity=qty))
+                await ledger.record_many(conn, rows, guild_id=guild_id,
+                                         transaction_id=tx, created_at=ts)
 
         # Split the charge into the sinks AFTER the balance change committed.
         if self.economy is not None and is_builtin:
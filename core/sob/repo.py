@@ -587,24 +587,19 @@ class SobRepo:
                     rb_before, rb_after = await self._apply_delta(
                         conn, guild_id=guild_id, user_id=to_id, delta=net, ts=ts,
                     )
-                    await ledger.record(
-                        conn, guild_id=guild_id, event_type=event_type,
-                        transaction_id=tx, subject_id=from_id,
-                        actor_id=from_id if actor_id is None else actor_id,
-                        counterparty_id=to_id, delta=(sb_after - sb_before),
-                        balance_before=sb_before, balance_after=sb_after,
-                        game_id=game_id, message_id=message_id, tax_amount=tax_amount,
-                        metadata=metadata, created_at=ts,
-                    )
-                    await ledger.record(
-                        conn, guild_id=guild_id, event_type=event_type,
-                        transaction_id=tx, subject_id=to_id,
-                        actor_id=from_id if actor_id is None else actor_id,
-                        counterparty_id=from_id, delta=(rb_after - rb_before),
-                        balance_before=rb_before, balance_after=rb_after,
+                    shared = dict(
+                        event_type=event_type, actor_id=from_id if actor_id is None else actor_id,
                         game_id=game_id, message_id=message_id, tax_amount=tax_amount,
-                        metadata=metadata, created_at=ts,
+                        metadata=metadata,
                     )
+                    await ledger.record_many(conn, [
+                        dict(shared, subject_id=from_id, counterparty_id=to_id,
+                             delta=(sb_after - sb_before),
+                             balance_before=sb_before, balance_after=sb_after),
+                        dict(shared, subject_id=to_id, counterparty_id=from_id,
+                             delta=(rb_after - rb_before),
+                             balance_before=rb_before, balance_after=rb_after),
+                    ], guild_id=guild_id, transaction_id=tx, created_at=ts)
         return net
 
     async def grant_tokens(self, guild_id: int, user_id: int, count: int = 1) -> int:
@@ -274,14 +274,14 @@ class Steal:
                         gain = move - tax
                         # attacker gains gain
                         ab, aa = await self.repo._apply_delta(conn, guild_id=guild_id, user_id=attacker_id, delta=gain, ts=ts)
-                        await ledger.record(conn, guild_id=guild_id, event_type=ledger.EVT_STEAL_SUCCESS,
-                            transaction_id=tx, subject_id=target_id, actor_id=attacker_id,
-                            counterparty_id=attacker_id, delta=-move, balance_before=tb, balance_after=ta,
-                            tax_amount=tax, metadata={"roll": roll, "chance": chance, "lockpick": use_lock})
-                        await ledger.record(conn, guild_id=guild_id, event_type=ledger.EVT_STEAL_SUCCESS,
-                            transaction_id=tx, subject_id=attacker_id, actor_id=attacker_id,
-                            counterparty_id=target_id, delta=gain, balance_before=ab, balance_after=aa,
-                            tax_amount=tax, metadata={"roll": roll, "chance": chance})
+                        await ledger.record_many(conn, [
+                            dict(event_type=ledger.EVT_STEAL_SUCCESS, subject_id=target_id, actor_id=attacker_id,
+                                 counterparty_id=attacker_id, delta=-move, balance_before=tb, balance_after=ta,
+                                 tax_amount=tax, metadata={"roll": roll, "chance": chance, "lockpick": use_lock}),
+                            dict(event_type=ledger.EVT_STEAL_SUCCESS, subject_id=attacker_id, actor_id=attacker_id,
+                                 counterparty_id=target_id, delta=gain, balance_before=ab, balance_after=aa,
+                                 tax_amount=tax, metadata={"roll": roll, "chance": chance}),
+                        ], guild_id=guild_id, transaction_id=tx, created_at=ts)
                         result = {"success": True, "moved": move, "gain": gain, "tax": tax,
                                   "fee": 0, "burned": 0, "chance": chance, "roll": roll}
                     else:
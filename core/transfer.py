@@ -8,7 +8,18 @@ is the safe, idiomatic version of "organize by server" — the data lives in one
 shared DB partitioned by guild_id, and this module gives you a clean seam to
 move a single guild around when you want to.
 
-Format: a self-describing JSON document.
+Format: files are gzipped NDJSON, one JSON object per line, written and read
+a table section at a time so neither side holds a whole guild in memory:
+    {"ignio_export_version": 2, "guild_id": 1440226442012262534, "exported_at": 1719000000}
+    {"__table__": "sob_users"}
+    {...one row...}
+    {...}
+    {"__table__": "sob_events"}
+    ...
+    {"__summary__": {"per_user_summary": [...], "reconciliation": {...}}}
+
+export_guild / import_guild still speak the older self-describing JSON
+document (version 1) for in-memory use and old export files:
     {
       "ignio_export_version": 1,
       "guild_id": 1440226442012262534,
@@ -27,18 +38,32 @@ Design notes
 - Import is idempotent (INSERT OR IGNORE) and scoped to a single guild_id, so
   re-running it won't duplicate rows. Use mode="replace" to wipe that guild's
   rows first if you want a clean overwrite.
+- Import inserts with executemany in chunked transactions, so the shared
+  connection is never held for the whole import. An import that stops part
+  way is finished by re-running it in merge mode.
 - Only sob tables + that guild's settings are moved. Streak tables are ignored.
 """
 
 from __future__ import annotations
 
+import gzip
 import json
 import time
-from typing import Any
+import asyncio
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, Iterator
 
+from core import ledger
 from core.db import Database
 
-EXPORT_VERSION = 1
+EXPORT_VERSION = 1            # in-memory JSON document (export_guild)
+STREAM_EXPORT_VERSION = 2     # gzipped NDJSON file (export_guild_to_file)
+EXPORT_BATCH = 2000           # rows fetched per cursor read while exporting
+IMPORT_CHUNK = 2000           # rows inserted per transaction while importing
+_SECTION = "__table__"
+_SUMMARY = "__summary__"
+
+ProgressFn = Callable[[str, int], Awaitable[None]]
 
 # Tables that hold per-guild sob data, all keyed by guild_id.
 _GUILD_TABLES = ("sob_users", "sob_events", "sob_periods", "guild_settings",
@@ -47,6 +72,21 @@ _GUILD_TABLES = ("sob_users", "sob_events", "sob_periods", "guild_settings",
                  "economy_ledger", "security_log", "game_matches", "user_activity")
 
 
+def _legacy_snapshot_row(row: dict[str, Any]) -> dict[str, Any] | None:
+    """Exports made before migration 220 key snapshots by a TEXT ``day`` (a
+    stringified slot timestamp, or YYYY-MM-DD on the oldest DBs)."""
+    day = str(row.pop("day", "") or "")
+    if day.isdigit():
+        row["slot"], row["resolution"] = int(day), 1800
+    else:
+        try:
+            d = datetime.strptime(day[:10], "%Y-%m-%d").replace(tzinfo=timezone.utc)
+        except ValueError:
+            return None
+        row["slot"], row["resolution"] = int(d.timestamp()), 86400
+    return row
+
+
 async def reconciliation_report(db: Database, guild_id: int) -> dict[str, Any]:
     """Per-user balance-vs-ledger reconciliation for the whole guild.
 
@@ -60,12 +100,7 @@ async def reconciliation_report(db: Database, guild_id: int) -> dict[str, Any]:
         "SELECT user_id, sobs_received_alltime FROM sob_users WHERE guild_id = ?",
         (guild_id,),
     )
-    ledger_rows = await db.fetchall(
-        "SELECT subject_id, COALESCE(SUM(delta),0) AS net FROM economy_ledger "
-        "WHERE guild_id = ? GROUP BY subject_id",
-        (guild_id,),
-    )
-    ledger_net = {int(r["subject_id"]): int(r["net"]) for r in ledger_rows}
+    ledger_net = await ledger.guild_net_by_user(db, guild_id)
     mismatches = []
     reconciled = 0
     for r in rows:
@@ -86,41 +121,63 @@ async def reconciliation_report(db: Database, guild_id: int) -> dict[str, Any]:
     }
 
 
-async def export_guild(db: Database, guild_id: int) -> dict[str, Any]:
-    """Return a JSON-serializable dict containing all sob data for one guild,
-    including the full economy ledger, security log, game escrow history and a
-    balance-vs-ledger reconciliation report."""
-    tables: dict[str, list[dict[str, Any]]] = {}
-    for table in _GUILD_TABLES:
-        try:
-            rows = await db.fetchall(
-                f"SELECT * FROM {table} WHERE guild_id = ?", (guild_id,)
-            )
-            tables[table] = [dict(r) for r in rows]
-        except Exception:
-            # table may not exist yet on older DBs — skip gracefully
-            tables[table] = []
-
-    # per-user earning/spending summary derived from the ledger
-    per_user_summary: list[dict[str, Any]] = []
+def _table_query(table: str, guild_id: int) -> tuple[str, tuple]:
+    if table == "economy_ledger":
+        # archived rows export as ordinary ledger rows, decoded
+        return ledger.guild_entries_query(guild_id)
+    return f"SELECT * FROM {table} WHERE guild_id = ?", (guild_id,)
+
+
+async def _table_batches(db: Database, table: str, guild_id: int,
+                         batch: int = EXPORT_BATCH) -> AsyncIterator[list[dict[str, Any]]]:
+    """One table's rows for a guild, ``batch`` at a time straight off the
+    cursor, so a big table is never held in memory at once."""
+    sql, args = _table_query(table, guild_id)
+    try:
+        cur = await db.execute(sql, args)
+    except Exception:
+        # table may not exist yet on older DBs — skip gracefully
+        return
+    try:
+        while True:
+            rows = await cur.fetchmany(batch)
+            if not rows:
+                break
+            yield [dict(r) for r in rows]
+    finally:
+        await cur.close()
+
+
+async def _summaries(db: Database, guild_id: int) -> tuple[list[dict[str, Any]], dict[str, Any]]:
+    """Per-user earning/spending summary (from the ledger rollup) and the
+    reconciliation report that close every export."""
     try:
         srows = await db.fetchall(
-            "SELECT subject_id, "
-            "COALESCE(SUM(CASE WHEN delta>0 THEN delta ELSE 0 END),0) AS earned, "
-            "COALESCE(SUM(CASE WHEN delta<0 THEN -delta ELSE 0 END),0) AS spent, "
-            "COALESCE(SUM(delta),0) AS net, COUNT(*) AS entries "
-            "FROM economy_ledger WHERE guild_id=? GROUP BY subject_id",
+            "SELECT subject_id, SUM(earned) AS earned, SUM(spent) AS spent, "
+            "SUM(earned) - SUM(spent) AS net, SUM(n) AS entries "
+            "FROM ledger_rollup WHERE guild_id=? GROUP BY subject_id",
             (guild_id,),
         )
         per_user_summary = [dict(r) for r in srows]
     except Exception:
         per_user_summary = []
-
     try:
         recon = await reconciliation_report(db, guild_id)
     except Exception:
         recon = {}
+    return per_user_summary, recon
+
 
+async def export_guild(db: Database, guild_id: int) -> dict[str, Any]:
+    """Return a JSON-serializable dict containing all sob data for one guild,
+    including the full economy ledger, security log, game escrow history and a
+    balance-vs-ledger reconciliation report. Holds everything in memory — use
+    :func:`export_guild_to_file` for big guilds."""
+    tables: dict[str, list[dict[str, Any]]] = {}
+    async with db.snapshot() as snap:
+        for table in _GUILD_TABLES:
+            tables[table] = [r async for rows in _table_batches(snap, table, guild_id) for r in rows]
+        per_user_summary, recon = await _summaries(snap, guild_id)
     return {
         "ignio_export_version": EXPORT_VERSION,
         "guild_id": int(guild_id),
@@ -131,12 +188,147 @@ async def export_guild(db: Database, guild_id: int) -> dict[str, Any]:
     }
 
 
+def _write_lines(f, objs: Iterable[dict[str, Any]]) -> None:
+    f.write("".join(json.dumps(o, ensure_ascii=False) + "\n" for o in objs))
+
+
 async def export_guild_to_file(db: Database, guild_id: int, path: str) -> dict[str, int]:
-    """Export one guild to a JSON file. Returns per-table row counts."""
-    payload = await export_guild(db, guild_id)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(payload, f, ensure_ascii=False, indent=2)
-    return {t: len(rows) for t, rows in payload["tables"].items()}
+    """Stream one guild to a gzipped NDJSON file, a table section at a time.
+    Memory stays bounded by EXPORT_BATCH rows. Every section and the closing
+    summary come from one read snapshot (see Database.snapshot), and encoding
+    plus the gzip writes run in a worker thread, off the event loop.
+    Returns per-table row counts."""
+    counts: dict[str, int] = {}
+    f = await asyncio.to_thread(gzip.open, path, "wt", encoding="utf-8")
+    try:
+        async with db.snapshot() as snap:
+            await asyncio.to_thread(_write_lines, f, [{
+                "ignio_export_version": STREAM_EXPORT_VERSION,
+                "guild_id": int(guild_id), "exported_at": int(time.time())}])
+            for table in _GUILD_TABLES:
+                await asyncio.to_thread(_write_lines, f, [{_SECTION: table}])
+                n = 0
+                async for rows in _table_batches(snap, table, guild_id):
+                    await asyncio.to_thread(_write_lines, f, rows)
+                    n += len(rows)
+                counts[table] = n
+            per_user_summary, recon = await _summaries(snap, guild_id)
+        await asyncio.to_thread(_write_lines, f, [{_SUMMARY: {
+            "per_user_summary": per_user_summary, "reconciliation": recon}}])
+    finally:
+        await asyncio.to_thread(f.close)
+    return counts
+
+
+def _payload_rows(payload: dict[str, Any]) -> Iterator[tuple[str, dict[str, Any] | None]]:
+    """(table, None) at each section start, then (table, row) per row."""
+    tables = payload.get("tables", {})
+    for table in _GUILD_TABLES:
+        yield table, None
+        for row in tables.get(table, []):
+            yield table, row
+
+
+def _stream_rows(lines: Iterable[str]) -> Iterator[tuple[str, dict[str, Any] | None]]:
+    """The same events as :func:`_payload_rows`, parsed line by line from an
+    NDJSON export (after its header line)."""
+    table = None
+    for line in lines:
+        if not line.strip():
+            continue
+        obj = json.loads(line)
+        if _SECTION in obj:
+            table = str(obj[_SECTION])
+            if table in _GUILD_TABLES:
+                yield table, None
+        elif _SUMMARY in obj:
+            return
+        elif table in _GUILD_TABLES:
+            yield table, obj
+
+
+async def _import_rows(
+    db: Database,
+    rows: Iterable[tuple[str, dict[str, Any] | None]],
+    *,
+    dst_guild: int,
+    mode: str,
+    chunk: int,
+    progress: ProgressFn | None,
+) -> dict[str, int]:
+    """Insert the events from _payload_rows/_stream_rows with one executemany
+    per ``chunk`` rows, each chunk in its own transaction so the shared
+    connection is released in between."""
+    inserted: dict[str, int] = {}
+    pending: list[tuple] = []
+    state: dict[str, Any] = {"table": None, "sql": None, "cols": None, "event_at": None}
+
+    async def flush():
+        if pending:
+            async with db.transaction() as conn:
+                if state["event_at"] is not None:
+                    # intern custom event types in the same transaction as the
+                    # rows that reference them
+                    at = state["event_at"]
+                    ids = await ledger.intern_event_ids(conn, (a[at] for a in pending))
+                    pending[:] = [a[:at] + (ids[a[at]],) + a[at + 1:] for a in pending]
+                cur = await conn.executemany(state["sql"], pending)
+                inserted[state["table"]] += max(cur.rowcount, 0)
+            pending.clear()
+            await asyncio.sleep(0)      # let queued work have the connection
+        if progress is not None and state["table"] is not None:
+            await progress(state["table"], inserted[state["table"]])
+
+    try:
+        for table, row in rows:
+            if row is None:
+                await flush()
+                state.update(table=table, sql=None, cols=None, event_at=None)
+                inserted[table] = 0
+                if mode == "replace":
+                    async with db.transaction() as conn:
+                        await conn.execute(f"DELETE FROM {table} WHERE guild_id = ?", (dst_guild,))
+                        if table == "economy_ledger":
+                            await conn.execute("DELETE FROM economy_ledger_archive WHERE guild_id = ?", (dst_guild,))
+                            # the insert trigger re-adds the imported rows
+                            await conn.execute("DELETE FROM ledger_rollup WHERE guild_id = ?", (dst_guild,))
+                continue
+
+            row = dict(row)
+            row["guild_id"] = dst_guild  # re-home if cloning
+            if table == "economy_snapshots" and "slot" not in row:
+                row = _legacy_snapshot_row(row)
+                if row is None:
+                    continue
+            if table == "economy_ledger":
+                row = ledger.encode_row(row)
+            cols = tuple(row.keys())
+            if cols != state["cols"]:
+                await flush()
+                if not all(c.isidentifier() for c in cols):
+                    raise ValueError(f"bad column name in {table}: {cols}")
+                placeholders = ", ".join("?" for _ in cols)
+                col_list = ", ".join(cols)
+                sql = f"INSERT OR IGNORE INTO {table} ({col_list}) VALUES ({placeholders})"
+                if table == "economy_ledger" and "ledger_id" in cols:
+                    # an already-archived row is present, just not in the hot table
+                    sql = (f"INSERT OR IGNORE INTO {table} ({col_list}) SELECT {placeholders} "
+                           "WHERE NOT EXISTS (SELECT 1 FROM economy_ledger_archive WHERE ledger_id = ?)")
+                event_at = cols.index("event_id") if table == "economy_ledger" and "event_id" in cols else None
+                state.update(sql=sql, cols=cols, event_at=event_at)
+            args = tuple(row[c] for c in cols)
+            if table == "economy_ledger" and "ledger_id" in cols:
+                args += (row["ledger_id"],)
+            pending.append(args)
+            if len(pending) >= chunk:
+                await flush()
+        await flush()
+    finally:
+        # the guild's ledger may have changed below the checkpoint watermark,
+        # including when replace mode wiped it and a later chunk failed
+        async with db.transaction() as conn:
+            await ledger.rebuild_checkpoints(conn, dst_guild)
+    return inserted
 
 
 async def import_guild(
@@ -145,9 +337,12 @@ async def import_guild(
     *,
     mode: str = "merge",
     target_guild_id: int | None = None,
+    chunk: int = IMPORT_CHUNK,
+    progress: ProgressFn | None = None,
 ) -> dict[str, int]:
     """
-    Load a previously-exported guild payload into this DB.
+    Load a previously-exported guild payload (the in-memory JSON document)
+    into this DB.
 
     mode:
       "merge"   -> INSERT OR IGNORE (keeps existing rows; safe, idempotent)
@@ -156,46 +351,43 @@ async def import_guild(
     target_guild_id: if given, the data is re-homed under this guild id instead
     of the one in the file (useful for cloning a server's data elsewhere).
 
+    Rows are written ``chunk`` per transaction; if an import stops part way,
+    re-running it in merge mode finishes it. ``progress(table, rows_done)``
+    is awaited after each chunk.
+
     Returns per-table inserted-row counts.
     """
     if int(payload.get("ignio_export_version", 0)) != EXPORT_VERSION:
         raise ValueError(
             f"Unsupported export version: {payload.get('ignio_export_version')}"
         )
-
     src_guild = int(payload["guild_id"])
     dst_guild = int(target_guild_id) if target_guild_id is not None else src_guild
-    tables = payload.get("tables", {})
+    return await _import_rows(db, _payload_rows(payload), dst_guild=dst_guild,
+                              mode=mode, chunk=chunk, progress=progress)
 
-    inserted: dict[str, int] = {}
-    await db.begin()
-    try:
-        for table in _GUILD_TABLES:
-            rows = tables.get(table, [])
 
-            if mode == "replace":
-                await db.execute(f"DELETE FROM {table} WHERE guild_id = ?", (dst_guild,))
-
-            count = 0
-            for row in rows:
-                row = dict(row)
-                row["guild_id"] = dst_guild  # re-home if cloning
-                cols = list(row.keys())
-                placeholders = ", ".join("?" for _ in cols)
-                col_list = ", ".join(cols)
-                cur = await db.execute(
-                    f"INSERT OR IGNORE INTO {table} ({col_list}) VALUES ({placeholders})",
-                    tuple(row[c] for c in cols),
-                )
-                count += cur.rowcount if cur.rowcount and cur.rowcount > 0 else 0
-            inserted[table] = count
-
-        await db.commit()
-    except Exception:
-        await db.rollback()
-        raise
-
-    return inserted
+async def import_guild_stream(
+    db: Database,
+    lines: Iterable[str],
+    *,
+    mode: str = "merge",
+    target_guild_id: int | None = None,
+    chunk: int = IMPORT_CHUNK,
+    progress: ProgressFn | None = None,
+) -> dict[str, int]:
+    """Like :func:`import_guild`, for the NDJSON export read line by line
+    (e.g. an open gzip text file). Only one chunk of rows is in memory."""
+    it = iter(lines)
+    header = json.loads(next(it, "{}") or "{}")
+    if int(header.get("ignio_export_version", 0)) != STREAM_EXPORT_VERSION:
+        raise ValueError(
+            f"Unsupported export version: {header.get('ignio_export_version')}"
+        )
+    src_guild = int(header["guild_id"])
+    dst_guild = int(target_guild_id) if target_guild_id is not None else src_guild
+    return await _import_rows(db, _stream_rows(it), dst_guild=dst_guild,
+                              mode=mode, chunk=chunk, progress=progress)
 
 
 async def import_guild_from_file(
@@ -204,11 +396,20 @@ async def import_guild_from_file(
     *,
     mode: str = "merge",
     target_guild_id: int | None = None,
+    progress: ProgressFn | None = None,
 ) -> dict[str, int]:
-    """Import one guild from a JSON file produced by export_guild_to_file."""
+    """Import one guild from a file produced by export_guild_to_file (gzipped
+    NDJSON), or an older plain JSON export."""
+    with open(path, "rb") as f:
+        gzipped = f.read(2) == b"\x1f\x8b"
+    if gzipped:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return await import_guild_stream(db, f, mode=mode, target_guild_id=target_guild_id,
+                                             progress=progress)
     with open(path, "r", encoding="utf-8") as f:
         payload = json.load(f)
-    return await import_guild(db, payload, mode=mode, target_guild_id=target_guild_id)
+    return await import_guild(db, payload, mode=mode, target_guild_id=target_guild_id,
+                              progress=progress)
 
 
 async def list_guilds(db: Database) -> list[dict[str, int]]:
@@ -2,10 +2,17 @@
 """
 Compact image cards for Utilities: quote cards and captioned images.
 Pure Pillow, reuses the bot's bundled fonts and style. No media is saved.
+
+Inputs go through open_image(): the header is sniffed, oversized declarations
+(decompression bombs) are rejected before any pixel is decoded, JPEGs are
+decoded at reduced scale (Image.draft) and stills are capped to
+STILL_MAX_SIDE, so renders cost the same for a 4000x3000 photo as for a
+screenshot.
 """
 from __future__ import annotations
 
 import io
+import time
 import textwrap
 
 from PIL import Image, ImageDraw
@@ -18,6 +25,65 @@ DIM = (150, 147, 165)
 ACCENT = (240, 177, 50)
 
 
+# ---- input stage -------------------------------------------------------------
+STILL_MAX_SIDE = 1280           # longest edge of a still we composite onto
+AVATAR_SIDE = 112               # quote avatars are drawn at 56px
+INPUT_MAX_PIXELS = 40_000_000   # declared W*H above this is refused undecoded
+INPUT_MAX_FRAME_PIXELS = 600_000_000   # W*H*frames for animations
+
+# leading bytes -> format; anything else is left to the ffmpeg fallback
+_MAGIC = (
+    (b"\x89PNG\r\n\x1a\n", "PNG"),
+    (b"\xff\xd8\xff", "JPEG"),
+    (b"GIF87a", "GIF"),
+    (b"GIF89a", "GIF"),
+    (b"BM", "BMP"),
+)
+
+
+def sniff_image(head: bytes) -> str | None:
+    """Image format from the first bytes, or None if it isn't one we decode."""
+    head = bytes(head[:16])
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "WEBP"
+    for magic, fmt in _MAGIC:
+        if head.startswith(magic):
+            return fmt
+    return None
+
+
+def looks_like_markup(head: bytes) -> bool:
+    """An HTML/JSON/XML error page served where an image was expected."""
+    h = bytes(head[:64]).lstrip().lower()
+    return h.startswith((b"<!doctype", b"<html", b"<?xml", b"{", b"["))
+
+
+def open_image(data: bytes, max_side: int = STILL_MAX_SIDE) -> Image.Image:
+    """Open image bytes ready for compositing, never decoding more than needed.
+
+    Stills come back loaded and no larger than max_side (JPEGs are reduced
+    while decoding); animations come back lazily opened with frame 0 loaded,
+    since caption_gif downscales each frame itself. Raises ValueError for
+    non-images and Image.DecompressionBombError for oversized declarations."""
+    if sniff_image(data) is None:
+        raise ValueError("not a supported image")
+    im = Image.open(io.BytesIO(data))          # header only; nothing decoded yet
+    w, h = im.size
+    frames = getattr(im, "n_frames", 1)
+    if w * h > INPUT_MAX_PIXELS or w * h * frames > INPUT_MAX_FRAME_PIXELS:
+        raise Image.DecompressionBombError(f"image too large: {w}x{h}x{frames}")
+    if getattr(im, "is_animated", False):
+        im.load()
+        return im
+    if im.format == "JPEG":
+        # DCT scaling: decode at 1/2, 1/4 or 1/8 size, still >= the target
+        im.draft("RGB", (max_side, max_side))
+    im.load()
+    if max(im.size) > max_side:
+        im.thumbnail((max_side, max_side), Image.LANCZOS)
+    return im
+
+
 def _wrap_to_width(draw, text, font, max_w):
     """Word-wrap text to fit a pixel width; returns list of lines."""
     words = text.split()
@@ -66,7 +132,7 @@ def quote_card(display_name: str, text: str, timestamp: str,
     # avatar
     ax, ay, asz = 28, 28, 56
     if avatar is not None:
-        av = avatar.convert("RGBA").resize((asz, asz))
+        av = avatar.convert("RGBA").resize((asz, asz), Image.LANCZOS, reducing_gap=2.0)
         mask = Image.new("L", (asz, asz), 0)
         ImageDraw.Draw(mask).ellipse([0, 0, asz, asz], fill=255)
         img.paste(av, (ax, ay), mask)
@@ -130,69 +196,225 @@ def quote_card(display_name: str, text: str, timestamp: str,
     return buf
 
 
+# ---- caption_gif budgets --------------------------------------------------
+# Large GIFs are downscaled, frame-decimated and encoded against one shared
+# palette so they stay animated without unbounded CPU/RAM. Frames beyond
+# GIF_MAX_SOURCE_FRAMES or a render that blows GIF_TIME_BUDGET degrade
+# gracefully (truncated loop, or a still as the last resort).
+GIF_MAX_SIDE = 480              # longest edge of the captioned media area
+GIF_MAX_PIXELS = 480 * 360      # media-area pixel cap after downscale
+GIF_MAX_FRAMES = 120            # frames actually encoded
+GIF_MAX_SOURCE_FRAMES = 1500    # frames we are willing to decode at all
+GIF_TIME_BUDGET = 8.0           # seconds of render time before we stop decoding
+GIF_MIN_DELAY = 20              # ms; browsers clamp anything faster anyway
+
+
+def _gif_scaled_size(W: int, H: int) -> tuple[int, int]:
+    """Fit (W, H) inside the side + pixel budget, preserving aspect."""
+    scale = min(1.0, GIF_MAX_SIDE / max(W, H), (GIF_MAX_PIXELS / float(W * H)) ** 0.5)
+    return max(1, int(W * scale)), max(1, int(H * scale))
+
+
+def _caption_bar(W: int, lines, font, line_h: int, bar_h: int) -> Image.Image:
+    bar = Image.new("RGBA", (W, bar_h), (255, 255, 255, 255))
+    d = ImageDraw.Draw(bar)
+    y = 14
+    for ln in lines:
+        lw = _text_w(d, ln, font)
+        d.text(((W - lw) // 2, y), ln, font=font, fill=(15, 15, 18))
+        y += line_h
+    return bar
+
+
+GIF_PALETTE_PROBE = 96         # width of the thumbnail used to check palette fit
+GIF_PALETTE_MISS = 48          # a channel off by more than this is a miss...
+GIF_PALETTE_MISS_SHARE = 0.005  # ...and this share of missed pixels means re-palette
+_CAPTION_INKS = ((255, 255, 255), (15, 15, 18))   # the caption bar, kept exact
+
+
+def _global_palette(first: Image.Image, source: Image.Image) -> Image.Image:
+    """Build the starting palette from the first rendered frame plus the
+    source GIF's colour table as seen at frame 0. GIFs with per-frame local
+    tables can introduce colours later; _palette_misses() catches those and
+    the frame gets a fresh palette. The caption bar's white and ink are always
+    present exactly."""
+    sample = first.convert("RGB")
+    src_pal = source.getpalette() if source.mode == "P" else None
+    if src_pal:
+        n = len(src_pal) // 3
+        swatch = Image.new("RGB", (n, 1))
+        swatch.putdata([tuple(src_pal[i * 3:i * 3 + 3]) for i in range(n)])
+        swatch = swatch.resize((max(n, sample.width), 8), Image.NEAREST)
+        mosaic = Image.new("RGB", (max(sample.width, swatch.width), sample.height + 8), (255, 255, 255))
+        mosaic.paste(sample, (0, 0))
+        mosaic.paste(swatch, (0, sample.height))
+        sample = mosaic
+    return _frame_palette(sample)
+
+
+def _frame_palette(sample: Image.Image) -> Image.Image:
+    """A 256-entry palette: median cut over `sample`, plus the caption inks."""
+    keep = 256 - len(_CAPTION_INKS)
+    pal = sample.convert("RGB").quantize(colors=keep, method=Image.MEDIANCUT).getpalette()[:keep * 3]
+    pal += [0] * (keep * 3 - len(pal))
+    # Pillow maps colours through a coarse lookup cube, so a near-ink entry
+    # (e.g. 252-grey) can win for pure white; snap those onto the ink itself
+    for i in range(0, len(pal), 3):
+        for ink in _CAPTION_INKS:
+            if max(abs(pal[i + k] - ink[k]) for k in range(3)) <= 6:
+                pal[i:i + 3] = ink
+    for ink in _CAPTION_INKS:
+        pal += list(ink)
+    out = Image.new("P", (1, 1))
+    out.putpalette(pal)
+    return out
+
+
+def _palette_misses(rgb: Image.Image, palette: Image.Image) -> bool:
+    """True if `palette` can't represent a noticeable part of the frame (a
+    colour that first shows up in a later frame), checked on a thumbnail."""
+    from PIL import ImageChops
+
+    w = min(GIF_PALETTE_PROBE, rgb.width)
+    probe = rgb.resize((w, max(1, rgb.height * w // rgb.width)), Image.BILINEAR)
+    mapped = probe.quantize(palette=palette, dither=Image.Dither.NONE).convert("RGB")
+    r, g, b = ImageChops.difference(probe, mapped).split()
+    worst = ImageChops.lighter(ImageChops.lighter(r, g), b)
+    missed = sum(worst.histogram()[GIF_PALETTE_MISS + 1:])
+    return missed > GIF_PALETTE_MISS_SHARE * probe.width * probe.height
+
+
 def caption_gif(base: Image.Image, caption: str, max_bytes: int = 8 * 1024 * 1024):
     """Caption an animated GIF, preserving animation. Returns (BytesIO, is_animated).
-    Falls back to a first-frame still if the GIF is too big/slow to render safely.
 
-    Correctly composites partial/delta frames (GIF disposal) onto a running
-    canvas so frames that only store changed pixels don't render as blank/white."""
+    Budgeted pipeline: each frame is downscaled before compositing, frames are
+    decimated to fit GIF_MAX_FRAMES / GIF_TIME_BUDGET (skipped delays are folded
+    into the kept frame so playback speed is unchanged), every frame is mapped
+    onto one shared palette (a frame showing colours it lacks switches to a
+    local palette of its own), identical consecutive frames are merged, and the
+    GIF is stream-encoded frame by frame so only one frame is held at a time.
+    Falls back to a first-frame still only if even the budgeted render fails
+    or exceeds max_bytes.
+
+    Partial/delta frames are composited onto a running canvas (GIF disposal)
+    so frames that only store changed pixels don't render as blank/white."""
+    from PIL import GifImagePlugin
+
     cap = (caption or "").strip()
     n_frames = getattr(base, "n_frames", 1)
-    if n_frames > 150 or (base.size[0] * base.size[1]) > 1_500_000:
+
+    def _still():
         base.seek(0)
         return caption_image(base.convert("RGBA"), cap), False
 
+    if n_frames > GIF_MAX_SOURCE_FRAMES:
+        return _still()
+
+    W, H = _gif_scaled_size(*base.size)
     scratch = ImageDraw.Draw(Image.new("RGBA", (10, 10)))
-    W, H = base.size
     size = max(20, min(46, W // 16))
     font = f_title(size)
     lines = _wrap_to_width(scratch, cap[:140], font, W - 40)[:3]
     line_h = size + 8
     bar_h = 20 + len(lines) * line_h + 10
+    template = Image.new("RGBA", (W, H + bar_h), (255, 255, 255, 255))
+    template.paste(_caption_bar(W, lines, font, line_h, bar_h), (0, 0))
 
-    frames = []
-    durations = []
+    step = max(1, -(-n_frames // GIF_MAX_FRAMES))   # ceil
+    started = time.monotonic()
+    buf = io.BytesIO()
+    palette = None
+    pending = None          # (P-frame, raw bytes, duration, palette, local) not yet written
+    shown = None            # (raw bytes, palette) of the last frame written
+    written = 0
     try:
-        # running canvas that carries previous frame content (handles disposal)
+        # running canvas (at output size) that carries previous frame content
         prev = Image.new("RGBA", (W, H), (0, 0, 0, 0))
+        acc_ms = 0
         for i in range(n_frames):
+            if time.monotonic() - started > GIF_TIME_BUDGET:
+                # out of time: end the loop here rather than drop the animation
+                break
             base.seek(i)
-            # composite this (possibly partial) frame onto the previous canvas
+            acc_ms += base.info.get("duration", 80) or 80
+            # decimation: only render every `step`-th frame (plus the last one)
+            if i % step and i != n_frames - 1:
+                continue
             cur = base.convert("RGBA")
-            canvas = prev.copy()
-            canvas.alpha_composite(cur)
-            prev = canvas.copy()
-
-            # flatten the fully-composited frame onto white, then add caption bar
-            flat = Image.new("RGBA", (W, H), (255, 255, 255, 255))
-            flat.alpha_composite(canvas)
-
-            out = Image.new("RGBA", (W, H + bar_h), (255, 255, 255, 255))
-            out.paste(flat, (0, bar_h))
-            d = ImageDraw.Draw(out)
-            y = 14
-            for ln in lines:
-                lw = _text_w(d, ln, font)
-                d.text(((W - lw) // 2, y), ln, font=font, fill=(15, 15, 18))
-                y += line_h
-            frames.append(out.convert("RGB").convert("P", palette=Image.ADAPTIVE, colors=256))
-            durations.append(base.info.get("duration", 80))
+            if cur.size != (W, H):
+                cur = cur.resize((W, H), Image.BILINEAR)
+            prev.alpha_composite(cur)
+
+            out = template.copy()
+            out.alpha_composite(prev, (0, bar_h))
+            rgb = out.convert("RGB")
+            if palette is None:
+                palette = first_palette = _global_palette(rgb, base)
+            elif _palette_misses(rgb, palette):
+                # a colour the current palette lacks: this frame (and the ones
+                # after it, until the next miss) use a palette of their own
+                palette = _frame_palette(rgb)
+            frame = rgb.quantize(palette=palette, dither=Image.Dither.NONE)
+            raw = frame.tobytes()
+            local = palette is not first_palette
+            dur, acc_ms = acc_ms, 0
+
+            if pending is not None and pending[1] == raw and pending[3] is palette:
+                # identical to the previous frame: just hold that one longer
+                pending = (pending[0], raw, pending[2] + dur, palette, local)
+            else:
+                if pending is not None:
+                    shown = _gif_emit(buf, pending, shown, GifImagePlugin)
+                    written += 1
+                pending = (frame, raw, dur, palette, local)
+
+            if buf.tell() > max_bytes:
+                return _still()
+        if pending is not None:
+            shown = _gif_emit(buf, pending, shown, GifImagePlugin)
+            written += 1
+        buf.write(b";")  # GIF trailer
     except Exception:
-        base.seek(0)
-        return caption_image(base.convert("RGBA"), cap), False
+        return _still()
 
-    buf = io.BytesIO()
-    frames[0].save(buf, format="GIF", save_all=True, append_images=frames[1:],
-                   duration=durations, loop=0, disposal=1, optimize=False)
-    if buf.tell() > max_bytes:
-        base.seek(0)
-        return caption_image(base.convert("RGBA"), cap), False
+    if written < 2 or buf.tell() > max_bytes:
+        return _still()
     buf.seek(0)
     return buf, True
 
 
+def _gif_emit(buf: io.BytesIO, pending, shown, gif_plugin):
+    """Append one frame to a streaming GIF (header on the first frame). Later
+    frames only store the rectangle that changed since the last shown frame
+    when both use the same palette (so indices compare directly); a frame on a
+    different palette than the header's carries a local colour table.
+    Returns what was shown: (raw indices, palette)."""
+    from PIL import ImageChops
+
+    frame, raw, dur, palette, local = pending
+    offset = (0, 0)
+    if shown is None:
+        header, _ = gif_plugin.getheader(frame, info={"loop": 0, "duration": dur})
+        for chunk in header:
+            buf.write(chunk)
+    elif shown[1] is palette:
+        a = Image.frombytes("L", frame.size, shown[0])
+        b = Image.frombytes("L", frame.size, raw)
+        bbox = ImageChops.difference(a, b).getbbox() or (0, 0, 1, 1)
+        if bbox != (0, 0) + frame.size:
+            frame = frame.crop(bbox)
+            offset = bbox[:2]
+    for chunk in gif_plugin.getdata(frame, offset, duration=max(GIF_MIN_DELAY, dur), disposal=1,
+                                    include_color_table=local):
+        buf.write(chunk)
+    return raw, palette
+
+
 def caption_image(base: Image.Image, caption: str) -> io.BytesIO:
     """Add a top caption bar to an image, auto-wrapped to fit. Returns PNG."""
+    if max(base.size) > STILL_MAX_SIDE:
+        base = base.copy()
+        base.thumbnail((STILL_MAX_SIDE, STILL_MAX_SIDE), Image.LANCZOS)
     base = base.convert("RGBA")
     W, H = base.size
     cap = (caption or "").strip()
@@ -0,0 +1,179 @@
+# core/utilities/chatbuffer.py
+"""
+Per-channel rolling buffer of recent chat, fed by on_message, for !catchup.
+
+Reading the window with channel.history on every !catchup costs API calls
+and re-sends the whole transcript to the LLM. Instead each channel keeps a
+small ring of recent human messages (in memory only — bounded by count, age
+and channel LRU, deleted messages are forgotten, edits replace the buffered
+text, nothing is persisted). Channels of guilds with utilities turned off are
+pause()d: their ring is dropped and coverage restarts when recording resumes.
+
+The buffer knows how far back it is complete ("coverage"): from when the bot
+started listening, minus anything that fell off the ring. window() returns
+None when asked for more than it saw, and the caller falls back to history
+once and seed()s the result.
+
+For map-reduce summaries, chunk_entries() groups a window into fixed,
+clock-aligned time chunks; chunk_key() names a chunk by (channel, chunk
+start, content hash) so overlapping catchups reuse chunk summaries.
+"""
+from __future__ import annotations
+
+import time
+import hashlib
+from collections import OrderedDict, deque
+
+RING_SIZE = 400              # messages kept per channel
+MAX_CHANNELS = 300           # channels tracked (LRU)
+MAX_AGE = 4 * 3600           # longest !catchup window
+CHUNK_SECONDS = 10 * 60      # map-reduce chunk width (clock-aligned)
+
+
+def keep_for_summary(content: str) -> str | None:
+    """The text worth summarising, or None for empty lines / command spam."""
+    c = (content or "").strip()
+    if not c:
+        return None
+    # skip obvious command spam (any common prefix) so it doesn't pollute the summary
+    if c[:1] in "!?./$%&>" and len(c) < 40:
+        return None
+    return c
+
+
+class ChatBuffer:
+    def __init__(self, ring_size: int = RING_SIZE, max_channels: int = MAX_CHANNELS,
+                 max_age: float = MAX_AGE):
+        self.ring_size = ring_size
+        self.max_channels = max_channels
+        self.max_age = max_age
+        # channel_id -> deque[(ts, message_id, text)], oldest first
+        self._rings: "OrderedDict[int, deque]" = OrderedDict()
+        # channel_id -> timestamp the ring is complete from
+        self._covered: dict[int, float] = {}
+        # channel_id -> when it was last paused (LRU; no ring while paused)
+        self._paused: "OrderedDict[int, float]" = OrderedDict()
+        self._started = time.time()
+        self._last_channel_drop = 0.0
+
+    def _baseline(self) -> float:
+        # an untracked channel has been observed since start (or since the last
+        # time a channel was pushed out of the LRU, which may have been this one)
+        return max(self._started, self._last_channel_drop)
+
+    def _ring(self, channel_id: int) -> deque:
+        ring = self._rings.get(channel_id)
+        if ring is None:
+            ring = deque()
+            self._rings[channel_id] = ring
+            self._covered[channel_id] = max(self._baseline(), self._paused.pop(channel_id, 0.0))
+            while len(self._rings) > self.max_channels:
+                old, _ = self._rings.popitem(last=False)
+                self._covered.pop(old, None)
+                self._last_channel_drop = time.time()
+        self._rings.move_to_end(channel_id)
+        return ring
+
+    def _trim(self, channel_id: int, ring: deque, now: float):
+        while ring and (len(ring) > self.ring_size or now - ring[0][0] > self.max_age):
+            ts, _, _ = ring.popleft()
+            self._covered[channel_id] = max(self._covered[channel_id], ts)
+
+    def record(self, channel_id: int, message_id: int, ts: float, content: str) -> None:
+        text = keep_for_summary(content)
+        if text is None:
+            return
+        ring = self._ring(channel_id)
+        ring.append((ts, message_id, text))
+        self._trim(channel_id, ring, time.time())
+
+    def forget(self, channel_id: int, message_id: int) -> None:
+        """Drop a deleted message so it never shows up in a summary."""
+        self.forget_many(channel_id, (message_id,))
+
+    def forget_many(self, channel_id: int, message_ids) -> None:
+        """Drop a bulk-deleted (purged) batch of messages."""
+        ring = self._rings.get(channel_id)
+        if not ring:
+            return
+        gone = set(message_ids)
+        kept = [e for e in ring if e[1] not in gone]
+        if len(kept) != len(ring):
+            ring.clear()
+            ring.extend(kept)
+
+    def edit(self, channel_id: int, message_id: int, content: str) -> None:
+        """Replace an edited message's text (or drop it if it's no longer worth
+        summarising). Messages the ring never held are ignored."""
+        ring = self._rings.get(channel_id)
+        if not ring:
+            return
+        text = keep_for_summary(content)
+        for i, (ts, mid, _) in enumerate(ring):
+            if mid == message_id:
+                if text is None:
+                    del ring[i]
+                else:
+                    ring[i] = (ts, mid, text)
+                return
+
+    def pause(self, channel_id: int) -> None:
+        """Stop buffering a channel: drop its ring, and when recording resumes
+        treat it as covered only from then on."""
+        if channel_id in self._rings:
+            del self._rings[channel_id]
+            self._covered.pop(channel_id, None)
+        self._paused[channel_id] = time.time()
+        self._paused.move_to_end(channel_id)
+        while len(self._paused) > self.max_channels:
+            self._paused.popitem(last=False)
+            self._last_channel_drop = time.time()
+
+    def covered_since(self, channel_id: int) -> float:
+        covered = self._covered.get(channel_id)
+        if covered is None:
+            return max(self._baseline(), self._paused.get(channel_id, 0.0))
+        return covered
+
+    def window(self, channel_id: int, since_ts: float):
+        """Entries newer than since_ts, or None if the buffer doesn't reach back
+        that far (the caller should read history instead)."""
+        if since_ts < self.covered_since(channel_id):
+            return None
+        ring = self._rings.get(channel_id)
+        if not ring:
+            return []
+        self._trim(channel_id, ring, time.time())
+        return [e for e in ring if e[0] > since_ts]
+
+    def seed(self, channel_id: int, entries, since_ts: float) -> None:
+        """Merge a history read covering (since_ts, now] into the ring."""
+        ring = self._ring(channel_id)
+        merged = {e[1]: e for e in ring}
+        for ts, mid, content in entries:
+            text = keep_for_summary(content)
+            if text is not None:
+                merged[mid] = (ts, mid, text)
+        ring.clear()
+        ring.extend(sorted(merged.values()))
+        self._covered[channel_id] = min(self._covered[channel_id], since_ts)
+        self._trim(channel_id, ring, time.time())
+
+
+def chunk_entries(entries, seconds: int = CHUNK_SECONDS):
+    """Group (ts, id, text) entries into clock-aligned chunks:
+    [(chunk_start, [text, ...]), ...] oldest first."""
+    chunks: "OrderedDict[int, list]" = OrderedDict()
+    for ts, _mid, text in sorted(entries):
+        start = int(ts // seconds) * seconds
+        chunks.setdefault(start, []).append(text)
+    return list(chunks.items())
+
+
+def chunk_key(channel_id: int, chunk_start: int, texts) -> str:
+    digest = hashlib.sha1("\n".join(texts).encode("utf-8", "replace")).hexdigest()[:16]
+    return f"catchup:{channel_id}:{chunk_start}:{digest}"
+
+
+# the shared buffer fed by UtilitiesCog.on_message
+chat_buffer = ChatBuffer()
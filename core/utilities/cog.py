@@ -4,15 +4,23 @@ Utilities cog for Ignio — lightweight tools for content already in chat.
 
 Design rules (enforced here):
 - AllowedMentions.none() on every response; never pings.
-- No permanent storage of messages, media, URLs, transcripts, or summaries.
-  (Only !afk persists a per-user status row — never message content.)
+- No permanent storage of messages or summaries. Recent chat is held in a
+  bounded in-memory ring for !catchup (chatbuffer.py) and summaries in the
+  job manager's TTL cache; both vanish on restart. (Only !afk persists a
+  per-user status row — never message content. Provider lookups and, if an
+  admin opts in, downloaded media have their own caches: respcache.py,
+  mediacache.py.)
 - External providers are optional via env; missing provider => graceful message.
-- Cooldowns + per-guild concurrency via the shared job manager.
+- Cooldowns via the shared job manager; heavy jobs wait in its fair
+  scheduler (queue position shown, cancelled if the command is deleted).
 - Compact embeds / single attachments; "working..." then edit, never spam.
 """
 from __future__ import annotations
 
 import io
+import asyncio
+import hashlib
+import contextlib
 import os
 import re
 import time
@@ -20,10 +28,13 @@ import time
 import discord
 from discord.ext import commands
 
-from core.utilities.jobs import manager, CooldownError, BusyError
+from core.utilities.jobs import manager, scheduler, CooldownError, BusyError
+from core.utilities.chatbuffer import chat_buffer, chunk_entries, chunk_key, keep_for_summary
 from core.utilities import resolver, safety, cards
 from core.utilities import providers as P
 from core.utilities import media
+from core.utilities.health import health
+from core.utilities.sessions import sessions, timeout as session_timeout
 
 NONE = discord.AllowedMentions.none()
 ACCENT = 0x6FB7B0
@@ -31,6 +42,11 @@ WARN = 0xE0A042
 
 # ---- time-window parsing for catchup ----
 _WINDOWS = {"5m": 5, "15m": 15, "30m": 30, "1h": 60, "2h": 120, "4h": 240}
+CATCHUP_MAX_MESSAGES = 400      # newest messages considered per catchup
+MAP_MIN_CHARS = 3000            # below this, one LLM call over the raw lines
+MAP_MIN_MESSAGES = 8            # smaller chunks go to the reduce step verbatim
+MAP_CONCURRENCY = 3             # chunk summaries in flight per catchup
+SUMMARY_TTL = 4 * 3600          # chunk/final summaries cached this long
 
 
 def _compact(title: str, body: str, color=ACCENT) -> discord.Embed:
@@ -55,6 +71,50 @@ class UtilitiesCog(commands.Cog):
         print(f"[Ignio][Utilities] host caps: ffmpeg={media.ffmpeg_available()} "
               f"pillow_webp={webp} yt_dlp={media.is_available()}")
 
+    async def cog_load(self):
+        # keep the shared job manager's memory flat on long uptimes
+        manager.start_sweeper()
+
+    def cog_unload(self):
+        manager.stop_sweeper()
+
+    @contextlib.asynccontextmanager
+    async def _queued(self, message, job: str, max_concurrent: int, *, cheap: bool = False):
+        """Run a heavy job through the shared scheduler. While it waits, a
+        "#N in line" reply is kept up to date and removed once it starts.
+        Raises BusyError if the guild's queue is full."""
+        notice = None
+        started = False
+
+        async def _drop_notice():
+            nonlocal notice
+            if notice is not None:
+                n, notice = notice, None
+                with contextlib.suppress(Exception):
+                    await n.delete()
+
+        async def on_position(n: int):
+            nonlocal notice
+            if started:
+                return
+            e = _compact("Queued", f"#{n} in line — I'll start as soon as a worker is free.")
+            if notice is None:
+                notice = await message.reply(embed=e, allowed_mentions=NONE)
+                if started:                 # began while we were posting
+                    await _drop_notice()
+            else:
+                await notice.edit(embed=e)
+
+        try:
+            async with scheduler.run(job, message.guild.id, max_concurrent, cheap=cheap,
+                                     message_id=message.id, on_position=on_position):
+                started = True
+                await _drop_notice()
+                yield
+        finally:
+            started = True
+            await _drop_notice()
+
     async def _enabled(self, gid: int) -> bool:
         if self.repo is None:
             return True
@@ -81,7 +141,7 @@ class UtilitiesCog(commands.Cog):
 
         ref = ctx.message.reference
         try:
-            async with manager.slot("catchup", ctx.guild.id, 1):
+            async with self._queued(ctx.message, "catchup", 1):
                 manager.arm_cooldown("catchup", ctx.author.id, 45)
                 working = await ctx.reply(embed=_compact("Catching up…", "Reading the channel…"),
                                           allowed_mentions=NONE)
@@ -90,22 +150,35 @@ class UtilitiesCog(commands.Cog):
                 else:
                     await self._catchup_window(ctx, working, window)
         except BusyError:
-            await ctx.reply(embed=_compact("Busy", "A catchup is already running here — one sec.", WARN),
+            await ctx.reply(embed=_compact("Busy", "Too many jobs are queued here — try again in a minute.", WARN),
                             allowed_mentions=NONE)
 
     async def _read_recent(self, channel, minutes: int, cap: int):
         """Fetch recent messages WITHOUT storing them anywhere."""
+        return [text for _, _, text in await self._history_entries(channel, minutes, cap)]
+
+    async def _history_entries(self, channel, minutes: int, cap: int):
         after = discord.utils.utcnow() - __import__("datetime").timedelta(minutes=minutes)
-        msgs = []
+        out = []
         async for m in channel.history(limit=cap, after=after, oldest_first=True):
-            if m.author.bot or not m.content:
+            if m.author.bot:
                 continue
-            c = m.content.strip()
-            # skip obvious command spam (any common prefix) so it doesn't pollute the summary
-            if c[:1] in "!?./$%&>" and len(c) < 40:
-                continue
-            msgs.append(c)
-        return msgs
+            text = keep_for_summary(m.content)
+            if text is not None:
+                out.append((m.created_at.timestamp(), m.id, text))
+        return out
+
+    async def _recent_entries(self, channel, minutes: int, cap: int):
+        """Recent (ts, id, text) entries from the in-memory channel buffer; only
+        when it doesn't reach back far enough do we read history (once) and
+        seed the buffer with the result."""
+        since = time.time() - minutes * 60
+        entries = chat_buffer.window(channel.id, since)
+        if entries is None:
+            entries = await self._history_entries(channel, minutes, cap)
+            if len(entries) < cap:     # a complete read: the buffer now covers it
+                chat_buffer.seed(channel.id, entries, since)
+        return entries[-cap:]
 
     async def _catchup_window(self, ctx, working, window):
         minutes = _WINDOWS.get((window or "").lower())
@@ -113,12 +186,12 @@ class UtilitiesCog(commands.Cog):
             await working.edit(embed=_compact(
                 "Pick a window", "Use one of: 5m, 15m, 30m, 1h, 2h, 4h.", WARN))
             return
-        msgs = await self._read_recent(ctx.channel, minutes, 120)
-        if not msgs:
+        entries = await self._recent_entries(ctx.channel, minutes, CATCHUP_MAX_MESSAGES)
+        if not entries:
             await working.edit(embed=_compact(f"Catchup — last {window}",
                                               f"Nothing important was said in the last {window}."))
             return
-        summary = await self._summarize_chat(msgs, window)
+        summary = await self._summarize_window(ctx.channel.id, entries, window)
         if summary is None:
             await working.edit(embed=_compact("Catchup",
                 "Catchup could not run right now. An admin can check the bot logs.", WARN))
@@ -156,6 +229,65 @@ class UtilitiesCog(commands.Cog):
             return
         await working.edit(embed=_compact("What happened here", summary))
 
+    async def _summarize_window(self, channel_id: int, entries, window):
+        """Map-reduce summary over clock-aligned chunks of the window.
+
+        Busy chunks are condensed to notes (map) and cached by (channel, chunk
+        start, content hash); quiet chunks pass through verbatim. One final
+        call (reduce) turns the notes into the catchup, and that result is
+        cached by the exact set of chunks, so repeat catchups are free and
+        overlapping ones only pay for the chunks that changed."""
+        texts = [t for _, _, t in entries]
+        if not P.llm_key():
+            return await self._summarize_chat(texts, window)
+        chunks = chunk_entries(entries)
+        keys = [chunk_key(channel_id, start, lines) for start, lines in chunks]
+        final_key = f"{keys[-1]}:final:{window}:" + hashlib.sha1(
+            "|".join(keys).encode()).hexdigest()[:16]
+        hit = manager.cache_get(final_key)
+        if hit is not None:
+            return hit
+        if sum(len(t) for t in texts) <= MAP_MIN_CHARS:
+            summary = await self._summarize_chat(texts, window)
+        else:
+            gate = asyncio.Semaphore(MAP_CONCURRENCY)
+            parts = await asyncio.gather(*(
+                self._chunk_notes(key, start, lines, gate)
+                for key, (start, lines) in zip(keys, chunks)))
+            summary = await self._summarize_chat([ln for part in parts for ln in part], window)
+        if summary:
+            manager.cache_put(final_key, summary, ttl=SUMMARY_TTL)
+        return summary
+
+    async def _chunk_notes(self, key: str, start: int, lines, gate: asyncio.Semaphore):
+        """Map step: a few terse notes for one chunk (cached), or the raw lines
+        when the chunk is small, the LLM call fails or the LLM breaker opened
+        while this chunk waited for one of the catchup's ``gate`` slots."""
+        if len(lines) < MAP_MIN_MESSAGES:
+            return lines
+        hit = manager.cache_get(key)
+        if hit is not None:
+            return hit
+        stamp = time.strftime("%H:%M", time.gmtime(start))
+        async with gate:
+            if health.is_open("llm"):
+                return lines
+            try:
+                out = await P.llm_complete(
+                    "Condense this slice of a Discord conversation into 1-3 terse factual notes, "
+                    "one per line: decisions, event times, open questions, what a shared link or clip "
+                    "was about, the running joke. No usernames, no URLs, no filler. If nothing "
+                    "happened, reply with exactly: (just chatter)",
+                    "\n".join(m[:300] for m in lines)[:6000], max_tokens=160)
+            except Exception as ex:
+                print(f"[Ignio][Catchup] chunk summary raised: {type(ex).__name__}: {ex}")
+                out = None
+        if not out:
+            return lines
+        notes = [f"[{stamp} UTC] {ln.strip()}" for ln in out.splitlines() if ln.strip()]
+        manager.cache_put(key, notes, ttl=SUMMARY_TTL)
+        return notes
+
     async def _summarize_chat(self, msgs, window, reply=False):
         """Summarize via the configured LLM. Returns the summary text, or None on
         failure (the caller shows a clean error + we log the real reason)."""
@@ -179,7 +311,8 @@ class UtilitiesCog(commands.Cog):
                       "'Current Joke/Debate', 'Unanswered Question', 'none currently present', or 'no ongoing "
                       "joke noted'. Don't call every TikTok/GIF/link important. No raw URLs, no usernames "
                       "unless needed to explain an update. Sound casual, not like a meeting summary.")
-            prompt = f"Recent messages (last {window}, oldest first):\n{joined}"
+            prompt = (f"Recent messages and notes on busier stretches "
+                      f"(last {window}, oldest first):\n{joined}")
         try:
             out = await P.llm_complete(system, prompt, max_tokens=380)
         except Exception as ex:
@@ -218,7 +351,9 @@ class UtilitiesCog(commands.Cog):
                 allowed_mentions=NONE)
             return
         working = await ctx.reply(embed=_compact("TL;DR", "Reading this…"), allowed_mentions=NONE)
-        out = await P.llm_complete(
+        # the same post/text summarised twice costs one LLM call
+        key = "tldr:" + hashlib.sha1(src[:6000].encode("utf-8", "replace")).hexdigest()
+        out = manager.cache_get(key) or await P.llm_complete(
             "Summarize what the user gives you in AT MOST 3 short bullets — often 1 or 2 is better. "
             "Sound like a friend who actually read it and is telling you the point in 5 seconds. "
             "Be specific to THIS content. NEVER use vague filler like 'relatable experience', "
@@ -232,6 +367,7 @@ class UtilitiesCog(commands.Cog):
             await working.edit(embed=_compact("TL;DR",
                 "I couldn't summarize that right now.", WARN))
             return
+        manager.cache_put(key, out, ttl=SUMMARY_TTL)
         await working.edit(embed=_compact("TL;DR", out))
 
     async def _gather_source_text(self, ctx, text):
@@ -314,10 +450,10 @@ class UtilitiesCog(commands.Cog):
             return
         working = await ctx.reply(embed=_compact("Song", "Listening…"), allowed_mentions=NONE)
         try:
-            async with manager.slot("song", ctx.guild.id, 1):
+            async with self._queued(ctx.message, "song", 1):
                 res = await P.song_recognize(target)
         except BusyError:
-            await working.edit(embed=_compact("Song", "Busy with another track — try again shortly.", WARN))
+            await working.edit(embed=_compact("Song", "Too many jobs are queued here — try again shortly.", WARN))
             return
         except Exception:
             res = None
@@ -352,7 +488,7 @@ class UtilitiesCog(commands.Cog):
             await ctx.reply(embed=_compact("Link X-ray", "Give me a link, or reply to one.", WARN),
                             allowed_mentions=NONE)
             return
-        safe, reason = safety.is_safe_url(url)
+        safe, reason = await safety.is_safe_url_async(url)
         manager.arm_cooldown("xray", ctx.author.id, 45)
         if not safe:
             await ctx.reply(embed=_compact("Link X-ray",
@@ -362,10 +498,10 @@ class UtilitiesCog(commands.Cog):
         working = await ctx.reply(embed=_compact("Link X-ray", "Inspecting the link…"),
                                   allowed_mentions=NONE)
         try:
-            async with manager.slot("xray", ctx.guild.id, 2):
+            async with self._queued(ctx.message, "xray", 2, cheap=True):
                 res = await P.xray(url)
         except BusyError:
-            await working.edit(embed=_compact("Link X-ray", "Busy scanning other links — try again shortly.", WARN))
+            await working.edit(embed=_compact("Link X-ray", "Too many jobs are queued here — try again shortly.", WARN))
             return
         except Exception:
             res = None
@@ -403,9 +539,17 @@ class UtilitiesCog(commands.Cog):
                             allowed_mentions=NONE)
             return
         manager.arm_cooldown("map", ctx.author.id, 15)
+        try:
+            async with self._queued(ctx.message, "map", 2, cheap=True):
+                await self._map_job(ctx, place)
+        except BusyError:
+            await ctx.reply(embed=_compact("Map", "Too many jobs are queued here — try again shortly.", WARN),
+                            allowed_mentions=NONE)
+
+    async def _map_job(self, ctx, place: str):
         working = await ctx.reply(embed=_compact("Map", "Finding that place…"), allowed_mentions=NONE)
         try:
-            spots = await P.geocode_osm(place)
+            spots = await P.geocode_hedged(place, prefer="nominatim")
         except Exception:
             spots = []
         if not spots:
@@ -650,12 +794,21 @@ class UtilitiesCog(commands.Cog):
             await ctx.reply(embed=_compact("Caption", hint, WARN), allowed_mentions=NONE)
             return
 
+        try:
+            async with self._queued(ctx.message, "caption", 2, cheap=not animated):
+                await self._caption_job(ctx, img, animated, text)
+        except BusyError:
+            await ctx.reply(embed=_compact("Caption", "Too many jobs are queued here — try again shortly.", WARN),
+                            allowed_mentions=NONE)
+
+    async def _caption_job(self, ctx, img, animated: bool, text: str):
         working = await ctx.reply(embed=_compact("Caption", "Working…"), allowed_mentions=NONE)
         with manager.temp_files():
             try:
                 if animated:
                     manager.arm_cooldown("caption", ctx.author.id, 120)  # GIF: 2 min
-                    buf, kept = cards.caption_gif(img, text)
+                    # rendering is CPU-bound; keep the event loop responsive
+                    buf, kept = await asyncio.to_thread(cards.caption_gif, img, text)
                     fname = "caption.gif" if kept else "caption.png"
                     note = None if kept else "Caption made from the first frame because the GIF was too large to render safely."
                     await working.delete()
@@ -664,7 +817,7 @@ class UtilitiesCog(commands.Cog):
                         file=discord.File(buf, filename=fname), allowed_mentions=NONE)
                 else:
                     manager.arm_cooldown("caption", ctx.author.id, 30)
-                    buf = cards.caption_image(img.convert("RGBA"), text)
+                    buf = await asyncio.to_thread(cards.caption_image, img.convert("RGBA"), text)
                     await working.delete()
                     await ctx.reply(file=discord.File(buf, filename="caption.png"), allowed_mentions=NONE)
             except Exception as ex:
@@ -740,8 +893,11 @@ class UtilitiesCog(commands.Cog):
             print(f"[Ignio][Caption] attachment: name={fn!r} type={ct!r} dims={has_dims} -> image={is_img}")
             if is_img:
                 try:
+                    if (getattr(att, "width", 0) or 0) * (getattr(att, "height", 0) or 0) > cards.INPUT_MAX_PIXELS:
+                        print("[Ignio][Caption] attachment too large to decode; skipped")
+                        continue
                     data = await att.read()
-                    im = Image.open(io.BytesIO(data))
+                    im = await asyncio.to_thread(cards.open_image, data)
                     return im, getattr(im, "is_animated", False)
                 except Exception as ex:
                     print(f"[Ignio][Caption] attachment read failed: {type(ex).__name__}: {ex}")
@@ -815,11 +971,12 @@ class UtilitiesCog(commands.Cog):
             if not data:
                 continue
             try:
-                probe = Image.open(io.BytesIO(data))
-                probe.load()
-                im2 = Image.open(io.BytesIO(data))
-                print(f"[Ignio][Caption] using image candidate ({probe.format})")
-                return im2, getattr(probe, "is_animated", False)
+                im2 = await asyncio.to_thread(cards.open_image, data)
+                print(f"[Ignio][Caption] using image candidate ({im2.format})")
+                return im2, getattr(im2, "is_animated", False)
+            except Image.DecompressionBombError as ex:
+                print(f"[Ignio][Caption] candidate refused: {ex}")
+                continue
             except Exception as ex:
                 print(f"[Ignio][Caption] candidate not a still/gif ({type(ex).__name__}: "
                       f"{str(ex)[:60]}), first bytes={data[:8]!r}, will try ffmpeg")
@@ -834,11 +991,9 @@ class UtilitiesCog(commands.Cog):
             gif_bytes = await media.video_url_to_gif_bytes(vurl)
             if gif_bytes:
                 try:
-                    probe = Image.open(io.BytesIO(gif_bytes))
-                    probe.load()
-                    im2 = Image.open(io.BytesIO(gif_bytes))
+                    im2 = await asyncio.to_thread(cards.open_image, gif_bytes)
                     print("[Ignio][Caption] using ffmpeg-converted gif")
-                    return im2, getattr(probe, "is_animated", False)
+                    return im2, getattr(im2, "is_animated", False)
                 except Exception:
                     continue
         return None, False
@@ -847,45 +1002,57 @@ class UtilitiesCog(commands.Cog):
         """Safely download an image/GIF URL IN FULL (size-capped, SSRF-guarded,
         follows redirects). Streams the whole body in chunks — a single
         content.read(n) can return a truncated buffer for chunked responses,
-        which was feeding Pillow/ffmpeg incomplete files (white/broken output)."""
-        ok, _ = safety.is_safe_url(url)
+        which was feeding Pillow/ffmpeg incomplete files (white/broken output).
+        Error pages (HTML/JSON) are dropped after the first chunk; pixel caps
+        are enforced later by cards.open_image before anything is decoded."""
+        ok, _ = await safety.is_safe_url_async(url)
         if not ok:
             return None
         cap = 18 * 1024 * 1024  # 18MB hard cap
         try:
-            import aiohttp
             ua = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
                   "(KHTML, like Gecko) Chrome/120.0 Safari/537.36")
             headers = {"User-Agent": ua,
                        "Accept": "image/avif,image/webp,image/apng,image/gif,image/*,*/*",
                        "Referer": "https://discord.com/"}
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=25)) as s:
-                async with s.get(url, headers=headers, allow_redirects=True) as r:
-                    if r.status not in (200, 206):
-                        print(f"[Ignio][Caption] image URL returned {r.status} for {url.split('?')[0]}")
-                        return None
-                    final = str(r.url)
-                    fok, _ = safety.is_safe_url(final)
-                    if not fok:
-                        return None
-                    # stream the FULL body in chunks (do not truncate)
-                    buf = bytearray()
-                    async for chunk in r.content.iter_chunked(64 * 1024):
-                        buf.extend(chunk)
-                        if len(buf) > cap:
-                            print("[Ignio][Caption] download exceeded size cap")
+            s = await sessions.get()
+            async with s.get(url, headers=headers, allow_redirects=True,
+                             timeout=session_timeout("image")) as r:
+                if r.status not in (200, 206):
+                    print(f"[Ignio][Caption] image URL returned {r.status} for {url.split('?')[0]}")
+                    return None
+                final = str(r.url)
+                fok, _ = await safety.is_safe_url_async(final)
+                if not fok:
+                    return None
+                ctype = (r.headers.get("Content-Type") or "").lower()
+                if ctype.startswith(("text/", "application/json")):
+                    print(f"[Ignio][Caption] not an image ({ctype.split(';')[0]})")
+                    return None
+                # stream the FULL body in chunks (do not truncate)
+                buf = bytearray()
+                sniffed = False
+                async for chunk in r.content.iter_chunked(64 * 1024):
+                    buf.extend(chunk)
+                    if not sniffed and len(buf) >= 64:
+                        sniffed = True
+                        if cards.looks_like_markup(buf):
+                            print("[Ignio][Caption] got a web page instead of an image")
                             return None
-                    data = bytes(buf)
-                    # validate against Content-Length when present
-                    clen = r.headers.get("Content-Length")
-                    if clen and clen.isdigit():
-                        expected = int(clen)
-                        if len(data) < expected:
-                            print(f"[Ignio][Caption] SHORT download: got {len(data)} of {expected} bytes")
-                            return None
-                    if not data:
+                    if len(buf) > cap:
+                        print("[Ignio][Caption] download exceeded size cap")
+                        return None
+                data = bytes(buf)
+                # validate against Content-Length when present
+                clen = r.headers.get("Content-Length")
+                if clen and clen.isdigit():
+                    expected = int(clen)
+                    if len(data) < expected:
+                        print(f"[Ignio][Caption] SHORT download: got {len(data)} of {expected} bytes")
                         return None
-                    return data
+                if not data:
+                    return None
+                return data
         except Exception as ex:
             print(f"[Ignio][Caption] image download failed: {type(ex).__name__}")
             return None
@@ -920,16 +1087,17 @@ class UtilitiesCog(commands.Cog):
         manager.arm_cooldown("quote", ctx.author.id, 10)
         avatar = None
         try:
-            data = await t.author.display_avatar.read()
-            from PIL import Image
-            avatar = Image.open(io.BytesIO(data))
+            # smallest CDN size (powers of two) that covers the 56px avatar at 2x
+            data = await t.author.display_avatar.with_size(128).read()
+            avatar = await asyncio.to_thread(cards.open_image, data, cards.AVATAR_SIDE)
         except Exception:
             avatar = None
         ts = t.created_at.strftime("%b %d, %Y")
         with manager.temp_files():
             handle = getattr(t.author, "name", None)
             clean = _clean_quote_text(t.content)
-            buf = cards.quote_card(t.author.display_name, clean, ts, avatar, handle=handle)
+            buf = await asyncio.to_thread(cards.quote_card, t.author.display_name, clean, ts,
+                                          avatar, handle=handle)
             await ctx.reply(file=discord.File(buf, filename="quote.png"), allowed_mentions=NONE)
 
     # ------------------------------------------------------------------ #
@@ -993,18 +1161,23 @@ class UtilitiesCog(commands.Cog):
 
         loading = None
         try:
-            async with manager.slot("media:user", message.author.id, 1):
-                async with manager.slot("media", message.guild.id, media.MAX_CONCURRENT()):
-                    manager.arm_cooldown("media", message.author.id, media.USER_COOLDOWN())
-                    try:
-                        await message.add_reaction("⏳")
-                        loading = True
-                    except Exception:
-                        loading = False
-                    await self._do_media_download(message, url)
+            async with manager.slot("media:user", message.author.id, 1), \
+                    contextlib.AsyncExitStack() as held:
+                async def _guild_slot():
+                    # only a request that starts a new download queues for a
+                    # worker (held until it's done); joining one costs none
+                    await held.enter_async_context(
+                        self._queued(message, "media", media.MAX_CONCURRENT()))
+                try:
+                    await message.add_reaction("⏳")
+                    loading = True
+                except Exception:
+                    loading = False
+                await self._do_media_download(message, url, acquire=_guild_slot)
         except BusyError:
             await message.reply(embed=_compact("Busy",
-                "I'm downloading other videos right now — try again in a moment.", WARN),
+                "You already have a download going, or the queue here is full — "
+                "try again in a moment.", WARN),
                 allowed_mentions=NONE)
         finally:
             if loading:
@@ -1032,18 +1205,27 @@ class UtilitiesCog(commands.Cog):
             return None
         return url
 
-    async def _do_media_download(self, message, url: str):
-        res = await media.download(url)
+    async def _do_media_download(self, message, url: str, acquire=None):
+        # N mentions of the same link share one download (and one temp file)
+        res = await media.download_shared(url, acquire=acquire)
+        manager.arm_cooldown("media", message.author.id, media.USER_COOLDOWN())
+        fitted = None
         try:
             if res.ok and res.path:
                 limit_mb = self._guild_upload_limit_mb(message.guild)
                 import os as _os
                 size_mb = _os.path.getsize(res.path) / (1024 * 1024)
+                upload_path = res.path
                 if size_mb > limit_mb:
-                    await message.reply(embed=_compact("Download",
-                        f"This video is too large to upload here. Discord allows up to "
-                        f"{limit_mb:.0f} MB in this server."), allowed_mentions=NONE)
-                    return
+                    # shrink to this guild's limit (ffmpeg subprocess, loop stays free)
+                    fitted = await media.transcode_to_fit(
+                        res.path, int(limit_mb * 1024 * 1024), res.duration)
+                    if fitted is None:
+                        await message.reply(embed=_compact("Download",
+                            f"This video is too large to upload here. Discord allows up to "
+                            f"{limit_mb:.0f} MB in this server."), allowed_mentions=NONE)
+                        return
+                    upload_path = fitted
                 # compact Katana-style source card under the video
                 src = res.source or "the web"
                 bits = [f"**Downloaded from {src}**"]
@@ -1060,8 +1242,8 @@ class UtilitiesCog(commands.Cog):
                 if res.url:
                     bits.append(f"[Original post]({res.url})")
                 e = _compact("", "\n".join(bits))
-                fname = "video" + _os.path.splitext(res.path)[1]
-                await message.reply(embed=e, file=discord.File(res.path, filename=fname),
+                fname = "video" + _os.path.splitext(upload_path)[1]
+                await message.reply(embed=e, file=discord.File(upload_path, filename=fname),
                                     allowed_mentions=NONE)
             else:
                 # on failure, still show a compact card if we at least know the source
@@ -1071,7 +1253,8 @@ class UtilitiesCog(commands.Cog):
                     body += f"\nSource: {src} · [Original post]({url})"
                 await message.reply(embed=_compact("Download", body), allowed_mentions=NONE)
         finally:
-            media.cleanup(res.path)
+            media.release(res)
+            media.cleanup(fitted)
 
     @staticmethod
     def _guild_upload_limit_mb(guild) -> float:
@@ -1087,9 +1270,39 @@ class UtilitiesCog(commands.Cog):
             return raw / (1024 * 1024)
         return 10.0
 
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload):
+        # deleted messages must never surface in a later !catchup
+        chat_buffer.forget(payload.channel_id, payload.message_id)
+        # ...and a deleted command shouldn't keep a worker (or its queue spot)
+        scheduler.cancel_message(payload.message_id)
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload):
+        # a mod purge: none of it may surface in a later !catchup either
+        chat_buffer.forget_many(payload.channel_id, payload.message_ids)
+        for message_id in payload.message_ids:
+            scheduler.cancel_message(message_id)
+
+    @commands.Cog.listener()
+    async def on_raw_message_edit(self, payload):
+        # embed-only updates carry no content; leave the buffered text alone
+        content = payload.data.get("content")
+        if content is not None:
+            chat_buffer.edit(payload.channel_id, payload.message_id, content)
+
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
-        if not message.guild or message.author.bot or self.repo is None:
+        if not message.guild or message.author.bot:
+            return
+        # in-memory only; feeds !catchup without channel.history calls, and
+        # only for servers that have utilities turned on
+        if await self._enabled(message.guild.id):
+            chat_buffer.record(message.channel.id, message.id,
+                               message.created_at.timestamp(), message.content)
+        else:
+            chat_buffer.pause(message.channel.id)
+        if self.repo is None:
             return
         try:
             db = await self.repo._db()
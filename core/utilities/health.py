@@ -0,0 +1,200 @@
+# core/utilities/health.py
+"""
+Per-provider circuit breakers and latency histograms for Utilities.
+
+When MyMemory, Open-Meteo, Nominatim, audd.io or the LLM endpoint is down,
+every call used to wait out its full timeout while holding a job slot. Each
+provider now has a breaker:
+
+  closed     normal; FAILURE_THRESHOLD consecutive failures -> open
+  open       calls fail fast with CircuitOpenError for OPEN_SECONDS
+             (doubling on each failed probe, up to MAX_OPEN_SECONDS)
+  half-open  after the cooldown ONE probe call goes through; success
+             closes the breaker, failure re-opens it
+
+A failure is an exception (timeout, connection error) or a response the
+caller marks as failed (5xx / 429) — a 404 for a made-up place is not an
+outage. Every call's latency lands in a small fixed-bucket histogram so
+`!admin providers` can show p50/p95 per provider.
+"""
+from __future__ import annotations
+
+import time
+import asyncio
+import contextlib
+
+FAILURE_THRESHOLD = 5
+OPEN_SECONDS = 30.0
+MAX_OPEN_SECONDS = 300.0
+# histogram upper bounds in milliseconds (last bucket is "slower than that")
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class CircuitOpenError(Exception):
+    """The provider's breaker is open; the call was not attempted."""
+
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(f"{provider} circuit open")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.total = 0
+
+    def add(self, ms: float) -> None:
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if ms <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += 1
+
+    def percentile(self, q: float) -> float | None:
+        """Upper bound (ms) of the bucket holding the q-th percentile."""
+        if not self.total:
+            return None
+        rank = max(1, int(round(q * self.total)))
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return float(LATENCY_BUCKETS_MS[min(i, len(LATENCY_BUCKETS_MS) - 1)])
+        return float(LATENCY_BUCKETS_MS[-1])
+
+
+class Outcome:
+    """Handed to the body of guard(); call fail() for a bad response."""
+
+    def __init__(self):
+        self.failed = False
+        self.reason = None
+
+    def fail(self, reason: str = "bad response") -> None:
+        self.failed = True
+        self.reason = reason
+
+
+class Breaker:
+    def __init__(self, name: str):
+        self.name = name
+        self.state = "closed"
+        self.failures = 0            # consecutive
+        self.open_until = 0.0
+        self.cooldown = OPEN_SECONDS
+        self.probing = False
+        self.calls = 0
+        self.errors = 0
+        self.rejected = 0
+        self.last_error: str | None = None
+        self.last_error_at = 0.0
+        self.latency = LatencyHistogram()
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        now = time.monotonic()
+        if self.state == "open" and now >= self.open_until:
+            self.state = "half-open"
+        if self.state == "half-open" and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def retry_after(self) -> float:
+        return max(0.0, self.open_until - time.monotonic())
+
+    def record(self, ok: bool, ms: float, reason: str | None = None) -> None:
+        self.calls += 1
+        self.latency.add(ms)
+        was_probe, self.probing = self.probing, False
+        if ok:
+            self.failures = 0
+            if self.state != "closed":
+                print(f"[Ignio][Health] {self.name} recovered; circuit closed")
+            self.state = "closed"
+            self.cooldown = OPEN_SECONDS
+            return
+        self.errors += 1
+        self.failures += 1
+        self.last_error = reason
+        self.last_error_at = time.time()
+        if was_probe:
+            self.cooldown = min(self.cooldown * 2, MAX_OPEN_SECONDS)
+        if was_probe or self.failures >= FAILURE_THRESHOLD:
+            if self.state != "open":
+                print(f"[Ignio][Health] {self.name} failing ({reason}); "
+                      f"circuit open for {self.cooldown:.0f}s")
+            self.state = "open"
+            self.open_until = time.monotonic() + self.cooldown
+
+    def release(self) -> None:
+        """A call was cancelled before it finished: not a verdict either way."""
+        self.probing = False
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.state,
+            "calls": self.calls,
+            "errors": self.errors,
+            "rejected": self.rejected,
+            "p50_ms": self.latency.percentile(0.50),
+            "p95_ms": self.latency.percentile(0.95),
+            "last_error": self.last_error,
+            "last_error_at": self.last_error_at,
+            "retry_after": round(self.retry_after(), 1) if self.state == "open" else 0.0,
+        }
+
+
+class ProviderHealth:
+    def __init__(self):
+        self._breakers: dict[str, Breaker] = {}
+
+    def breaker(self, provider: str) -> Breaker:
+        b = self._breakers.get(provider)
+        if b is None:
+            b = self._breakers[provider] = Breaker(provider)
+        return b
+
+    def is_open(self, provider: str) -> bool:
+        b = self._breakers.get(provider)
+        return b is not None and b.state == "open" and b.retry_after() > 0
+
+    @contextlib.asynccontextmanager
+    async def guard(self, provider: str):
+        """Wrap one provider call: fail fast if the breaker is open, else time
+        it and record success/failure. Raises CircuitOpenError when open."""
+        b = self.breaker(provider)
+        if not b.allow():
+            b.rejected += 1
+            raise CircuitOpenError(provider, b.retry_after())
+        outcome = Outcome()
+        t0 = time.monotonic()
+        try:
+            yield outcome
+        except asyncio.CancelledError:
+            b.release()
+            raise
+        except Exception as ex:
+            b.record(False, (time.monotonic() - t0) * 1000, type(ex).__name__)
+            raise
+        else:
+            b.record(not outcome.failed, (time.monotonic() - t0) * 1000, outcome.reason)
+
+    def snapshot(self) -> dict[str, dict]:
+        return {name: b.snapshot() for name, b in sorted(self._breakers.items())}
+
+    def reset(self) -> None:
+        self._breakers.clear()
+
+
+def failed_status(status: int) -> bool:
+    """HTTP statuses that mean the provider itself is struggling."""
+    return status >= 500 or status == 429
+
+
+# the shared registry used by providers.py
+health = ProviderHealth()
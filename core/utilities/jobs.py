@@ -5,13 +5,30 @@ Shared lightweight job manager for all Utilities commands.
 Handles per-user cooldowns, per-guild concurrency caps, per-key dedup with a
 short in-memory TTL cache, and temp-file cleanup. No permanent storage — nothing
 here is written to disk or DB. Everything lives in memory and expires.
+
+Memory stays flat on a long-running bot: cooldowns are capped (evicting the
+earliest deadline first), the dedup cache is LRU-bounded (entry counts, plus a
+byte budget for cached values), and a background sweeper drops expired
+entries even if nobody looks them up again.
+stats() reports sizes, hit rate and evictions.
+
+Heavy utility jobs (download, caption, summarize, map, song, xray) go through
+JobScheduler instead of failing with BusyError at the first busy moment: a
+global worker budget, per-guild round-robin queues so one busy server can't
+starve the rest, a priority lane for cheap jobs, queue-position callbacks,
+and cancellation when the triggering message is deleted. BusyError now only
+means the guild's queue is full or the wait ran too long.
 """
 from __future__ import annotations
 
+import io
 import os
+import sys
 import time
+import heapq
 import asyncio
 import contextlib
+from collections import OrderedDict
 
 # hard ceilings (the spec's "strict limits"); providers may lower these
 MAX_VIDEO_SECONDS = 600         # 10 min
@@ -20,6 +37,43 @@ MAX_IMAGE_BYTES = 12 * 1024 * 1024
 MAX_TEXT_CHARS = 8000
 CACHE_TTL = 600                 # 10 minutes
 
+# memory budgets for the in-process state
+MAX_COOLDOWNS = 20000
+MAX_CACHE_ENTRIES = 512
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+SWEEP_INTERVAL = 60             # seconds between background sweeps
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, ""))
+    except (TypeError, ValueError):
+        return default
+
+
+# scheduler budgets
+WORKERS = _env_int("UTIL_WORKERS", 4)                   # jobs running bot-wide
+QUEUE_PER_GUILD = _env_int("UTIL_QUEUE_PER_GUILD", 8)   # waiting jobs per guild
+QUEUE_MAX_WAIT = _env_int("UTIL_QUEUE_MAX_WAIT_SECONDS", 180)
+
+
+def _size_of(value) -> int:
+    """Approximate memory held by a cached value (exact for byte payloads)."""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, memoryview):
+        return value.nbytes
+    if isinstance(value, str):
+        return len(value.encode("utf-8", "replace"))
+    if isinstance(value, io.BytesIO):
+        return value.getbuffer().nbytes
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_size_of(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_size_of(k) + _size_of(v)
+                                          for k, v in value.items())
+    return sys.getsizeof(value)
+
 
 class CooldownError(Exception):
     def __init__(self, retry_after: float):
@@ -31,13 +85,26 @@ class BusyError(Exception):
 
 
 class JobManager:
-    def __init__(self):
+    def __init__(self, max_cooldowns: int = MAX_COOLDOWNS,
+                 max_cache_entries: int = MAX_CACHE_ENTRIES,
+                 max_cache_bytes: int = MAX_CACHE_BYTES):
+        self.max_cooldowns = max_cooldowns
+        self.max_cache_entries = max_cache_entries
+        self.max_cache_bytes = max_cache_bytes
         # (job, user_id) -> ready_at
         self._cooldowns: dict[tuple[str, int], float] = {}
+        # (ready_at, key) min-heap for eviction; entries whose ready_at no
+        # longer matches _cooldowns are stale and skipped
+        self._cooldown_heap: list[tuple[float, tuple[str, int]]] = []
         # (job, guild_id) -> active count
         self._active: dict[tuple[str, int], int] = {}
-        # cache_key -> (expires_at, value)
-        self._cache: dict[str, tuple[float, object]] = {}
+        # cache_key -> (expires_at, value, size); order = least recently used first
+        self._cache: "OrderedDict[str, tuple[float, object, int]]" = OrderedDict()
+        self._cache_bytes = 0
+        self._sweeper: asyncio.Task | None = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
 
     # ---- cooldowns -------------------------------------------------------
     def check_cooldown(self, job: str, user_id: int, seconds: float) -> None:
@@ -45,9 +112,35 @@ class JobManager:
         ready = self._cooldowns.get((job, user_id), 0)
         if now < ready:
             raise CooldownError(round(ready - now, 1))
+        if ready:
+            self._cooldowns.pop((job, user_id), None)
 
     def arm_cooldown(self, job: str, user_id: int, seconds: float) -> None:
-        self._cooldowns[(job, user_id)] = time.time() + seconds
+        key = (job, user_id)
+        ready = time.time() + seconds
+        self._cooldowns[key] = ready
+        heapq.heappush(self._cooldown_heap, (ready, key))
+        if len(self._cooldowns) > self.max_cooldowns:
+            self._evict_cooldowns()
+        elif len(self._cooldown_heap) > 2 * self.max_cooldowns:
+            self._rebuild_cooldown_heap()
+
+    def _evict_cooldowns(self) -> None:
+        # earliest deadline first: expired entries go before live ones, and a
+        # flood of short cooldowns can't push out a long one
+        now = time.time()
+        heap = self._cooldown_heap
+        while len(self._cooldowns) > self.max_cooldowns and heap:
+            ready, key = heapq.heappop(heap)
+            if self._cooldowns.get(key) != ready:
+                continue                # re-armed or already dropped
+            del self._cooldowns[key]
+            if ready > now:
+                self.evictions += 1
+
+    def _rebuild_cooldown_heap(self) -> None:
+        self._cooldown_heap = [(ready, key) for key, ready in self._cooldowns.items()]
+        heapq.heapify(self._cooldown_heap)
 
     # ---- per-guild concurrency ------------------------------------------
     def _count(self, job: str, guild_id: int) -> int:
@@ -72,20 +165,83 @@ class JobManager:
     def cache_get(self, key: str):
         ent = self._cache.get(key)
         if not ent:
+            self.misses += 1
             return None
-        exp, val = ent
+        exp, val, _ = ent
         if time.time() > exp:
-            self._cache.pop(key, None)
+            self._drop(key)
+            self.misses += 1
             return None
+        self._cache.move_to_end(key)
+        self.hits += 1
         return val
 
     def cache_put(self, key: str, value, ttl: float = CACHE_TTL):
-        self._cache[key] = (time.time() + ttl, value)
+        size = _size_of(value)
+        self._drop(key)
+        if size > self.max_cache_bytes:
+            return      # would evict everything else; not worth caching
+        self._cache[key] = (time.time() + ttl, value, size)
+        self._cache_bytes += size
+        while (len(self._cache) > self.max_cache_entries
+               or self._cache_bytes > self.max_cache_bytes):
+            old, _ = next(iter(self._cache.items()))
+            self._drop(old)
+            self.evictions += 1
+
+    def _drop(self, key: str):
+        ent = self._cache.pop(key, None)
+        if ent is not None:
+            self._cache_bytes -= ent[2]
 
     def purge_expired(self):
         now = time.time()
-        for k in [k for k, (exp, _) in self._cache.items() if now > exp]:
-            self._cache.pop(k, None)
+        for k in [k for k, (exp, _, _) in self._cache.items() if now > exp]:
+            self._drop(k)
+
+    # ---- background sweeper ---------------------------------------------
+    def sweep(self) -> int:
+        """Drop every expired cooldown/cache entry and stale slot counter."""
+        now = time.time()
+        before = len(self._cooldowns) + len(self._cache)
+        for k in [k for k, ready in self._cooldowns.items() if now >= ready]:
+            self._cooldowns.pop(k, None)
+        self._rebuild_cooldown_heap()
+        self.purge_expired()
+        for k in [k for k, n in self._active.items() if n <= 0]:
+            self._active.pop(k, None)
+        return before - len(self._cooldowns) - len(self._cache)
+
+    async def _sweep_forever(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"[Ignio][Jobs] sweep failed: {e}")
+
+    def start_sweeper(self, interval: float = SWEEP_INTERVAL) -> None:
+        """Start the periodic sweep on the running loop (idempotent)."""
+        if self._sweeper is not None and not self._sweeper.done():
+            return
+        self._sweeper = asyncio.get_running_loop().create_task(
+            self._sweep_forever(interval))
+
+    def stop_sweeper(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "cooldowns": len(self._cooldowns),
+            "active": len(self._active),
+            "cache_entries": len(self._cache),
+            "cache_bytes": self._cache_bytes,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
 
     # ---- temp file cleanup ----------------------------------------------
     @contextlib.contextmanager
@@ -101,5 +257,196 @@ class JobManager:
                         os.remove(p)
 
 
+class _Ticket:
+    __slots__ = ("job", "guild_id", "limit", "cheap", "message_id", "task",
+                 "started", "on_position", "last_position")
+
+    def __init__(self, job, guild_id, limit, cheap, message_id, on_position):
+        self.job = job
+        self.guild_id = guild_id
+        self.limit = limit
+        self.cheap = cheap
+        self.message_id = message_id
+        self.task = asyncio.current_task()
+        self.started = asyncio.get_running_loop().create_future()
+        self.on_position = on_position
+        self.last_position = None
+
+
+class JobScheduler:
+    """Fair queueing for utility jobs (see module docstring)."""
+
+    def __init__(self, workers: int | None = None, per_guild_queue: int | None = None,
+                 max_wait: float | None = None):
+        self.workers = workers if workers is not None else WORKERS
+        self.per_guild_queue = per_guild_queue if per_guild_queue is not None else QUEUE_PER_GUILD
+        self.max_wait = max_wait if max_wait is not None else QUEUE_MAX_WAIT
+        # lane -> guild_id -> waiting tickets; OrderedDict order = round-robin turn
+        self._lanes: dict[bool, "OrderedDict[int, list[_Ticket]]"] = {
+            True: OrderedDict(), False: OrderedDict()}
+        self._running: dict[tuple[str, int], int] = {}
+        self._busy = 0
+        self._by_message: dict[int, set[_Ticket]] = {}
+        self.completed = 0
+        self.cancelled = 0
+
+    def _waiting(self):
+        for cheap in (True, False):
+            for tickets in self._lanes[cheap].values():
+                yield from tickets
+
+    def queued(self, guild_id: int | None = None) -> int:
+        return sum(1 for t in self._waiting()
+                   if guild_id is None or t.guild_id == guild_id)
+
+    def position(self, ticket: _Ticket) -> int:
+        """1-based place in line: cheap lane first, guilds interleaved."""
+        order = []
+        for cheap in (True, False):
+            lanes = [list(q) for q in self._lanes[cheap].values()]
+            while any(lanes):
+                for q in lanes:
+                    if q:
+                        order.append(q.pop(0))
+        return order.index(ticket) + 1 if ticket in order else 0
+
+    def _eligible(self, t: _Ticket) -> bool:
+        return self._running.get((t.job, t.guild_id), 0) < t.limit
+
+    def _start(self, t: _Ticket):
+        key = (t.job, t.guild_id)
+        self._running[key] = self._running.get(key, 0) + 1
+        self._busy += 1
+        if not t.started.done():
+            t.started.set_result(True)
+
+    def _dispatch(self):
+        """Start waiting tickets while workers are free: cheap lane first, one
+        ticket per guild per turn (round-robin), skipping jobs at their cap."""
+        while self._busy < self.workers:
+            picked = None
+            for cheap in (True, False):
+                lane = self._lanes[cheap]
+                for gid in list(lane):
+                    tickets = lane[gid]
+                    t = next((x for x in tickets if self._eligible(x)), None)
+                    if t is None:
+                        continue
+                    tickets.remove(t)
+                    if tickets:
+                        lane.move_to_end(gid)      # this guild had its turn
+                    else:
+                        del lane[gid]
+                    picked = t
+                    break
+                if picked:
+                    break
+            if picked is None:
+                break
+            self._start(picked)
+        self._notify_positions()
+
+    def _notify_positions(self):
+        for t in list(self._waiting()):
+            if t.on_position is None:
+                continue
+            pos = self.position(t)
+            if pos != t.last_position:
+                t.last_position = pos
+                asyncio.get_running_loop().create_task(self._safe_notify(t, pos))
+
+    @staticmethod
+    async def _safe_notify(t: _Ticket, pos: int):
+        try:
+            await t.on_position(pos)
+        except Exception:
+            pass
+
+    def _forget(self, t: _Ticket):
+        lane = self._lanes[t.cheap]
+        tickets = lane.get(t.guild_id)
+        if tickets and t in tickets:
+            tickets.remove(t)
+            if not tickets:
+                del lane[t.guild_id]
+        if t.message_id is not None:
+            held = self._by_message.get(t.message_id)
+            if held:
+                held.discard(t)
+                if not held:
+                    self._by_message.pop(t.message_id, None)
+
+    @contextlib.asynccontextmanager
+    async def run(self, job: str, guild_id: int, max_concurrent: int, *,
+                  cheap: bool = False, message_id: int | None = None,
+                  on_position=None):
+        """Wait for a worker (in this guild's fair queue), run the body, release.
+
+        on_position(n) is awaited when the job has to wait and whenever its
+        place in line changes. Raises BusyError if the guild's queue is full or
+        the wait exceeds QUEUE_MAX_WAIT; the task is cancelled if the message
+        with `message_id` is deleted (see cancel_message)."""
+        t = _Ticket(job, guild_id, max_concurrent, cheap, message_id, on_position)
+        if message_id is not None:
+            self._by_message.setdefault(message_id, set()).add(t)
+        if not self.queued() and self._busy < self.workers and self._eligible(t):
+            self._start(t)
+        else:
+            if self.queued(guild_id) >= self.per_guild_queue:
+                self._forget(t)
+                raise BusyError()
+            self._lanes[cheap].setdefault(guild_id, []).append(t)
+            self._dispatch()
+        try:
+            if not t.started.done():
+                try:
+                    await asyncio.wait_for(asyncio.shield(t.started), timeout=self.max_wait)
+                except asyncio.TimeoutError:
+                    raise BusyError() from None
+        except BaseException:
+            self._forget(t)
+            if t.started.done():
+                self._finish(t)      # started in the same tick we gave up
+            else:
+                t.started.cancel()
+                self._dispatch()
+            raise
+        try:
+            yield
+        finally:
+            self._forget(t)
+            self._finish(t)
+
+    def _finish(self, t: _Ticket):
+        key = (t.job, t.guild_id)
+        n = self._running.get(key, 0) - 1
+        if n <= 0:
+            self._running.pop(key, None)
+        else:
+            self._running[key] = n
+        self._busy = max(0, self._busy - 1)
+        self.completed += 1
+        self._dispatch()
+
+    def cancel_message(self, message_id: int) -> int:
+        """Cancel every queued or running job triggered by a deleted message.
+
+        Running jobs are cancelled mid-flight, so everything they await must be
+        cancel-safe: the media helpers kill and reap their ffmpeg subprocesses
+        and drop their temp files on CancelledError."""
+        n = 0
+        for t in list(self._by_message.pop(message_id, ())):
+            if t.task is not None and not t.task.done():
+                t.task.cancel()
+                n += 1
+        self.cancelled += n
+        return n
+
+    def stats(self) -> dict:
+        return {"workers": self.workers, "busy": self._busy, "queued": self.queued(),
+                "completed": self.completed, "cancelled": self.cancelled}
+
+
 # a single shared instance the cogs import
 manager = JobManager()
+scheduler = JobScheduler()
@@ -10,6 +10,10 @@ Privacy/safety:
   - public http(s) only; SSRF-guarded before download.
   - temp files live in a dedicated dir and are ALWAYS deleted by the caller.
   - logs never include full URLs with query tokens (we redact query strings).
+
+Single-flight: download_shared() dedups concurrent requests for the same
+canonical URL. Everyone awaits one yt-dlp run and gets the same temp file; the
+file is reference-counted and deleted when the last holder calls release().
 """
 from __future__ import annotations
 
@@ -19,7 +23,9 @@ import asyncio
 import tempfile
 from urllib.parse import urlsplit, urlunsplit
 
-from core.utilities.safety import is_safe_url
+from core.utilities.mediacache import META_FIELDS, media_cache
+from core.utilities.safety import canonicalize_url, is_safe_url_async
+from core.utilities.sessions import sessions, timeout as session_timeout
 
 # ---- config (env, with safe defaults) ----
 def _env_bool(name, default):
@@ -39,6 +45,7 @@ MAX_MB = lambda: _env_int("MEDIA_DOWNLOAD_MAX_MB", 100)
 TIMEOUT = lambda: _env_int("MEDIA_DOWNLOAD_TIMEOUT_SECONDS", 90)
 USER_COOLDOWN = lambda: _env_int("MEDIA_DOWNLOAD_USER_COOLDOWN_SECONDS", 25)
 MAX_CONCURRENT = lambda: _env_int("MEDIA_DOWNLOAD_MAX_CONCURRENT", 2)
+TRANSCODE_TIMEOUT = lambda: _env_int("MEDIA_TRANSCODE_TIMEOUT_SECONDS", 180)
 
 TEMP_DIR = os.path.join(tempfile.gettempdir(), "ignio_media")
 
@@ -90,6 +97,7 @@ class DownloadResult:
         self.url = url              # original post URL (for the source card)
         self.uploader = uploader    # @creator
         self.duration = duration    # seconds
+        self.flight = None          # set by download_shared(); see release()
 
 
 def _source_name(url: str) -> str:
@@ -184,22 +192,266 @@ def _blocking_download(url: str, max_mb: int) -> DownloadResult:
 
 
 async def download(url: str, max_mb: int | None = None, timeout: int | None = None) -> DownloadResult:
-    """Async wrapper: SSRF-check, then run yt-dlp in a thread with a timeout."""
+    """Async wrapper: SSRF-check, then run yt-dlp in a thread with a timeout.
+
+    When MEDIA_CACHE_DIR is set, a cached copy of the clip is returned without
+    running yt-dlp, and every successful download is added to the cache."""
     # SSRF / safety check FIRST — internal URLs are rejected even if yt-dlp is absent
-    ok, _why = is_safe_url(url)
+    ok, _why = await is_safe_url_async(url)
     if not ok:
         return DownloadResult(False, error="unsupported")
+    mb = max_mb or MAX_MB()
+    if media_cache.enabled:
+        try:
+            hit = await asyncio.to_thread(media_cache.get, url, TEMP_DIR, mb * 1024 * 1024)
+        except Exception:
+            hit = None
+        if hit:
+            path = hit.pop("path")
+            return DownloadResult(True, path=path, **hit)
     if not is_available():
         return DownloadResult(False, error="failed")
-    mb = max_mb or MAX_MB()
     to = timeout or TIMEOUT()
     try:
-        return await asyncio.wait_for(
+        res = await asyncio.wait_for(
             asyncio.to_thread(_blocking_download, url, mb), timeout=to)
     except asyncio.TimeoutError:
         return DownloadResult(False, error="timeout")
     except Exception:
         return DownloadResult(False, error="failed")
+    if res.ok and res.path and media_cache.enabled:
+        meta = {f: getattr(res, f, None) for f in META_FIELDS}
+        try:
+            await asyncio.to_thread(media_cache.put, url, res.path, meta)
+        except Exception as e:
+            print(f"[Ignio][Media] cache store failed: {e}")
+    return res
+
+
+class _Flight:
+    """One in-flight (or finished, still-held) download shared by N callers."""
+
+    def __init__(self, key, task):
+        self.key = key
+        self.task: asyncio.Task = task
+        self.refs = 0
+
+
+class _FlightAbandoned(Exception):
+    """The caller that started a flight gave up before it began downloading."""
+
+
+# (canonical url, max_mb) -> flight; entries live until the last holder releases
+_flights: dict[tuple[str, int], _Flight] = {}
+
+
+def in_flight(url: str, max_mb: int | None = None) -> bool:
+    """True if a download for this URL is running or its file is still held."""
+    return (canonicalize_url(url), max_mb or MAX_MB()) in _flights
+
+
+async def download_shared(url: str, max_mb: int | None = None,
+                          timeout: int | None = None, *, acquire=None) -> DownloadResult:
+    """Like download(), but concurrent calls for the same canonical URL share a
+    single download. Every caller MUST pass the result to release() when done
+    with the file (instead of cleanup()).
+
+    `acquire` (an async callable, e.g. taking a worker slot) is awaited in the
+    caller's task only when this call is the one starting a new download, and
+    before it starts; joining a running download skips it. If the starter gives
+    up while acquiring (BusyError, cancelled), callers that joined meanwhile
+    retry and one of them starts the download instead."""
+    mb = max_mb or MAX_MB()
+    key = (canonicalize_url(url), mb)
+    while True:
+        fl = _flights.get(key)
+        go = None
+        if fl is None:
+            # decided here, with no await since the lookup: we start this one
+            go = asyncio.get_running_loop().create_future()
+            fl = _Flight(key, asyncio.ensure_future(_gated(go, url, mb, timeout)))
+            _flights[key] = fl
+        fl.refs += 1
+        try:
+            if go is not None:
+                try:
+                    if acquire is not None:
+                        await acquire()
+                except BaseException:
+                    if _flights.get(key) is fl:
+                        del _flights[key]
+                    go.set_exception(_FlightAbandoned())
+                    raise
+                go.set_result(None)
+            # shield: one waiter being cancelled must not kill everyone's download
+            res = await asyncio.shield(fl.task)
+        except _FlightAbandoned:
+            _unref(fl)
+            continue
+        except BaseException:
+            _unref(fl)
+            raise
+        res.flight = fl
+        return res
+
+
+async def _gated(go: asyncio.Future, url: str, mb: int, timeout: int | None) -> DownloadResult:
+    await go        # set once the starting caller holds what it needs
+    return await download(url, mb, timeout)
+
+
+def _unref(fl: _Flight):
+    fl.refs -= 1
+    if fl.refs > 0:
+        return
+    if _flights.get(fl.key) is fl:
+        _flights.pop(fl.key, None)
+    if fl.task.done():
+        _drop_result(fl.task)
+    else:
+        # every waiter gave up mid-download: clean up whatever it produces
+        fl.task.add_done_callback(_drop_result)
+
+
+def _drop_result(task: asyncio.Task):
+    if task.cancelled() or task.exception() is not None:
+        return
+    cleanup(task.result().path)
+
+
+def release(res: DownloadResult | None):
+    """Drop one reference to a download_shared() result; the last one deletes
+    the temp file. Safe to call on plain download() results too."""
+    if res is None:
+        return
+    fl = getattr(res, "flight", None)
+    if fl is None:
+        cleanup(res.path)
+        return
+    # a DownloadResult is shared by all holders, so count releases per call
+    _unref(fl)
+
+
+# ---- transcode-to-fit ------------------------------------------------------
+# Budget: the guild limit minus ~6% for container overhead and rate-control
+# overshoot. Below MIN_VIDEO_KBPS the result is unwatchable, so we give up.
+TRANSCODE_HEADROOM = 0.94
+MIN_VIDEO_KBPS = 150
+
+
+def transcode_plan(duration: float, limit_bytes: int) -> dict | None:
+    """Pick bitrates + output height that fit `duration` seconds into
+    `limit_bytes`. Returns {video_kbps, audio_kbps, height} or None."""
+    if not duration or duration <= 0 or limit_bytes <= 0:
+        return None
+    total_kbps = limit_bytes * 8 * TRANSCODE_HEADROOM / duration / 1000
+    audio = 96 if total_kbps >= 800 else 64 if total_kbps >= 300 else 32
+    video = int(total_kbps - audio)
+    if video < MIN_VIDEO_KBPS:
+        return None
+    # fewer bits -> fewer pixels; anything comfortable stays at (up to) 720p
+    if video >= 1500:
+        height = 720
+    elif video >= 700:
+        height = 480
+    else:
+        height = 360
+    return {"video_kbps": video, "audio_kbps": audio, "height": height}
+
+
+def transcode_args(src: str, dst: str, plan: dict) -> list[str]:
+    """ffmpeg argv for a CRF-capped H.264/AAC encode honouring the plan."""
+    v = plan["video_kbps"]
+    h = plan["height"]
+    return [
+        "-y", "-hide_banner", "-loglevel", "error", "-i", src,
+        # never upscale; -2 keeps the width even for yuv420p
+        "-vf", f"scale=-2:'min({h},ih)'",
+        "-c:v", "libx264", "-preset", "veryfast", "-crf", "26",
+        "-maxrate", f"{v}k", "-bufsize", f"{v * 2}k", "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-b:a", f"{plan['audio_kbps']}k", "-ac", "2",
+        "-movflags", "+faststart", dst,
+    ]
+
+
+async def _run_tool(tool: str, args: list[str], timeout: float):
+    """Run ffmpeg/ffprobe as a subprocess (never blocks the loop).
+    Returns (returncode, stdout, stderr); rc -1 means it timed out."""
+    proc = await asyncio.create_subprocess_exec(
+        tool, *args, stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    try:
+        out, err = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+    except asyncio.TimeoutError:
+        return -1, b"", b"timeout"
+    finally:
+        # timed out, or the job was cancelled (its message deleted): never
+        # leave ffmpeg running with nobody to reap it
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+    return proc.returncode, out or b"", err or b""
+
+
+async def probe_duration(path: str) -> float | None:
+    """Container duration in seconds via ffprobe, or None."""
+    if shutil.which("ffprobe") is None:
+        return None
+    try:
+        rc, out, _ = await _run_tool("ffprobe", [
+            "-v", "error", "-show_entries", "format=duration",
+            "-of", "default=noprint_wrappers=1:nokey=1", path], timeout=15)
+        return float(out.decode().strip()) if rc == 0 else None
+    except (OSError, ValueError):
+        return None
+
+
+async def transcode_to_fit(path: str, limit_bytes: int,
+                           duration: float | None = None) -> str | None:
+    """Re-encode `path` so it fits under `limit_bytes`. Returns the path of a
+    NEW temp file (the caller deletes it) or None if it can't be made to fit.
+    The source file is left untouched (it may be shared via download_shared)."""
+    if not ffmpeg_available():
+        print("[Ignio][Media] ffmpeg not found on host — cannot shrink oversized video.")
+        return None
+    duration = duration or await probe_duration(path)
+    plan = transcode_plan(duration or 0, limit_bytes)
+    if plan is None:
+        print(f"[Ignio][Media] transcode skipped: {duration}s can't fit in "
+              f"{limit_bytes / 1048576:.0f} MB")
+        return None
+    os.makedirs(TEMP_DIR, exist_ok=True)
+    fd, dst = tempfile.mkstemp(prefix="fit_", suffix=".mp4", dir=TEMP_DIR)
+    os.close(fd)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    src_mb = os.path.getsize(path) / 1048576
+    # second attempt only if rate control overshot: 20% fewer bits, one step smaller
+    for attempt in range(2):
+        try:
+            rc, _, err = await _run_tool("ffmpeg", transcode_args(path, dst, plan),
+                                         timeout=TRANSCODE_TIMEOUT())
+        except BaseException:
+            cleanup(dst)        # cancelled mid-encode: the caller never sees dst
+            raise
+        size = os.path.getsize(dst) if os.path.exists(dst) else 0
+        if rc == 0 and 0 < size <= limit_bytes:
+            print(f"[Ignio][Media] transcoded {src_mb:.1f} MB -> {size / 1048576:.1f} MB "
+                  f"({plan['height']}p, {plan['video_kbps']} kbps) in "
+                  f"{loop.time() - started:.1f}s")
+            return dst
+        cleanup(dst)
+        if rc != 0:
+            tail = " | ".join(err.decode("utf-8", "replace").strip().splitlines()[-2:])
+            print(f"[Ignio][Media] transcode failed (rc={rc}): {tail or '(no stderr)'}")
+            return None
+        plan = dict(plan, video_kbps=int(plan["video_kbps"] * 0.8),
+                    height=360 if plan["height"] <= 480 else 480)
+        if plan["video_kbps"] < MIN_VIDEO_KBPS:
+            break
+    print(f"[Ignio][Media] transcode could not get under "
+          f"{limit_bytes / 1048576:.0f} MB ({loop.time() - started:.1f}s)")
+    return None
 
 
 def cleanup(path: str | None):
@@ -211,87 +463,178 @@ def cleanup(path: str | None):
         pass
 
 
+# ---- video -> GIF (streamed through ffmpeg) -------------------------------
+VIDEO_GIF_MAX_INPUT = 25 * 1024 * 1024     # bytes read from the source URL
+VIDEO_GIF_MAX_OUTPUT = 15 * 1024 * 1024    # GIF bytes accepted from ffmpeg
+VIDEO_GIF_TIMEOUT = 25                     # seconds for one conversion
+_BROWSER_UA = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+               "(KHTML, like Gecko) Chrome/120.0 Safari/537.36")
+
+
+class _StreamCapExceeded(Exception):
+    pass
+
+
+def gif_filter(fps: int = 12, width: int = 400) -> str:
+    """One-pass palettegen/paletteuse graph: a per-clip 128-colour palette
+    (built from frame differences) looks far better than ffmpeg's default
+    256-colour web palette at these small sizes, and compresses smaller."""
+    return (f"fps={fps},scale={width}:-2:flags=lanczos,split[a][b];"
+            f"[a]palettegen=max_colors=128:stats_mode=diff[p];"
+            f"[b][p]paletteuse=dither=bayer:bayer_scale=3:diff_mode=rectangle")
+
+
+def gif_args(src: str, max_seconds: int) -> list[str]:
+    """ffmpeg argv: `src` (a path, or pipe:0) -> GIF on stdout."""
+    return ["-hide_banner", "-loglevel", "error", "-t", str(max_seconds),
+            "-i", src, "-an", "-filter_complex", gif_filter(),
+            "-loop", "0", "-f", "gif", "pipe:1"]
+
+
+async def pipe_through(tool: str, args: list[str], chunks, *, max_input: int,
+                       max_output: int, timeout: float):
+    """Stream `chunks` (an async iterator of bytes) into `tool`'s stdin while
+    collecting its stdout — no temp files. Caps are enforced on both streams
+    as the bytes flow; exceeding one kills the process.
+    Returns (output bytes or None, stderr text or reason)."""
+    proc = await asyncio.create_subprocess_exec(
+        tool, *args, stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+
+    async def _feed():
+        fed = 0
+        try:
+            async for chunk in chunks:
+                fed += len(chunk)
+                if fed > max_input:
+                    raise _StreamCapExceeded("source too large")
+                proc.stdin.write(chunk)
+                await proc.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            pass        # ffmpeg stops reading once it has -t seconds; that's fine
+        finally:
+            try:
+                proc.stdin.close()
+            except Exception:
+                pass
+
+    async def _collect():
+        out = bytearray()
+        while True:
+            part = await proc.stdout.read(64 * 1024)
+            if not part:
+                return bytes(out)
+            out.extend(part)
+            if len(out) > max_output:
+                raise _StreamCapExceeded("output too large")
+
+    streams = asyncio.gather(_feed(), _collect(), proc.stderr.read())
+    try:
+        _, out, err = await asyncio.wait_for(streams, timeout=timeout)
+        await proc.wait()
+    except (_StreamCapExceeded, asyncio.TimeoutError) as ex:
+        return None, str(ex) or "timeout"
+    finally:
+        # caps, timeout, cancellation or a failing source stream: stop the
+        # sibling readers and never leave ffmpeg running on open pipes
+        streams.cancel()
+        streams.add_done_callback(lambda f: f.cancelled() or f.exception())   # retrieved
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+    text = err.decode("utf-8", "replace")
+    if proc.returncode != 0 or not out:
+        return None, text or f"rc={proc.returncode}"
+    return out, text
+
+
 async def video_url_to_gif_bytes(url: str, max_seconds: int = 8) -> bytes | None:
     """Download a short public video URL (e.g. a Tenor/Klipy .mp4) and convert it
     to a GIF with ffmpeg. Returns GIF bytes, or None. Used as a caption fallback
-    when the image URL isn't a PIL-openable format."""
+    when the image URL isn't a PIL-openable format.
+
+    The HTTP body is piped straight into ffmpeg's stdin and the GIF read from
+    its stdout, so nothing touches disk. Only MP4s whose index (moov atom) sits
+    at the end can't be decoded from a pipe; those are retried once through a
+    temp file."""
     if not ffmpeg_available():
         print("[Ignio][Caption] ffmpeg not found on host — cannot convert video to gif. "
               "Install ffmpeg to caption webp/mp4 GIFs.")
         return None
-    from core.utilities.safety import is_safe_url
-    ok, _ = is_safe_url(url)
+    ok, _ = await is_safe_url_async(url)
     if not ok:
         return None
-    import asyncio as _asyncio
+    headers = {"User-Agent": _BROWSER_UA, "Referer": "https://discord.com/", "Accept": "*/*"}
+    try:
+        s = await sessions.get()
+        async with s.get(url, headers=headers, timeout=session_timeout("media")) as r:
+            if r.status not in (200, 206):
+                print(f"[Ignio][Caption] video download returned {r.status}")
+                return None
+            clen = r.headers.get("Content-Length")
+            if clen and clen.isdigit() and int(clen) > VIDEO_GIF_MAX_INPUT:
+                print("[Ignio][Caption] source too large")
+                return None
+            first = await r.content.read(64 * 1024)
+            # guard: if we got an HTML error page instead of media, bail with a note
+            if not first:
+                print("[Ignio][Caption] video download was empty")
+                return None
+            if first[:15].lstrip()[:1] == b"<" or b"<html" in first[:200].lower():
+                print("[Ignio][Caption] source returned an HTML page, not media (blocked?)")
+                return None
+
+            async def _body():
+                yield first
+                async for chunk in r.content.iter_chunked(64 * 1024):
+                    yield chunk
+
+            gif, err = await pipe_through(
+                "ffmpeg", gif_args("pipe:0", max_seconds), _body(),
+                max_input=VIDEO_GIF_MAX_INPUT, max_output=VIDEO_GIF_MAX_OUTPUT,
+                timeout=VIDEO_GIF_TIMEOUT)
+        if gif:
+            return gif
+        if err in ("source too large", "output too large", "timeout"):
+            print(f"[Ignio][Caption] video->gif stopped: {err}")
+            return None
+        print(f"[Ignio][Caption] streamed ffmpeg failed; retrying via temp file "
+              f"({' | '.join(err.strip().splitlines()[-2:]) or 'no stderr'})")
+        return await _video_file_to_gif(url, headers, max_seconds)
+    except Exception as ex:
+        print(f"[Ignio][Caption] video->gif failed: {type(ex).__name__}: {ex}")
+        return None
+
+
+async def _video_file_to_gif(url: str, headers: dict, max_seconds: int) -> bytes | None:
+    """Fallback for non-streamable inputs: spool the body to disk (never to
+    memory), then let ffmpeg seek in it. Output still comes back via stdout."""
     os.makedirs(TEMP_DIR, exist_ok=True)
-    src = os.path.join(TEMP_DIR, f"tsrc_{abs(hash(url)) % 10**8}")
-    dst = src + ".gif"
+    fd, src = tempfile.mkstemp(prefix="tsrc_", dir=TEMP_DIR)
     try:
-        import aiohttp
-        ua = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
-              "(KHTML, like Gecko) Chrome/120.0 Safari/537.36")
-        headers = {"User-Agent": ua, "Referer": "https://discord.com/",
-                   "Accept": "*/*"}
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=25)) as s:
-            async with s.get(url, headers=headers) as r:
+        size = 0
+        with os.fdopen(fd, "wb") as f:
+            s = await sessions.get()
+            async with s.get(url, headers=headers, timeout=session_timeout("media")) as r:
                 if r.status not in (200, 206):
-                    print(f"[Ignio][Caption] video download returned {r.status}")
                     return None
-                ctype = r.headers.get("Content-Type", "?")
-                clen = r.headers.get("Content-Length")
-                cap = 25 * 1024 * 1024
-                buf = bytearray()
                 async for chunk in r.content.iter_chunked(64 * 1024):
-                    buf.extend(chunk)
-                    if len(buf) > cap:
+                    size += len(chunk)
+                    if size > VIDEO_GIF_MAX_INPUT:
                         print("[Ignio][Caption] source too large")
                         return None
-                data = bytes(buf)
-        if not data:
-            print("[Ignio][Caption] video download was empty")
-            return None
-        if clen and clen.isdigit() and len(data) < int(clen):
-            print(f"[Ignio][Caption] SHORT video download: {len(data)} of {clen} bytes")
-            return None
-        # guard: if we got an HTML error page instead of media, bail with a note
-        if data[:15].lstrip()[:1] == b"<" or b"<html" in data[:200].lower():
-            print("[Ignio][Caption] source returned an HTML page, not media (blocked?)")
-            return None
-        print(f"[Ignio][Caption] downloaded {len(data)} bytes (type={ctype}); converting…")
-        with open(src, "wb") as f:
-            f.write(data)
-
-        # ffmpeg: input -> gif. -2 keeps dimensions even; no audio. Capture stderr.
-        async def _run(args):
-            proc = await _asyncio.create_subprocess_exec(
-                "ffmpeg", *args,
-                stdout=_asyncio.subprocess.DEVNULL, stderr=_asyncio.subprocess.PIPE)
-            try:
-                _, se = await _asyncio.wait_for(proc.communicate(), timeout=25)
-                return proc.returncode, (se or b"").decode("utf-8", "replace")
-            except _asyncio.TimeoutError:
-                proc.kill()
-                return -1, "timeout"
-
-        rc, err = await _run(["-y", "-t", str(max_seconds), "-i", src, "-an",
-                              "-vf", "fps=12,scale=400:-2:flags=lanczos",
-                              "-loop", "0", dst])
-        if not (os.path.exists(dst) and os.path.getsize(dst) > 0):
-            # retry with no scaling (some odd inputs choke on the filter)
-            print(f"[Ignio][Caption] first ffmpeg pass failed (rc={rc}); retrying simpler")
-            rc, err = await _run(["-y", "-t", str(max_seconds), "-i", src, "-an",
-                                  "-vf", "fps=10", "-loop", "0", dst])
-
-        if os.path.exists(dst) and os.path.getsize(dst) > 0:
-            with open(dst, "rb") as f:
-                return f.read()
-        tail = " | ".join(err.strip().splitlines()[-3:]) if err else "(no stderr)"
-        print(f"[Ignio][Caption] ffmpeg produced no output. ffmpeg says: {tail}")
-        return None
-    except Exception as ex:
-        print(f"[Ignio][Caption] video->gif failed: {type(ex).__name__}: {ex}")
-        return None
+                    f.write(chunk)
+
+        async def _nothing():
+            return
+            yield  # noqa: unreachable — makes this an (empty) async generator
+
+        gif, err = await pipe_through(
+            "ffmpeg", gif_args(src, max_seconds), _nothing(),
+            max_input=0, max_output=VIDEO_GIF_MAX_OUTPUT, timeout=VIDEO_GIF_TIMEOUT)
+        if not gif:
+            tail = " | ".join(err.strip().splitlines()[-3:]) if err else "(no stderr)"
+            print(f"[Ignio][Caption] ffmpeg produced no output. ffmpeg says: {tail}")
+        return gif
     finally:
         cleanup(src)
-        cleanup(dst)
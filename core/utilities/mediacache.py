@@ -0,0 +1,241 @@
+# core/utilities/mediacache.py
+"""
+Optional on-disk cache for mention-to-download videos.
+
+Off unless MEDIA_CACHE_DIR is set. Layout:
+  <dir>/blobs/<sha256>.<ext>   the video, named by its content hash
+  <dir>/urls/<sha1>.json       canonical URL -> {hash, ext, title, ...}
+
+Content addressing means the same clip reached through different links
+(share URLs, mirrors) is stored once. Callers never get the blob itself:
+get() hands out a hard link (or copy) in media.TEMP_DIR, so the usual
+"delete the temp file after upload" flow can't remove a cached video.
+
+Bounded by MEDIA_CACHE_MB (LRU by last use, tracked via atime like the tile
+cache) and MEDIA_CACHE_HOURS (TTL from fetch time). Expired and orphaned
+files are swept on first use after startup. Methods are blocking file I/O —
+call them via asyncio.to_thread.
+"""
+from __future__ import annotations
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+
+from core.utilities.safety import canonicalize_url
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, ""))
+    except (TypeError, ValueError):
+        return default
+
+
+# metadata copied in and out of DownloadResult
+META_FIELDS = ("title", "source", "url", "uploader", "duration")
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _link_or_copy(src: str, dst: str):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+class MediaCache:
+    def __init__(self, root: str | None = None, max_bytes: int | None = None,
+                 ttl: float | None = None):
+        self.root = root if root is not None else (os.environ.get("MEDIA_CACHE_DIR") or "")
+        self.max_bytes = max_bytes if max_bytes is not None else \
+            _env_int("MEDIA_CACHE_MB", 512) * 1024 * 1024
+        self.ttl = ttl if ttl is not None else _env_int("MEDIA_CACHE_HOURS", 24) * 3600
+        # url_key -> meta dict (hash, ext, fetched, META_FIELDS)
+        self._urls: dict[str, dict] = {}
+        # content hash -> [size, last_used, ext]
+        self._blobs: dict[str, list] = {}
+        self._bytes = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.root)
+
+    @staticmethod
+    def url_key(url: str) -> str:
+        return hashlib.sha1(canonicalize_url(url).encode("utf-8", "replace")).hexdigest()
+
+    def _blob_path(self, digest: str, ext: str) -> str:
+        return os.path.join(self.root, "blobs", f"{digest}{ext}")
+
+    def _url_path(self, key: str) -> str:
+        return os.path.join(self.root, "urls", f"{key}.json")
+
+    @staticmethod
+    def _remove(p: str):
+        try:
+            os.remove(p)
+        except OSError:
+            pass
+
+    # ----- index -----------------------------------------------------------
+
+    def _load(self):
+        """Build the index once; drops expired entries and orphaned blobs."""
+        if self._loaded:
+            return
+        self._loaded = True
+        now = time.time()
+        udir = os.path.join(self.root, "urls")
+        bdir = os.path.join(self.root, "blobs")
+        for fn in (os.listdir(udir) if os.path.isdir(udir) else ()):
+            p = os.path.join(udir, fn)
+            try:
+                with open(p, encoding="utf-8") as f:
+                    meta = json.load(f)
+                fresh = now - float(meta["fetched"]) <= self.ttl
+            except (OSError, ValueError, KeyError, TypeError):
+                fresh = False
+            if fresh:
+                self._urls[fn[:-5]] = meta
+            else:
+                self._remove(p)
+        wanted = {m["hash"] for m in self._urls.values()}
+        for fn in (os.listdir(bdir) if os.path.isdir(bdir) else ()):
+            p = os.path.join(bdir, fn)
+            digest, ext = os.path.splitext(fn)
+            if digest not in wanted or fn.endswith(".tmp"):
+                self._remove(p)
+                continue
+            try:
+                st = os.stat(p)
+            except OSError:
+                continue
+            self._blobs[digest] = [st.st_size, st.st_atime, ext]
+            self._bytes += st.st_size
+        # URL entries whose blob vanished are useless
+        for k in [k for k, m in self._urls.items() if m["hash"] not in self._blobs]:
+            self._drop_url(k)
+        self._evict()
+
+    def _drop_url(self, key: str):
+        if self._urls.pop(key, None) is not None:
+            self._remove(self._url_path(key))
+
+    def _drop_blob(self, digest: str):
+        ent = self._blobs.pop(digest, None)
+        if ent is None:
+            return
+        self._bytes -= ent[0]
+        self._remove(self._blob_path(digest, ent[2]))
+        for k in [k for k, m in self._urls.items() if m["hash"] == digest]:
+            self._drop_url(k)
+
+    def _evict(self):
+        if self._bytes <= self.max_bytes:
+            return
+        for digest in sorted(self._blobs, key=lambda d: self._blobs[d][1]):
+            if self._bytes <= self.max_bytes:
+                break
+            self._drop_blob(digest)
+
+    # ----- public ------------------------------------------------------------
+
+    def get(self, url: str, dest_dir: str, max_bytes: int | None = None) -> dict | None:
+        """Return {path, META_FIELDS...} with a private copy of the cached video
+        placed in dest_dir, or None on a miss."""
+        if not self.enabled:
+            return None
+        key = self.url_key(url)
+        with self._lock:
+            self._load()
+            meta = self._urls.get(key)
+            now = time.time()
+            if meta is None or now - float(meta["fetched"]) > self.ttl:
+                if meta is not None:
+                    self._drop_url(key)
+                self.misses += 1
+                return None
+            ent = self._blobs.get(meta["hash"])
+            if ent is None or (max_bytes is not None and ent[0] > max_bytes):
+                self.misses += 1
+                return None
+            src = self._blob_path(meta["hash"], ent[2])
+            os.makedirs(dest_dir, exist_ok=True)
+            dst = os.path.join(dest_dir, f"c{meta['hash'][:16]}_{os.getpid()}_{int(now * 1000)}{ent[2]}")
+            try:
+                _link_or_copy(src, dst)
+                os.utime(src, (now, os.stat(src).st_mtime))   # atime = last use
+            except OSError:
+                self._drop_blob(meta["hash"])
+                self.misses += 1
+                return None
+            ent[1] = now
+            self.hits += 1
+            out = {f: meta.get(f) for f in META_FIELDS}
+            out["path"] = dst
+            return out
+
+    def put(self, url: str, path: str, meta: dict | None = None) -> str | None:
+        """Store a downloaded file under its content hash. The file at `path`
+        is left in place (the caller still owns it). Returns the hash."""
+        if not self.enabled or not path or not os.path.exists(path):
+            return None
+        try:
+            size = os.path.getsize(path)
+            if size <= 0 or size > self.max_bytes:
+                return None
+            digest = file_sha256(path)
+        except OSError:
+            return None
+        ext = os.path.splitext(path)[1].lower()[:8]
+        key = self.url_key(url)
+        with self._lock:
+            self._load()
+            now = time.time()
+            try:
+                os.makedirs(os.path.join(self.root, "blobs"), exist_ok=True)
+                os.makedirs(os.path.join(self.root, "urls"), exist_ok=True)
+                if digest not in self._blobs:
+                    blob = self._blob_path(digest, ext)
+                    tmp = blob + ".tmp"
+                    _link_or_copy(path, tmp)
+                    os.replace(tmp, blob)
+                    self._blobs[digest] = [size, now, ext]
+                    self._bytes += size
+                else:
+                    self._blobs[digest][1] = now
+                record = {f: (meta or {}).get(f) for f in META_FIELDS}
+                record.update(hash=digest, fetched=now)
+                tmp = self._url_path(key) + ".tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(record, f)
+                os.replace(tmp, self._url_path(key))
+                self._urls[key] = record
+            except OSError:
+                return None
+            self._evict()
+            return digest
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"urls": len(self._urls), "blobs": len(self._blobs),
+                    "bytes": self._bytes, "hits": self.hits, "misses": self.misses}
+
+
+# the shared instance media.download() consults (disabled unless configured)
+media_cache = MediaCache()
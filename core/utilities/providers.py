@@ -4,7 +4,7 @@ Real provider integrations for the Utilities commands.
 
 Defaults are chosen to need NO API key so they work out of the box:
   - weather   : Open-Meteo (free, no key) + Open-Meteo geocoding
-  - map       : Nominatim geocoding (free) + OSM static map tile
+  - map       : Nominatim geocoding (free) + OSM static map tiles (disk-cached)
   - translate : MyMemory translation API (free, no key)
   - xray      : aiohttp redirect-following (no key)
 Optional, key-gated (no free no-key option exists):
@@ -12,28 +12,39 @@ Optional, key-gated (no free no-key option exists):
   - song      : AudD if UTIL_SONG_API_KEY set (also needs audio extraction)
 
 Every call is wrapped so a network/parse failure returns a clean None/!error
-instead of throwing. Nothing is cached to disk; the cog uses the in-memory
-dedup cache from jobs.py.
+instead of throwing. Successful lookups (geocode, weather, translate, xray,
+transcripts, Tenor/Klipy resolution) go through the persistent response cache
+in respcache.py; public OSM map tiles are cached on disk by tilecache.py. All
+HTTP goes through the shared pooled session in sessions.py (warm keep-alive
+connections, per-provider timeouts) and each provider's circuit breaker in
+health.py, so an outage fails fast instead of holding job slots.
 """
 from __future__ import annotations
 
 import os
 import io
 import asyncio
+from collections import OrderedDict
 
-import aiohttp
+from core.utilities.health import failed_status, health
+from core.utilities.respcache import response_cache, text_key, url_key
+from core.utilities.safety import is_safe_url_async
+from core.utilities.sessions import sessions, timeout as _timeout
+from core.utilities.tilecache import tile_cache
 
-from core.utilities.safety import is_safe_url
-
-_TIMEOUT = aiohttp.ClientTimeout(total=12)
 _UA = {"User-Agent": "IgnioBot/1.0 (Discord utility; contact server admin)"}
 _MAX_BYTES = 4 * 1024 * 1024
 
 
-async def _get_json(url: str, params: dict | None = None, headers: dict | None = None):
-    async with aiohttp.ClientSession(timeout=_TIMEOUT) as s:
-        async with s.get(url, params=params, headers={**_UA, **(headers or {})}) as r:
+async def _get_json(url: str, params: dict | None = None, headers: dict | None = None,
+                    provider: str = ""):
+    s = await sessions.get()
+    async with health.guard(provider or "http") as outcome:
+        async with s.get(url, params=params, headers={**_UA, **(headers or {})},
+                         timeout=_timeout(provider)) as r:
             if r.status != 200:
+                if failed_status(r.status):
+                    outcome.fail(f"HTTP {r.status}")
                 return None
             return await r.json(content_type=None)
 
@@ -43,9 +54,15 @@ async def _get_json(url: str, params: dict | None = None, headers: dict | None =
 # --------------------------------------------------------------------------- #
 async def geocode(place: str):
     """Return up to 3 candidates: [{name, lat, lon, country, admin1}]."""
+    return await response_cache.cached("geocode", text_key(place),
+                                       lambda: _geocode(place))
+
+
+async def _geocode(place: str):
     data = await _get_json(
         "https://geocoding-api.open-meteo.com/v1/search",
-        {"name": place, "count": 3, "language": "en", "format": "json"})
+        {"name": place, "count": 3, "language": "en", "format": "json"},
+        provider="open-meteo")
     if not data or not data.get("results"):
         return []
     out = []
@@ -62,7 +79,13 @@ async def geocode(place: str):
 
 async def weather(place: str, us_units_default: bool = True):
     """Return a compact weather dict, or None."""
-    spots = await geocode(place)
+    return await response_cache.cached(
+        "weather", text_key(place, us_units_default),
+        lambda: _weather(place, us_units_default))
+
+
+async def _weather(place: str, us_units_default: bool = True):
+    spots = await geocode_hedged(place, prefer="open-meteo")
     if not spots:
         return None
     spot = spots[0]
@@ -77,7 +100,7 @@ async def weather(place: str, us_units_default: bool = True):
             "daily": "temperature_2m_max,temperature_2m_min",
             "temperature_unit": unit,
             "timezone": "auto", "forecast_days": 2,
-        })
+        }, provider="open-meteo")
     if not data:
         return None
     cur = data.get("current", {})
@@ -119,10 +142,15 @@ def weather_desc(code) -> str:
 # --------------------------------------------------------------------------- #
 async def geocode_osm(place: str):
     """Nominatim geocoding; returns up to 3 {display_name, lat, lon, type}."""
+    return await response_cache.cached("geocode_osm", text_key(place),
+                                       lambda: _geocode_osm(place))
+
+
+async def _geocode_osm(place: str):
     data = await _get_json(
         "https://nominatim.openstreetmap.org/search",
         {"q": place, "format": "json", "limit": 3, "addressdetails": 0},
-        headers={"Accept-Language": "en"})
+        headers={"Accept-Language": "en"}, provider="nominatim")
     if not data:
         return []
     return [{
@@ -134,6 +162,73 @@ async def geocode_osm(place: str):
     } for d in data]
 
 
+# --------------------------------------------------------------------------- #
+# Hedged geocoding: Open-Meteo and Nominatim can stand in for each other
+# --------------------------------------------------------------------------- #
+GEOCODE_HEDGE = lambda: (os.environ.get("UTIL_GEOCODE_HEDGE", "on").lower()
+                         not in ("0", "off", "false", "no"))
+HEDGE_MIN_DELAY = 0.4        # seconds before the backup geocoder is tried
+HEDGE_MAX_DELAY = 2.5
+
+
+def _hedge_delay(provider: str) -> float:
+    """Wait about the primary's usual p95 before hedging (1s with no data)."""
+    p95 = health.breaker(provider).latency.percentile(0.95)
+    secs = p95 / 1000 if p95 else 1.0
+    return max(HEDGE_MIN_DELAY, min(HEDGE_MAX_DELAY, secs))
+
+
+def _osm_to_meteo(spot: dict, rank: int = 0) -> dict:
+    parts = [p.strip() for p in (spot.get("display_name") or "").split(",") if p.strip()]
+    return {"name": parts[0] if parts else None, "lat": spot["lat"], "lon": spot["lon"],
+            "country": parts[-1] if len(parts) > 1 else None,
+            "admin1": parts[-2] if len(parts) > 2 else None}
+
+
+def _meteo_to_osm(spot: dict, rank: int = 0) -> dict:
+    label = ", ".join(x for x in (spot.get("name"), spot.get("admin1"), spot.get("country")) if x)
+    # Open-Meteo already ranks by relevance; trust its top hit like a confident Nominatim one
+    return {"display_name": label, "lat": spot["lat"], "lon": spot["lon"],
+            "type": "city", "importance": 0.6 if rank == 0 else 0.3, "bbox": None}
+
+
+async def geocode_hedged(place: str, prefer: str = "open-meteo"):
+    """Geocode with the preferred provider, hedged by the other one.
+
+    The backup starts if the preferred geocoder is slower than its usual p95,
+    errors, comes back empty or has an open circuit; the first non-empty
+    answer wins (converted to the preferred provider's shape) and the other
+    request is cancelled. UTIL_GEOCODE_HEDGE=off disables the backup."""
+    if prefer == "nominatim":
+        primary, alternate, convert = geocode_osm, geocode, _meteo_to_osm
+    else:
+        prefer, primary, alternate, convert = "open-meteo", geocode, geocode_osm, _osm_to_meteo
+    if not GEOCODE_HEDGE():
+        return await primary(place)
+
+    async def _safe(fn):
+        try:
+            return await fn(place) or []
+        except Exception:
+            return []
+
+    first = asyncio.ensure_future(_safe(primary))
+    done, _ = await asyncio.wait({first}, timeout=_hedge_delay(prefer))
+    if done and first.result():
+        return first.result()
+    second = asyncio.ensure_future(_safe(alternate))
+    pending = {first, second}
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for t in done:
+            res = t.result()
+            if res:
+                for other in pending:
+                    other.cancel()
+                return res if t is first else [convert(x, i) for i, x in enumerate(res)]
+    return []
+
+
 def _zoom_for_type(t: str, bbox=None) -> int:
     # if we have a bounding box, compute a zoom that frames it
     if bbox and len(bbox) == 4:
@@ -165,18 +260,33 @@ def _zoom_for_type(t: str, bbox=None) -> int:
     return 11
 
 
+TILE_CONCURRENCY = 4         # parallel tile downloads per !map
+MAP_MEMO_SIZE = 32           # recent rendered maps kept in memory
+_map_memo: "OrderedDict[tuple, bytes]" = OrderedDict()
+
+
 async def static_map_png(lat: float, lon: float, zoom: int) -> bytes | None:
     """Build a small static map centered exactly on (lat, lon) with a pin.
 
-    Stitches a 3x3 block of OSM tiles, then crops a window centered on the
+    Stitches a 5x4 block of OSM tiles, then crops a window centered on the
     EXACT fractional pixel position of the point (not the tile corner), so the
     marker and the map are both perfectly centered.
+
+    Tiles come from the on-disk tile cache when possible; misses are fetched
+    concurrently (bounded by TILE_CONCURRENCY). Fully rendered maps for recent
+    (lat, lon, zoom) are memoised, so repeat lookups do no network I/O at all.
     """
     import math
     try:
-        from PIL import Image, ImageDraw
+        from PIL import Image  # noqa: F401
     except Exception:
         return None
+    key = (round(lat, 5), round(lon, 5), int(zoom))
+    hit = _map_memo.get(key)
+    if hit is not None:
+        _map_memo.move_to_end(key)
+        return hit
+
     n = 2 ** zoom
     xt = (lon + 180.0) / 360.0 * n
     yt = (1.0 - math.log(math.tan(math.radians(lat)) + 1 / math.cos(math.radians(lat))) / math.pi) / 2.0 * n
@@ -185,28 +295,62 @@ async def static_map_png(lat: float, lon: float, zoom: int) -> bytes | None:
 
     # 5x4 tile grid; center tile (cx,cy) is pasted at (512,256) so there's
     # always slack to center the crop on the point without clamping.
+    cells = []
+    for dx in (-2, -1, 0, 1, 2):
+        for dy in (-2, -1, 0, 1):
+            # longitude wraps around the globe, so wrap tx instead of skipping
+            tx, ty = (cx + dx) % n, cy + dy
+            if 0 <= ty < n:
+                cells.append((dx, dy, tx, ty))
+
+    s = await sessions.get()
+    sem = asyncio.Semaphore(TILE_CONCURRENCY)
+
+    async def _tile(tx, ty):
+        raw = await asyncio.to_thread(tile_cache.get, zoom, tx, ty)
+        if raw is not None:
+            return raw
+        url = f"https://tile.openstreetmap.org/{zoom}/{tx}/{ty}.png"
+        async with sem:
+            try:
+                async with health.guard("osm-tiles") as outcome:
+                    async with s.get(url, headers=_UA, timeout=_timeout("osm-tiles")) as r:
+                        if r.status != 200:
+                            if failed_status(r.status):
+                                outcome.fail(f"HTTP {r.status}")
+                            return None
+                        raw = await r.read()
+            except Exception:
+                return None
+        if raw[:8] != b"\x89PNG\r\n\x1a\n":
+            return None
+        await asyncio.to_thread(tile_cache.put, zoom, tx, ty, raw)
+        return raw
+
+    raws = await asyncio.gather(*(_tile(tx, ty) for _, _, tx, ty in cells))
+    tiles = [(dx, dy, raw) for (dx, dy, _, _), raw in zip(cells, raws) if raw]
+    png = await asyncio.to_thread(_compose_map, tiles, fx, fy)
+    if png and len(tiles) == len(cells):
+        # only memoise complete maps; a partial one should retry its tiles
+        _map_memo[key] = png
+        while len(_map_memo) > MAP_MEMO_SIZE:
+            _map_memo.popitem(last=False)
+    return png
+
+
+def _compose_map(tiles, fx: float, fy: float) -> bytes | None:
+    """Paste fetched tiles onto the canvas, crop around the point, draw the pin."""
+    from PIL import Image, ImageDraw
     # background = ocean color so any uncovered area blends in (not white).
     OCEAN = (170, 211, 223)
     canvas = Image.new("RGB", (1280, 1024), OCEAN)
     base_x, base_y = 2, 2  # center tile offset in the grid
-    async with aiohttp.ClientSession(timeout=_TIMEOUT) as s:
-        for dx in (-2, -1, 0, 1, 2):
-            for dy in (-2, -1, 0, 1):
-                tx, ty = cx + dx, cy + dy
-                # longitude wraps around the globe, so wrap tx instead of skipping
-                tx = tx % n
-                if not (0 <= ty < n):
-                    continue
-                url = f"https://tile.openstreetmap.org/{zoom}/{tx}/{ty}.png"
-                try:
-                    async with s.get(url, headers=_UA) as r:
-                        if r.status != 200:
-                            continue
-                        raw = await r.read()
-                    tile = Image.open(io.BytesIO(raw)).convert("RGB")
-                    canvas.paste(tile, ((dx + base_x) * 256, (dy + base_y) * 256))
-                except Exception:
-                    continue
+    for dx, dy, raw in tiles:
+        try:
+            tile = Image.open(io.BytesIO(raw)).convert("RGB")
+            canvas.paste(tile, ((dx + base_x) * 256, (dy + base_y) * 256))
+        except Exception:
+            continue
 
     # exact pixel of the point on the canvas
     point_x = base_x * 256 + fx * 256
@@ -253,9 +397,15 @@ async def translate(text: str, target_lang: str):
     tgt = norm_lang(target_lang)
     if not tgt:
         return None
+    # source text is keyed verbatim (case and spacing can change a translation)
+    return await response_cache.cached("translate", f"{tgt}\x1f{text[:480]}",
+                                       lambda: _translate(text, tgt))
+
+
+async def _translate(text: str, tgt: str):
     data = await _get_json(
         "https://api.mymemory.translated.net/get",
-        {"q": text[:480], "langpair": f"autodetect|{tgt}"})
+        {"q": text[:480], "langpair": f"autodetect|{tgt}"}, provider="mymemory")
     if not data or "responseData" not in data:
         return None
     rd = data["responseData"]
@@ -271,11 +421,18 @@ async def xray(url: str):
     Uses manual redirect following so every hop (including the final one) is
     re-validated against the SSRF guard before we ever connect to it. Counts
     redirects accurately and never claims a redirect that didn't happen.
+    Clean reports are cached; blocked hops and network errors never are.
     """
-    from urllib.parse import urljoin
-    safe, reason = is_safe_url(url)
+    safe, reason = await is_safe_url_async(url)
     if not safe:
         return {"blocked": reason}
+    return await response_cache.cached(
+        "xray", url_key(url), lambda: _xray(url),
+        keep=lambda r: bool(r) and not (r.get("blocked") or r.get("error")))
+
+
+async def _xray(url: str):
+    from urllib.parse import urljoin
 
     REDIRECT_CODES = (301, 302, 303, 307, 308)
     MAX_REDIRECTS = 5
@@ -284,28 +441,29 @@ async def xray(url: str):
     ctype = "unknown"
     status = None
     try:
-        async with aiohttp.ClientSession(timeout=_TIMEOUT) as s:
-            for _ in range(MAX_REDIRECTS + 1):
-                # re-validate EVERY hop before connecting (SSRF / DNS rebinding)
-                ok, why = is_safe_url(cur)
-                if not ok:
-                    return {"blocked": why, "hops": len(history), "final": cur}
-                async with s.get(cur, allow_redirects=False, headers=_UA) as r:
-                    status = r.status
-                    ctype = (r.headers.get("Content-Type") or "unknown").split(";")[0].strip()
-                    loc = r.headers.get("Location")
-                    if status in REDIRECT_CODES and loc:
-                        nxt = urljoin(cur, loc)   # handles relative AND absolute
-                        if nxt == cur:
-                            break                  # self-redirect guard
-                        history.append(cur)
-                        cur = nxt
-                        continue
-                    break
-            else:
-                # hit the redirect cap
-                return {"final": cur, "hops": len(history), "content_type": ctype,
-                        "kind": _ctype_kind(ctype), "status": status, "capped": True}
+        s = await sessions.get()
+        for _ in range(MAX_REDIRECTS + 1):
+            # re-validate EVERY hop before connecting (SSRF / DNS rebinding)
+            ok, why = await is_safe_url_async(cur)
+            if not ok:
+                return {"blocked": why, "hops": len(history), "final": cur}
+            async with s.get(cur, allow_redirects=False, headers=_UA,
+                             timeout=_timeout("xray")) as r:
+                status = r.status
+                ctype = (r.headers.get("Content-Type") or "unknown").split(";")[0].strip()
+                loc = r.headers.get("Location")
+                if status in REDIRECT_CODES and loc:
+                    nxt = urljoin(cur, loc)   # handles relative AND absolute
+                    if nxt == cur:
+                        break                  # self-redirect guard
+                    history.append(cur)
+                    cur = nxt
+                    continue
+                break
+        else:
+            # hit the redirect cap
+            return {"final": cur, "hops": len(history), "content_type": ctype,
+                    "kind": _ctype_kind(ctype), "status": status, "capped": True}
     except Exception:
         # network error — report what we have, don't crash
         return {"final": cur, "hops": len(history), "content_type": ctype,
@@ -366,45 +524,51 @@ async def llm_complete(system: str, user: str, max_tokens: int = 400) -> str | N
     try:
         if provider == "anthropic":
             model = os.environ.get("UTIL_LLM_MODEL", "claude-3-5-haiku-20241022")
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30)) as s:
-                async with s.post(
-                    "https://api.anthropic.com/v1/messages",
-                    headers={"x-api-key": key, "anthropic-version": "2023-06-01",
-                             "content-type": "application/json"},
-                    json={"model": model, "max_tokens": max_tokens, "system": system,
-                          "messages": [{"role": "user", "content": user}]},
-                ) as r:
-                    if r.status != 200:
-                        return None
-                    data = await r.json()
-                    parts = data.get("content", [])
-                    return "".join(p.get("text", "") for p in parts
-                                   if p.get("type") == "text").strip()
+            s = await sessions.get()
+            async with health.guard("llm") as outcome, s.post(
+                "https://api.anthropic.com/v1/messages",
+                headers={"x-api-key": key, "anthropic-version": "2023-06-01",
+                         "content-type": "application/json"},
+                json={"model": model, "max_tokens": max_tokens, "system": system,
+                      "messages": [{"role": "user", "content": user}]},
+                timeout=_timeout("llm"),
+            ) as r:
+                if r.status != 200:
+                    if failed_status(r.status):
+                        outcome.fail(f"HTTP {r.status}")
+                    return None
+                data = await r.json()
+                parts = data.get("content", [])
+                return "".join(p.get("text", "") for p in parts
+                               if p.get("type") == "text").strip()
         else:  # openai
             model = os.environ.get("UTIL_LLM_MODEL", "gpt-4o-mini")
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30)) as s:
-                async with s.post(
-                    "https://api.openai.com/v1/chat/completions",
-                    headers={"Authorization": f"Bearer {key}",
-                             "content-type": "application/json"},
-                    json={"model": model, "max_tokens": max_tokens,
-                          "messages": [{"role": "system", "content": system},
-                                       {"role": "user", "content": user}]},
-                ) as r:
-                    if r.status != 200:
-                        # log status + short body (NEVER the key/headers) for debugging
-                        try:
-                            body = (await r.text())[:300]
-                        except Exception:
-                            body = ""
-                        print(f"[Ignio][LLM] OpenAI {r.status} for model '{model}': {body}")
-                        return None
-                    data = await r.json()
-                    choices = data.get("choices", [])
-                    if not choices:
-                        print("[Ignio][LLM] OpenAI returned no choices.")
-                        return None
-                    return (choices[0].get("message", {}).get("content") or "").strip()
+            s = await sessions.get()
+            async with health.guard("llm") as outcome, s.post(
+                "https://api.openai.com/v1/chat/completions",
+                headers={"Authorization": f"Bearer {key}",
+                         "content-type": "application/json"},
+                json={"model": model, "max_tokens": max_tokens,
+                      "messages": [{"role": "system", "content": system},
+                                   {"role": "user", "content": user}]},
+                timeout=_timeout("llm"),
+            ) as r:
+                if r.status != 200:
+                    if failed_status(r.status):
+                        outcome.fail(f"HTTP {r.status}")
+                    # log status + short body (NEVER the key/headers) for debugging
+                    try:
+                        body = (await r.text())[:300]
+                    except Exception:
+                        body = ""
+                    print(f"[Ignio][LLM] OpenAI {r.status} for model '{model}': {body}")
+                    return None
+                data = await r.json()
+                choices = data.get("choices", [])
+                if not choices:
+                    print("[Ignio][LLM] OpenAI returned no choices.")
+                    return None
+                return (choices[0].get("message", {}).get("content") or "").strip()
     except Exception:
         return None
 
@@ -426,9 +590,14 @@ async def youtube_transcript(url: str, max_chars: int = 6000) -> str | None:
     """Fetch a YouTube video's transcript via yt-dlp subtitle extraction (manual
     subs first, then auto-captions). No API key or paid quota needed. Returns
     plain text, or None if unavailable."""
-    ok, _ = is_safe_url(url)
+    ok, _ = await is_safe_url_async(url)
     if not ok:
         return None
+    return await response_cache.cached("transcript", url_key(url, max_chars),
+                                       lambda: _youtube_transcript(url, max_chars))
+
+
+async def _youtube_transcript(url: str, max_chars: int):
     try:
         import yt_dlp  # optional dependency
     except Exception:
@@ -476,11 +645,14 @@ async def youtube_transcript(url: str, max_chars: int = 6000) -> str | None:
         return None
     # download the subtitle file and strip to plain text
     try:
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=15)) as s:
-            async with s.get(sub_url, headers=_UA) as r:
-                if r.status != 200:
-                    return None
-                raw = await r.text()
+        s = await sessions.get()
+        async with health.guard("transcript") as outcome, \
+                s.get(sub_url, headers=_UA, timeout=_timeout("transcript")) as r:
+            if r.status != 200:
+                if failed_status(r.status):
+                    outcome.fail(f"HTTP {r.status}")
+                return None
+            raw = await r.text()
     except Exception:
         return None
     text = _strip_captions(raw)
@@ -532,9 +704,14 @@ async def resolve_tenor(url: str) -> dict | None:
 
     Strategy: read the page's og:image/og:video meta tags AND construct the
     canonical media URL from the numeric id as a reliable fallback."""
-    ok, _ = is_safe_url(url)
+    ok, _ = await is_safe_url_async(url)
     if not ok:
         return None
+    return await response_cache.cached("tenor", url_key(url),
+                                       lambda: _resolve_tenor(url))
+
+
+async def _resolve_tenor(url: str) -> dict | None:
 
     # extract the numeric tenor id from the /view/ slug
     gif_direct = None
@@ -546,26 +723,29 @@ async def resolve_tenor(url: str) -> dict | None:
     gif = None
     mp4 = None
     try:
-        async with aiohttp.ClientSession(timeout=_TIMEOUT) as s:
-            async with s.get(url, headers=_UA) as r:
-                if r.status == 200:
-                    html = await r.text()
+        s = await sessions.get()
+        async with health.guard("tenor") as outcome, \
+                s.get(url, headers=_UA, timeout=_timeout("tenor")) as r:
+            if failed_status(r.status):
+                outcome.fail(f"HTTP {r.status}")
+            if r.status == 200:
+                html = await r.text()
 
-                    def _meta(prop):
+                def _meta(prop):
+                    mm = _re.search(
+                        r'<meta[^>]+(?:property|name)=["\']%s["\'][^>]+content=["\']([^"\']+)["\']' % _re.escape(prop),
+                        html, _re.I)
+                    if not mm:
                         mm = _re.search(
-                            r'<meta[^>]+(?:property|name)=["\']%s["\'][^>]+content=["\']([^"\']+)["\']' % _re.escape(prop),
+                            r'<meta[^>]+content=["\']([^"\']+)["\'][^>]+(?:property|name)=["\']%s["\']' % _re.escape(prop),
                             html, _re.I)
-                        if not mm:
-                            mm = _re.search(
-                                r'<meta[^>]+content=["\']([^"\']+)["\'][^>]+(?:property|name)=["\']%s["\']' % _re.escape(prop),
-                                html, _re.I)
-                        return mm.group(1) if mm else None
-
-                    og_image = _meta("og:image")
-                    # only accept og:image if it's actually a gif/png/jpg
-                    if og_image and og_image.lower().split("?")[0].endswith((".gif", ".png", ".jpg", ".jpeg", ".webp")):
-                        gif = og_image
-                    mp4 = _meta("og:video") or _meta("og:video:secure_url")
+                    return mm.group(1) if mm else None
+
+                og_image = _meta("og:image")
+                # only accept og:image if it's actually a gif/png/jpg
+                if og_image and og_image.lower().split("?")[0].endswith((".gif", ".png", ".jpg", ".jpeg", ".webp")):
+                    gif = og_image
+                mp4 = _meta("og:video") or _meta("og:video:secure_url")
     except Exception:
         pass
 
@@ -583,20 +763,28 @@ async def resolve_klipy(page_url: str) -> dict | None:
     full-size media by reading og:video / og:image from the page HTML. The embed's
     static.klipy.com thumbnail is only an 840-byte preview stub, so we must go to
     the page for the real animation. Returns {gif, mp4} or None."""
-    ok, _ = is_safe_url(page_url)
+    ok, _ = await is_safe_url_async(page_url)
     if not ok:
         return None
     # only meaningful for the human-facing page, not the static stub
     if "static.klipy.com" in page_url.lower():
         return None
+    return await response_cache.cached("klipy", url_key(page_url),
+                                       lambda: _resolve_klipy(page_url))
+
+
+async def _resolve_klipy(page_url: str) -> dict | None:
     gif = None
     mp4 = None
     try:
-        async with aiohttp.ClientSession(timeout=_TIMEOUT) as s:
-            async with s.get(page_url, headers=_UA) as r:
-                if r.status != 200:
-                    return None
-                html = await r.text()
+        s = await sessions.get()
+        async with health.guard("klipy") as outcome, \
+                s.get(page_url, headers=_UA, timeout=_timeout("klipy")) as r:
+            if r.status != 200:
+                if failed_status(r.status):
+                    outcome.fail(f"HTTP {r.status}")
+                return None
+            html = await r.text()
     except Exception:
         return None
 
@@ -639,17 +827,20 @@ async def song_recognize(audio_url: str):
     if not key:
         return None
     try:
-        async with aiohttp.ClientSession(timeout=_TIMEOUT) as s:
-            async with s.post("https://api.audd.io/",
-                              data={"api_token": key, "url": audio_url,
-                                    "return": "spotify"}) as r:
-                if r.status != 200:
-                    return None
-                data = await r.json()
-                res = data.get("result")
-                if not res:
-                    return None
-                return {"title": res.get("title"), "artist": res.get("artist"),
-                        "url": (res.get("spotify") or {}).get("external_urls", {}).get("spotify")}
+        s = await sessions.get()
+        async with health.guard("audd") as outcome, \
+                s.post("https://api.audd.io/",
+                       data={"api_token": key, "url": audio_url, "return": "spotify"},
+                       timeout=_timeout("audd")) as r:
+            if r.status != 200:
+                if failed_status(r.status):
+                    outcome.fail(f"HTTP {r.status}")
+                return None
+            data = await r.json()
+            res = data.get("result")
+            if not res:
+                return None
+            return {"title": res.get("title"), "artist": res.get("artist"),
+                    "url": (res.get("spotify") or {}).get("external_urls", {}).get("spotify")}
     except Exception:
         return None
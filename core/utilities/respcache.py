@@ -0,0 +1,292 @@
+# core/utilities/respcache.py
+"""
+Persistent TTL cache for Utilities provider responses.
+
+Geocodes, forecasts, translations, transcripts, Tenor/Klipy resolutions and
+xray reports are cached in a small SQLite file of their own — deliberately NOT
+the economy DB, so a cache wipe or corruption can never touch balances. A
+bounded in-memory LRU sits in front of it, so a repeat lookup is a dict hit;
+the SQLite layer makes those hits survive restarts.
+
+Each provider has its own TTL (PROVIDER_TTLS). Past its TTL an entry is
+"stale": for another ttl * STALE_FACTOR seconds it is still served
+immediately while ONE background task refreshes it (stale-while-revalidate).
+Older than that it's a miss. Only useful results are stored — failures, empty
+lists and blocked URLs always go back to the network.
+
+Size-capped (UTIL_RESPONSE_CACHE_MB, default 16); least recently used entries
+are evicted first. Location: UTIL_RESPONSE_CACHE_PATH (default: tempdir).
+Set UTIL_RESPONSE_CACHE=off to disable.
+"""
+from __future__ import annotations
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import sqlite3
+import tempfile
+import threading
+from collections import OrderedDict
+
+from core.utilities.safety import canonicalize_url
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, ""))
+    except (TypeError, ValueError):
+        return default
+
+
+DEFAULT_PATH = os.path.join(tempfile.gettempdir(), "ignio_responses.sqlite3")
+
+# seconds an entry is fresh; anything unlisted uses DEFAULT_TTL
+DEFAULT_TTL = 3600
+PROVIDER_TTLS = {
+    "geocode": 30 * 86400,        # place names don't move
+    "geocode_osm": 30 * 86400,
+    "weather": 10 * 60,
+    "translate": 7 * 86400,
+    "transcript": 7 * 86400,
+    "tenor": 86400,
+    "klipy": 86400,
+    "xray": 3600,
+}
+STALE_FACTOR = 1.0      # stale entries are served for up to one more TTL
+MEMORY_ENTRIES = 512    # in-memory front (hot keys never touch SQLite)
+
+
+def text_key(*parts) -> str:
+    """Normalise free-text inputs: trimmed, whitespace-collapsed, case-folded."""
+    return "\x1f".join(" ".join(str(p).split()).casefold() for p in parts)
+
+
+def url_key(url: str, *parts) -> str:
+    """Cache key for a URL input (tracking params/fragments stripped)."""
+    return "\x1f".join([canonicalize_url(url or ""), *map(str, parts)])
+
+
+class ResponseCache:
+    def __init__(self, path: str | None = None, max_bytes: int | None = None,
+                 enabled: bool | None = None):
+        self.path = path or os.environ.get("UTIL_RESPONSE_CACHE_PATH") or DEFAULT_PATH
+        self.max_bytes = max_bytes if max_bytes is not None else \
+            _env_int("UTIL_RESPONSE_CACHE_MB", 16) * 1024 * 1024
+        if enabled is None:
+            enabled = (os.environ.get("UTIL_RESPONSE_CACHE", "on").lower()
+                       not in ("0", "off", "false", "no"))
+        self.enabled = enabled
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        self._bytes = 0
+        # key -> (value, fetched_at, provider); OrderedDict = LRU order
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._refreshing: set[str] = set()
+        self._tasks: set[asyncio.Task] = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    # ----- storage (blocking; called via asyncio.to_thread) ---------------
+
+    def _db(self) -> sqlite3.Connection | None:
+        if self._conn is not None:
+            return self._conn
+        try:
+            parent = os.path.dirname(self.path)
+            if parent:
+                os.makedirs(parent, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False,
+                                   isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL;")
+            conn.execute("PRAGMA synchronous=NORMAL;")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key        TEXT PRIMARY KEY,
+                    provider   TEXT NOT NULL,
+                    value      TEXT NOT NULL,
+                    size       INTEGER NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    used_at    REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_used ON responses(used_at)")
+            # startup cleanup: drop anything past its stale window
+            now = time.time()
+            for provider, fetched, key in conn.execute(
+                    "SELECT provider, fetched_at, key FROM responses").fetchall():
+                if now - fetched > self._max_age(provider):
+                    conn.execute("DELETE FROM responses WHERE key=?", (key,))
+            self._bytes = conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            self._conn = conn
+            self._evict()
+        except sqlite3.Error as e:
+            print(f"[Ignio][Cache] response cache unavailable ({e}); running uncached.")
+            self.enabled = False
+            return None
+        return self._conn
+
+    def _evict(self):
+        conn = self._conn
+        if conn is None or self._bytes <= self.max_bytes:
+            return
+        rows = conn.execute(
+            "SELECT key, size FROM responses ORDER BY used_at").fetchall()
+        for key, size in rows:
+            if self._bytes <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM responses WHERE key=?", (key,))
+            self._memory.pop(key, None)
+            self._bytes -= size
+
+    def _read(self, key: str):
+        with self._lock:
+            conn = self._db()
+            if conn is None:
+                return None
+            try:
+                row = conn.execute(
+                    "SELECT value, fetched_at, provider FROM responses WHERE key=?",
+                    (key,)).fetchone()
+                if row is None:
+                    return None
+                conn.execute("UPDATE responses SET used_at=? WHERE key=?",
+                             (time.time(), key))
+                return json.loads(row[0]), row[1], row[2]
+            except (sqlite3.Error, ValueError):
+                return None
+
+    def _write(self, key: str, provider: str, value, fetched: float):
+        try:
+            blob = json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+        except (TypeError, ValueError):
+            return
+        size = len(blob.encode("utf-8")) + len(key)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            conn = self._db()
+            if conn is None:
+                return
+            try:
+                old = conn.execute("SELECT size FROM responses WHERE key=?",
+                                   (key,)).fetchone()
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses "
+                    "(key, provider, value, size, fetched_at, used_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, provider, blob, size, fetched, fetched))
+                self._bytes += size - (old[0] if old else 0)
+                self._evict()
+            except sqlite3.Error:
+                pass
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            conn = self._db()
+            if conn is not None:
+                conn.execute("DELETE FROM responses")
+                self._bytes = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # ----- lookups ---------------------------------------------------------
+
+    @staticmethod
+    def _ttl(provider: str) -> float:
+        return PROVIDER_TTLS.get(provider, DEFAULT_TTL)
+
+    def _max_age(self, provider: str) -> float:
+        return self._ttl(provider) * (1 + STALE_FACTOR)
+
+    @staticmethod
+    def _key(provider: str, key: str) -> str:
+        digest = hashlib.sha1(key.encode("utf-8", "replace")).hexdigest()
+        return f"{provider}:{digest}"
+
+    def _remember(self, key: str, value, fetched: float, provider: str):
+        self._memory[key] = (value, fetched, provider)
+        self._memory.move_to_end(key)
+        while len(self._memory) > MEMORY_ENTRIES:
+            self._memory.popitem(last=False)
+
+    async def _lookup(self, key: str):
+        ent = self._memory.get(key)
+        if ent is not None:
+            self._memory.move_to_end(key)
+            return ent
+        ent = await asyncio.to_thread(self._read, key)
+        if ent is not None:
+            value, fetched, provider = ent
+            self._remember(key, value, fetched, provider)
+        return ent
+
+    async def _store(self, key: str, provider: str, value):
+        now = time.time()
+        self._remember(key, value, now, provider)
+        await asyncio.to_thread(self._write, key, provider, value, now)
+
+    def _refresh(self, key: str, provider: str, fetch, keep):
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+
+        async def _run():
+            try:
+                value = await fetch()
+                if keep(value):
+                    await self._store(key, provider, value)
+            except Exception as e:
+                print(f"[Ignio][Cache] background refresh of {provider} failed: {e}")
+            finally:
+                self._refreshing.discard(key)
+
+        task = asyncio.get_running_loop().create_task(_run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def cached(self, provider: str, key: str, fetch, keep=bool):
+        """Return fetch()'s result for (provider, key), from cache when possible.
+
+        ``fetch`` is a zero-arg coroutine function; ``keep(value)`` decides
+        whether a fresh result is worth storing (default: truthy results only).
+        """
+        if not self.enabled:
+            return await fetch()
+        k = self._key(provider, key)
+        ent = await self._lookup(k)
+        if ent is not None:
+            value, fetched, _ = ent
+            age = time.time() - fetched
+            if age <= self._ttl(provider):
+                self.hits += 1
+                return value
+            if age <= self._max_age(provider):
+                self.stale_hits += 1
+                self._refresh(k, provider, fetch, keep)
+                return value
+            self._memory.pop(k, None)
+        self.misses += 1
+        value = await fetch()
+        if keep(value):
+            await self._store(k, provider, value)
+        return value
+
+    def stats(self) -> dict:
+        return {"bytes": self._bytes, "memory": len(self._memory),
+                "hits": self.hits, "stale_hits": self.stale_hits,
+                "misses": self.misses}
+
+
+# a single shared instance used by providers.py
+response_cache = ResponseCache()
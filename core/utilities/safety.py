@@ -4,11 +4,19 @@ URL safety + SSRF protection for !xray and any utility that fetches a URL.
 
 Blocks localhost, private/loopback/link-local/metadata ranges, non-http(s)
 schemes, and file URLs. Pure-stdlib so it always works.
+
+Async callers use is_safe_url_async(): DNS runs on the loop's resolver (a
+worker thread) instead of blocking the event loop, and host verdicts are kept
+in a short TTL cache. The vetted addresses are also what the shared HTTP
+session connects to (VettedResolver), so a host can't pass the check with a
+public IP and then rebind to a private one for the real request.
 """
 from __future__ import annotations
 
+import asyncio
 import ipaddress
 import socket
+import time
 from urllib.parse import urlparse
 
 BLOCKED_SCHEMES = {"file", "ftp", "gopher", "data", "dict", "ssh", "telnet"}
@@ -33,43 +41,175 @@ def _is_private_ip(ip_str: str) -> bool:
     )
 
 
-def is_safe_url(url: str, resolve_dns: bool = True) -> tuple[bool, str]:
-    """Return (safe, reason). reason is '' when safe."""
+# host -> (expires_at, ok, reason, vetted addresses)
+VERDICT_TTL = 300           # seconds a good verdict is trusted
+VERDICT_TTL_BAD = 60        # blocked/unresolvable hosts are re-checked sooner
+VERDICT_CACHE_MAX = 2048
+_verdicts: dict[str, tuple[float, bool, str, tuple[str, ...]]] = {}
+
+
+def _precheck(url: str) -> tuple[bool, str, str]:
+    """Everything that doesn't need DNS. Returns (ok, reason, host)."""
     if not url or len(url) > 2048:
-        return False, "missing or overlong URL"
+        return False, "missing or overlong URL", ""
     try:
         p = urlparse(url.strip())
     except Exception:
-        return False, "unparseable URL"
+        return False, "unparseable URL", ""
 
     scheme = (p.scheme or "").lower()
     if scheme in BLOCKED_SCHEMES or scheme not in ALLOWED_SCHEMES:
-        return False, "only http/https links are allowed"
+        return False, "only http/https links are allowed", ""
 
-    host = (p.hostname or "").lower()
+    try:
+        host = (p.hostname or "").lower()
+    except Exception:
+        return False, "unparseable URL", ""
     if not host:
-        return False, "no host in URL"
+        return False, "no host in URL", ""
     if host in BLOCKED_HOSTS:
-        return False, "internal host blocked"
+        return False, "internal host blocked", host
 
     # direct IP literal?
     if _is_private_ip(host):
-        return False, "private/loopback address blocked"
+        return False, "private/loopback address blocked", host
+    return True, "", host
+
+
+def _is_ip_literal(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+def _judge(infos) -> tuple[bool, str, tuple[str, ...]]:
+    """Check every resolved address (DNS-rebinding guard)."""
+    addrs = []
+    for info in infos:
+        addr = info[4][0]
+        if _is_private_ip(addr):
+            return False, "resolves to a private address", ()
+        if addr not in addrs:
+            addrs.append(addr)
+    if not addrs:
+        return False, "could not resolve host", ()
+    return True, "", tuple(addrs)
+
+
+def _cached_verdict(host: str):
+    ent = _verdicts.get(host)
+    if ent is None:
+        return None
+    if time.monotonic() > ent[0]:
+        _verdicts.pop(host, None)
+        return None
+    return ent
+
+
+def _remember(host: str, ok: bool, reason: str, addrs: tuple[str, ...]):
+    if len(_verdicts) >= VERDICT_CACHE_MAX:
+        now = time.monotonic()
+        for k in [k for k, v in _verdicts.items() if now > v[0]]:
+            _verdicts.pop(k, None)
+        while len(_verdicts) >= VERDICT_CACHE_MAX:
+            _verdicts.pop(next(iter(_verdicts)))     # oldest insert first
+    ttl = VERDICT_TTL if ok else VERDICT_TTL_BAD
+    _verdicts[host] = (time.monotonic() + ttl, ok, reason, addrs)
+    return _verdicts[host]
+
+
+def is_safe_url(url: str, resolve_dns: bool = True) -> tuple[bool, str]:
+    """Return (safe, reason). reason is '' when safe.
+
+    Blocking (resolves DNS inline) — only for sync code. Anything running on
+    the event loop should await is_safe_url_async() instead."""
+    ok, reason, host = _precheck(url)
+    if not ok:
+        return False, reason
 
     # resolve DNS and check every resolved address (DNS-rebinding guard)
-    if resolve_dns:
+    if resolve_dns and not _is_ip_literal(host):
+        ent = _cached_verdict(host)
+        if ent is None:
+            try:
+                infos = socket.getaddrinfo(host, None)
+            except Exception:
+                infos = []
+            ent = _remember(host, *_judge(infos))
+        if not ent[1]:
+            return False, ent[2]
+
+    return True, ""
+
+
+async def vetted_addresses(host: str) -> tuple[bool, str, tuple[str, ...]]:
+    """Resolve `host` without blocking the loop and vet every address.
+    Returns (ok, reason, addresses); cached per host for VERDICT_TTL."""
+    host = (host or "").lower()
+    if host in BLOCKED_HOSTS:
+        return False, "internal host blocked", ()
+    if _is_ip_literal(host):
+        if _is_private_ip(host):
+            return False, "private/loopback address blocked", ()
+        return True, "", (host,)
+    ent = _cached_verdict(host)
+    if ent is None:
         try:
-            infos = socket.getaddrinfo(host, None)
+            infos = await asyncio.get_running_loop().getaddrinfo(
+                host, None, type=socket.SOCK_STREAM)
         except Exception:
-            return False, "could not resolve host"
-        for info in infos:
-            addr = info[4][0]
-            if _is_private_ip(addr):
-                return False, "resolves to a private address"
+            infos = []
+        ent = _remember(host, *_judge(infos))
+    return ent[1], ent[2], ent[3]
 
+
+async def is_safe_url_async(url: str, resolve_dns: bool = True) -> tuple[bool, str]:
+    """Non-blocking is_safe_url(): same rules, DNS via the loop's resolver."""
+    ok, reason, host = _precheck(url)
+    if not ok:
+        return False, reason
+    if resolve_dns:
+        ok, reason, _ = await vetted_addresses(host)
+        if not ok:
+            return False, reason
     return True, ""
 
 
+try:
+    from aiohttp.abc import AbstractResolver as _AbstractResolver
+except Exception:  # aiohttp missing: sync checks still work
+    _AbstractResolver = object
+
+
+class VettedResolver(_AbstractResolver):
+    """aiohttp resolver that only ever hands the connector vetted, public
+    addresses (from the same cache the safety check used). Pinning the
+    connection to the checked IPs is what keeps DNS rebinding out.
+
+    aiohttp skips the resolver for IP-literal hosts; sessions.VettedConnector
+    covers those (e.g. a redirect to http://127.0.0.1/)."""
+
+    async def resolve(self, host, port=0, family=socket.AF_INET):
+        ok, reason, addrs = await vetted_addresses(host)
+        if not ok:
+            raise OSError(f"blocked host {host!r}: {reason}")
+        out = []
+        for addr in addrs:
+            fam = socket.AF_INET6 if ":" in addr else socket.AF_INET
+            if family not in (socket.AF_UNSPEC, fam):
+                continue
+            out.append({"hostname": host, "host": addr, "port": port,
+                        "family": fam, "proto": 0, "flags": socket.AI_NUMERICHOST})
+        if not out:
+            raise OSError(f"no usable address for {host!r}")
+        return out
+
+    async def close(self):
+        pass
+
+
 def canonicalize_url(url: str) -> str:
     """Light canonicalization for dedup: strip fragments + common tracking params."""
     try:
@@ -0,0 +1,116 @@
+# core/utilities/sessions.py
+"""
+One long-lived, pooled aiohttp session shared by every Utilities provider.
+
+Opening a ClientSession per call meant a fresh DNS lookup + TCP + TLS handshake
+for every !weather / !translate / !map. The shared session keeps connections
+warm (keep-alive), caps connections per host so one slow provider can't hog
+the pool, and caches DNS for a short TTL.
+
+Lifecycle: created lazily on first use, closed by bot.run() on shutdown. If the
+running event loop changes (tests call asyncio.run repeatedly) a new session is
+built for the new loop. Cookies are never stored — every provider call stays
+as stateless as it was with throwaway sessions. Name resolution goes through
+safety.VettedResolver, which pins hostnames to the addresses that passed the
+SSRF check. aiohttp never asks the resolver about IP-literal hosts, so the
+connector (VettedConnector) also vets the target of every connection it opens
+— redirect hops included — before dialling.
+"""
+from __future__ import annotations
+
+import asyncio
+
+import aiohttp
+
+from core.utilities.safety import VettedResolver, vetted_addresses
+
+# connector tuning
+POOL_LIMIT = 64                # total open sockets across all hosts
+POOL_LIMIT_PER_HOST = 8        # per provider host
+DNS_CACHE_TTL = 300            # seconds
+KEEPALIVE_SECONDS = 60         # idle keep-alive before a socket is dropped
+
+# per-provider total timeouts (seconds); anything unlisted uses DEFAULT_TIMEOUT
+DEFAULT_TIMEOUT = 12
+PROVIDER_TIMEOUTS = {
+    "open-meteo": 8,
+    "nominatim": 10,
+    "osm-tiles": 8,
+    "mymemory": 10,
+    "xray": 12,
+    "llm": 30,
+    "tenor": 12,
+    "klipy": 12,
+    "audd": 20,
+    "transcript": 15,
+    "media": 25,
+    "image": 25,
+}
+
+
+def timeout(provider: str) -> aiohttp.ClientTimeout:
+    """The request timeout for one provider."""
+    secs = PROVIDER_TIMEOUTS.get(provider, DEFAULT_TIMEOUT)
+    return aiohttp.ClientTimeout(total=secs, sock_connect=min(secs, 6))
+
+
+class VettedConnector(aiohttp.TCPConnector):
+    """Refuses to connect to a blocked host. Each redirect hop is a new
+    connect(), so a 302 to http://127.0.0.1/ fails here before anything is
+    sent, even with allow_redirects=True."""
+
+    async def connect(self, req, traces, timeout):
+        host = req.url.raw_host or ""
+        ok, reason, _ = await vetted_addresses(host)
+        if not ok:
+            raise aiohttp.ClientConnectionError(f"blocked host {host!r}: {reason}")
+        return await super().connect(req, traces, timeout)
+
+
+class SessionManager:
+    def __init__(self):
+        self._session: aiohttp.ClientSession | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None   # loop the session lives on
+        self._lock: asyncio.Lock | None = None
+        self._lock_loop: asyncio.AbstractEventLoop | None = None
+
+    def _usable(self, loop) -> bool:
+        return (self._session is not None and not self._session.closed
+                and self._loop is loop)
+
+    async def get(self) -> aiohttp.ClientSession:
+        """Return the shared session, creating it (once) on the current loop."""
+        loop = asyncio.get_running_loop()
+        if self._usable(loop):
+            return self._session
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock, self._lock_loop = asyncio.Lock(), loop
+        async with self._lock:
+            if not self._usable(loop):
+                connector = VettedConnector(
+                    limit=POOL_LIMIT,
+                    limit_per_host=POOL_LIMIT_PER_HOST,
+                    ttl_dns_cache=DNS_CACHE_TTL,
+                    keepalive_timeout=KEEPALIVE_SECONDS,
+                    resolver=VettedResolver(),
+                )
+                self._session = aiohttp.ClientSession(
+                    connector=connector,
+                    timeout=aiohttp.ClientTimeout(total=DEFAULT_TIMEOUT),
+                    cookie_jar=aiohttp.DummyCookieJar(),
+                )
+                self._loop = loop
+        return self._session
+
+    async def close(self) -> None:
+        """Close the pool (bot shutdown). Safe to call more than once."""
+        s, self._session = self._session, None
+        if s is not None and not s.closed:
+            try:
+                await s.close()
+            except Exception:
+                pass
+
+
+# a single shared instance (owned by bot.run's lifecycle)
+sessions = SessionManager()
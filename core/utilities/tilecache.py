@@ -0,0 +1,151 @@
+# core/utilities/tilecache.py
+"""
+Size-capped on-disk cache for OSM map tiles used by !map.
+
+Tiles are stored as <dir>/<z>/<x>/<y>.png. A small in-memory index (built by
+scanning the directory on first use) tracks each tile's size, when it was
+fetched (expiry) and when it was last used (LRU). File mtime = fetch time and
+atime = last use, so the index survives restarts without a database.
+
+OSM's tile policy asks clients to cache; 7 days is their suggested minimum.
+Configure with UTIL_TILE_CACHE_DIR / UTIL_TILE_CACHE_MB / UTIL_TILE_CACHE_DAYS.
+Methods are blocking file I/O — call them via asyncio.to_thread.
+"""
+from __future__ import annotations
+
+import os
+import time
+import tempfile
+import threading
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, ""))
+    except (TypeError, ValueError):
+        return default
+
+
+DEFAULT_DIR = os.path.join(tempfile.gettempdir(), "ignio_tiles")
+
+
+class TileCache:
+    def __init__(self, root: str | None = None, max_bytes: int | None = None,
+                 ttl: float | None = None):
+        self.root = root or os.environ.get("UTIL_TILE_CACHE_DIR") or DEFAULT_DIR
+        self.max_bytes = max_bytes if max_bytes is not None else \
+            _env_int("UTIL_TILE_CACHE_MB", 64) * 1024 * 1024
+        self.ttl = ttl if ttl is not None else _env_int("UTIL_TILE_CACHE_DAYS", 7) * 86400
+        # (z, x, y) -> [size, fetched_at, last_used]
+        self._index: dict[tuple[int, int, int], list] = {}
+        self._bytes = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, z: int, x: int, y: int) -> str:
+        return os.path.join(self.root, str(z), str(x), f"{y}.png")
+
+    def _load(self):
+        """Rebuild the index from disk once (startup cleanup drops expired tiles)."""
+        if self._loaded:
+            return
+        self._loaded = True
+        now = time.time()
+        if not os.path.isdir(self.root):
+            return
+        for dirpath, _dirs, files in os.walk(self.root):
+            for fn in files:
+                p = os.path.join(dirpath, fn)
+                try:
+                    z = int(os.path.basename(os.path.dirname(dirpath)))
+                    x = int(os.path.basename(dirpath))
+                    y = int(fn.rsplit(".", 1)[0])
+                    st = os.stat(p)
+                except (ValueError, OSError):
+                    continue
+                if now - st.st_mtime > self.ttl:
+                    self._drop_file(p)
+                    continue
+                self._index[(z, x, y)] = [st.st_size, st.st_mtime, st.st_atime]
+                self._bytes += st.st_size
+        self._evict()
+
+    @staticmethod
+    def _drop_file(p: str):
+        try:
+            os.remove(p)
+        except OSError:
+            pass
+
+    def _forget(self, key):
+        ent = self._index.pop(key, None)
+        if ent is not None:
+            self._bytes -= ent[0]
+            self._drop_file(self._path(*key))
+
+    def _evict(self):
+        if self._bytes <= self.max_bytes:
+            return
+        # least recently used first
+        for key in sorted(self._index, key=lambda k: self._index[k][2]):
+            if self._bytes <= self.max_bytes:
+                break
+            self._forget(key)
+
+    def get(self, z: int, x: int, y: int) -> bytes | None:
+        key = (z, x, y)
+        with self._lock:
+            self._load()
+            ent = self._index.get(key)
+            now = time.time()
+            if ent is None or now - ent[1] > self.ttl:
+                if ent is not None:
+                    self._forget(key)
+                self.misses += 1
+                return None
+            try:
+                with open(self._path(*key), "rb") as f:
+                    data = f.read()
+                os.utime(self._path(*key), (now, ent[1]))   # atime=use, mtime=fetch
+            except OSError:
+                self._index.pop(key, None)
+                self._bytes -= ent[0]
+                self.misses += 1
+                return None
+            ent[2] = now
+            self.hits += 1
+            return data
+
+    def put(self, z: int, x: int, y: int, data: bytes) -> None:
+        if not data or len(data) > self.max_bytes:
+            return
+        key = (z, x, y)
+        p = self._path(*key)
+        with self._lock:
+            self._load()
+            try:
+                os.makedirs(os.path.dirname(p), exist_ok=True)
+                tmp = f"{p}.{os.getpid()}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, p)      # atomic: readers never see half a tile
+            except OSError:
+                return
+            old = self._index.get(key)
+            if old is not None:
+                self._bytes -= old[0]
+            now = time.time()
+            self._index[key] = [len(data), now, now]
+            self._bytes += len(data)
+            self._evict()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"tiles": len(self._index), "bytes": self._bytes,
+                    "hits": self.hits, "misses": self.misses}
+
+
+# a single shared instance used by providers.static_map_png
+tile_cache = TileCache()
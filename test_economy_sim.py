@@ -0,0 +1,50 @@
+"""
+test_economy_sim.py — the NumPy economy simulator runs the bot's own constants
+and pricing rules, keeps its books (every sob is minted, burned, taxed or still
+held), never drives a balance negative and is reproducible from a seed.
+"""
+import sys, time
+sys.path.insert(0, '.')
+PASS, FAIL = [], []
+def check(n, c): (PASS if c else FAIL).append(n); print(f"  {'✅' if c else '❌'} {n}")
+
+def main():
+    print("[test_economy_sim]")
+    from core import economy_sim as sim
+    if sim.np is None:
+        print("  (numpy not installed — skipped)")
+        return
+    import core.steal as S
+    c = sim.constants()
+    check("constants come from the bot's modules",
+          c["steal.BASE_CHANCE"] == S.BASE_CHANCE and "economy.SOB_VALUE_PCT" in c
+          and "engine.HOUSE_TAX_PCT" in c and "daily.CAP" in c and "protection.WARD_FRACTION" in c)
+    try:
+        sim.constants({"steal.NOPE": 1}); check("unknown override rejected", False)
+    except KeyError:
+        check("unknown override rejected", True)
+
+    t0 = time.perf_counter()
+    r = sim.simulate(5000, 90, seed=3)
+    took = time.perf_counter() - t0
+    check(f"5000 players x 90 days in {took:.1f}s", took < 30)
+    held = int(r["balances"].sum())
+    books = int(r["minted"].sum() - r["burned"].sum() - r["to_treasury"].sum())
+    check("books balance: supply == minted - burned - taxed", held == books == int(r["supply"][-1]))
+    check("no negative balances", int(r["balances"].min()) >= 0)
+    check("gini stays in [0, 1]", 0 <= r["gini"].min() and r["gini"].max() <= 1)
+    check("p65 is the reference percentile of active balances",
+          int(r["p65"][-1]) == sim.percentile(r["balances"], 0.65))
+    check("every sink is exercised", r["burned"].sum() > 0 and r["to_treasury"].sum() > 0)
+
+    a = sim.simulate(300, 20, seed=9)
+    b = sim.simulate(300, 20, seed=9)
+    check("same seed, same run", (a["supply"] == b["supply"]).all())
+    rich = sim.simulate(300, 20, seed=9, overrides={"economy.SOB_VALUE_FLOOR": 50})
+    check("overrides change the outcome", rich["supply"][-1] > a["supply"][-1])
+    check("cli runs", sim.main(["--players", "200", "--days", "5", "--every", "5"]) == 0)
+
+if __name__ == "__main__":
+    main()
+    print(f"\n  RESULT: {len(PASS)} passed, {len(FAIL)} failed")
+    if FAIL: print("  FAILURES:", FAIL); sys.exit(1)
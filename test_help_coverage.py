@@ -14,8 +14,8 @@ REAL = {
     "rate","value","worth","economy","rate set","tax","treasury","treasury give",
     "multiplier","rebalance",
     "roulette","roulettestats","steal","steal stats","sobship","mapgame","mapflag","flag","catchup","tldr","song","xray","map","weather","translate","caption","quote","afk",
-    "admin profile","admin givesob","admin givetoken","admin reset","admin recount",
-    "admin threshold","admin emoji","admin whoami","admin config","admin stats","admin servers",
+    "admin profile","admin givesob","admin givetoken","admin reset","admin recount","admin rollup",
+    "admin threshold","admin emoji","admin whoami","admin config","admin stats","admin servers","admin providers",
     "admin altblock","admin tips","admin freeze","admin audit","admin audit tx","admin suspicious",
     "admin export","admin auditexport","admin import","admin weekly",
     "admin shop","admin item","admin category","admin auditcap","admin auditcd",
@@ -0,0 +1,194 @@
+"""
+test_ledger_tiers.py — the ledger read paths (summaries, stats card,
+reconciliation, entries, export/import) give the same answers however the
+ledger is stored: hot rows, archived rows and their rollups.
+"""
+import asyncio, os, tempfile, sys, time
+sys.path.insert(0, '.')
+from core.db import Database, DatabaseManager
+from core.sob.repo import SobRepo
+from core.economy import Economy
+from core import ledger, transfer
+GID = 4600
+PASS, FAIL = [], []
+def check(n, c): (PASS if c else FAIL).append(n); print(f"  {'✅' if c else '❌'} {n}")
+
+class _Mgr(DatabaseManager):
+    def __init__(self, db): self._db_obj = db
+    async def get(self): return self._db_obj
+
+async def setup():
+    d = tempfile.mkdtemp(); db = Database(os.path.join(d, 't.sqlite3')); await db.connect()
+    sob = SobRepo(_Mgr(db))
+    for u in range(1, 6):
+        await sob.adjust_received(GID, u, 500 + u, event_type=ledger.EVT_ADMIN_GIVE)
+        await sob.adjust_received(GID, u, 30, event_type=ledger.EVT_DAILY)
+        await sob.spend(GID, u, 40 + u, event_type=ledger.EVT_SHOP_BASE)
+        await sob.transfer(GID, u, (u % 5) + 1, 7, event_type=ledger.EVT_AUDIT_STEAL)
+        await sob.add_sob(guild_id=GID, message_id=900 + u, reactor_id=(u % 5) + 1,
+                          target_id=u, credited_amount=5)
+    return db, sob
+
+async def readouts(db, sob):
+    out = {}
+    for u in range(1, 6):
+        bal = int((await sob.get_user_stats(GID, u))["sobs_alltime"])
+        out[u] = (await ledger.user_summary(db, GID, u), await ledger.stats_breakdown(db, GID, u),
+                  await ledger.reconcile_user(db, GID, u, bal),
+                  [e["ledger_id"] for e in await ledger.user_entries(db, GID, u, per_page=50)])
+    out["report"] = await transfer.reconciliation_report(db, GID)
+    exp = await transfer.export_guild(db, GID)
+    out["export"] = (sorted((r["subject_id"], r["earned"], r["spent"], r["net"], r["entries"])
+                            for r in exp["per_user_summary"]),
+                     [r["ledger_id"] for r in exp["tables"]["economy_ledger"]])
+    return out, exp
+
+async def test_archive_is_transparent():
+    db, sob = await setup()
+    before, _ = await readouts(db, sob)
+    tx = (await db.fetchone("SELECT transaction_id FROM economy_ledger ORDER BY ledger_id LIMIT 1"))["transaction_id"]
+    # age the first two thirds of the ledger past the horizon
+    n = (await db.fetchone("SELECT COUNT(*) AS n FROM economy_ledger"))["n"]
+    old = int(time.time()) - (ledger.ARCHIVE_AFTER_DAYS + 1) * 86400
+    await db.execute("UPDATE economy_ledger SET created_at=? WHERE ledger_id IN "
+                     "(SELECT ledger_id FROM economy_ledger ORDER BY ledger_id LIMIT ?)", (old, n * 2 // 3))
+    await db.commit()
+    moved = await ledger.archive_before(db, old + 1, chunk=4)
+    hot = (await db.fetchone("SELECT COUNT(*) AS n FROM economy_ledger"))["n"]
+    cold = (await db.fetchone("SELECT COUNT(*) AS n FROM economy_ledger_archive"))["n"]
+    check(f"archive moves old rows in chunks ({moved} moved)", moved == n * 2 // 3 and hot + cold == n)
+    after, exp = await readouts(db, sob)
+    check("summaries, stats card and reconciliation unchanged", all(before[u] == after[u] for u in range(1, 6)))
+    check("guild reconciliation report unchanged", before["report"] == after["report"])
+    check("export covers hot + archive", before["export"] == after["export"])
+    check("transaction lookup finds archived rows", len(await ledger.transaction_entries(db, tx)) >= 1)
+    check("nothing left to archive", await ledger.archive_before(db, old + 1) == 0)
+
+    # re-import: merge must not resurrect archived rows into the hot table
+    await transfer.import_guild(db, exp, mode="merge")
+    check("merge import skips archived rows",
+          (await db.fetchone("SELECT COUNT(*) AS n FROM economy_ledger"))["n"] == hot)
+    await transfer.import_guild(db, exp, mode="replace")
+    again, _ = await readouts(db, sob)
+    check("replace import rebuilds the same books",
+          all(again[u][2] == before[u][2] for u in range(1, 6)) and again["export"] == before["export"])
+    await db.close()
+
+async def test_checkpoints():
+    db, sob = await setup()
+    before, exp = await readouts(db, sob)
+    n = (await db.fetchone("SELECT COUNT(*) AS n FROM economy_ledger"))["n"]
+    folded = await ledger.advance_checkpoints(db, chunk=3)
+    check(f"advance folds every row ({folded})", folded == n)
+    check("advance is a no-op when caught up", await ledger.advance_checkpoints(db) == 0)
+    after, _ = await readouts(db, sob)
+    check("reconciliation unchanged after checkpointing",
+          all(before[u][2] == after[u][2] for u in range(1, 6)) and before["report"] == after["report"])
+
+    # activity after the checkpoint is added on top of it
+    await sob.transfer(GID, 1, 2, 11, event_type=ledger.EVT_AUDIT_STEAL)
+    await sob.adjust_received(GID, 3, 9, event_type=ledger.EVT_DAILY)
+    ok = True
+    for u in range(1, 6):
+        bal = int((await sob.get_user_stats(GID, u))["sobs_alltime"])
+        ok &= (await ledger.reconcile_user(db, GID, u, bal))["reconciled"]
+    rep = await transfer.reconciliation_report(db, GID)
+    check("rows after the checkpoint still reconcile", ok and rep["users_reconciled"] == before["report"]["users_reconciled"])
+    plan = " ".join(str(tuple(r)) for r in await db.fetchall(
+        "EXPLAIN QUERY PLAN SELECT SUM(delta) FROM economy_ledger "
+        "WHERE guild_id=? AND subject_id=? AND ledger_id > ?", (GID, 1, 5)))
+    check("post-checkpoint sum is an index range seek", "idx_ledger_subject_id" in plan and "ledger_id>?" in plan)
+
+    # archiving past the watermark and importing below it both keep the books
+    await ledger.advance_checkpoints(db)
+    await db.execute("UPDATE economy_ledger SET created_at=0"); await db.commit()
+    await ledger.archive_before(db, 1)
+    check("checkpoints + archive reconcile", (await transfer.reconciliation_report(db, GID)) == rep)
+    await transfer.import_guild(db, exp, mode="replace")
+    again, _ = await readouts(db, sob)
+    check("replace import rebuilds the guild's checkpoints",
+          all(again[u][2] == before[u][2] for u in range(1, 6)) and again["report"] == before["report"])
+    await db.close()
+
+async def test_compact_rows():
+    db, sob = await setup()
+    check("canonical event ids match the seeded lookup table",
+          {r["name"]: r["event_id"] for r in await db.fetchall(
+              "SELECT * FROM ledger_event_types WHERE event_id <= ?", (len(ledger._EVENT_IDS),))}
+          == ledger._EVENT_IDS)
+    kinds = await db.fetchall("SELECT DISTINCT typeof(transaction_id) AS t, length(transaction_id) AS n, "
+                              "typeof(event_id) AS e FROM economy_ledger")
+    check("transaction ids are 16-byte blobs, event types integers",
+          [tuple(r) for r in kinds] == [("blob", 16, "integer")])
+
+    tx = ledger.new_tx_id()
+    async with db.transaction() as conn:
+        await ledger.record_many(conn, [
+            dict(event_type=ledger.EVT_SHOP_BASE, subject_id=1, delta=-10, metadata={"k": 1}),
+            dict(event_type="custom_event", subject_id=1),
+        ], guild_id=GID, transaction_id=tx, created_at=123)
+    rows = await ledger.transaction_entries(db, tx)
+    check("record_many rows read back decoded",
+          [(r["transaction_id"], r["event_type"], r["created_at"], r["metadata"]) for r in rows]
+          == [(tx, ledger.EVT_SHOP_BASE, 123, '{"k": 1}'), (tx, "custom_event", 123, "")])
+    summ = await ledger.user_summary(db, GID, 1)
+    check("new event types are interned on first use", summ["by_event"]["custom_event"]["count"] == 1)
+    custom = await db.fetchone("SELECT event_id FROM ledger_event_types WHERE name='custom_event'")
+    check("interned event ids stay clear of the canonical range",
+          custom["event_id"] >= ledger._INTERNED_EVENT_BASE)
+    try:
+        async with db.transaction() as conn:
+            await ledger.record(conn, guild_id=GID, event_type=ledger.EVT_DAILY,
+                                transaction_id=tx, subjct_id=1)
+        check("unknown ledger fields are rejected", False)
+    except TypeError:
+        check("unknown ledger fields are rejected", True)
+
+    gtx = "game-1234"
+    async with db.transaction() as conn:
+        await ledger.record(conn, guild_id=GID, event_type=ledger.EVT_ROULETTE_REFUND,
+                            transaction_id=gtx, subject_id=2)
+    check("non-hex transaction ids are kept as text", len(await ledger.transaction_entries(db, gtx)) == 1)
+    await db.close()
+
+async def _grouped(db):
+    rows = await db.fetchall(
+        "SELECT guild_id, subject_id, event_id, SUM(MAX(delta,0)) AS e, SUM(MAX(-delta,0)) AS s, COUNT(*) AS n "
+        "FROM (SELECT * FROM economy_ledger UNION ALL SELECT * FROM economy_ledger_archive) "
+        "GROUP BY guild_id, subject_id, event_id")
+    return sorted(tuple(r) for r in rows)
+
+async def _rollup(db):
+    return sorted(tuple(r) for r in await db.fetchall(
+        "SELECT guild_id, subject_id, event_id, earned, spent, n FROM ledger_rollup"))
+
+async def test_rollup():
+    db, sob = await setup()
+    check("rollup tracks every ledger insert", await _rollup(db) == await _grouped(db))
+    cards = {u: await ledger.stats_breakdown(db, GID, u) for u in range(1, 6)}
+    await db.execute("UPDATE economy_ledger SET created_at=0"); await db.commit()
+    await ledger.archive_before(db, 1)
+    check("archiving leaves the rollup alone", await _rollup(db) == await _grouped(db))
+    await db.execute("UPDATE ledger_rollup SET earned = earned + 999 WHERE subject_id = 1")
+    await db.execute("DELETE FROM ledger_rollup WHERE subject_id = 2"); await db.commit()
+    async with db.transaction() as conn:
+        n = await ledger.rebuild_rollup(conn, GID)
+    check(f"rebuild repairs drift ({n} rows)", await _rollup(db) == await _grouped(db))
+    after = {u: await ledger.stats_breakdown(db, GID, u) for u in range(1, 6)}
+    check("stats cards unchanged through archive + rebuild", after == cards)
+    plan = " ".join(str(tuple(r)) for r in await db.fetchall(
+        "EXPLAIN QUERY PLAN SELECT earned, spent, n FROM ledger_rollup WHERE guild_id=? AND subject_id=?", (GID, 1)))
+    check("stats card reads the rollup by key", "economy_ledger" not in plan and "SEARCH" in plan)
+    await db.close()
+
+async def main():
+    print("[test_ledger_tiers]")
+    await test_archive_is_transparent()
+    await test_checkpoints()
+    await test_compact_rows()
+    await test_rollup()
+    print(f"\n  RESULT: {len(PASS)} passed, {len(FAIL)} failed")
+    if FAIL: print("  FAILURES:", FAIL); sys.exit(1)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -31,6 +31,24 @@ def main():
         buf = render_board(c["x"], c["y"], 1, 5)
         data = buf.read()
         check(f"renders board for {nm}", data[:8].startswith(b"\x89PNG"))
+    # boards are encoded once per (country, round, total) and served from memory
+    from core.games import mapgame_render as MR
+    c = COUNTRIES[0]
+    hits = MR.board_cache_stats["hits"]
+    a, b = render_board(c["x"], c["y"], 2, 5), render_board(c["x"], c["y"], 2, 5)
+    check("repeat board served from cache", MR.board_cache_stats["hits"] >= hits + 1)
+    check("each call gets its own buffer", a is not b and a.read() == b.read())
+    cap = MR.BOARD_CACHE_BYTES
+    try:
+        MR.BOARD_CACHE_BYTES = 3 * len(a.getvalue())
+        for cc in COUNTRIES[:6]:
+            render_board(cc["x"], cc["y"], 1, 5)
+        check("board cache stays under its byte cap (LRU)",
+              MR.board_cache_stats["bytes"] <= MR.BOARD_CACHE_BYTES
+              and MR.board_cache_stats["bytes"] == sum(map(len, MR._boards.values()))
+              and (COUNTRIES[5]["x"], COUNTRIES[5]["y"], 1, 5) in MR._boards)
+    finally:
+        MR.BOARD_CACHE_BYTES = cap
     test_session_dots()
     test_no_not_quite()
     test_persistent_message()
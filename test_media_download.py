@@ -195,6 +195,234 @@ def test_strict_mention_trigger():
     check("mention_everyone -> ignored", strict(f"{B} https://tiktok.com/x", mention_everyone=True) is None)
 
 
+async def test_single_flight():
+    """Concurrent mentions of one link share a single download + temp file."""
+    from unittest.mock import patch
+    calls = []
+    async def fake_download(url, max_mb=None, timeout=None):
+        calls.append(url)
+        await asyncio.sleep(0.05)
+        f = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4"); f.write(b"v"); f.close()
+        return media.DownloadResult(True, path=f.name, url=url)
+    with patch.object(media, "download", side_effect=fake_download):
+        urls = ["https://www.tiktok.com/@a/video/1?utm_source=x",
+                "https://www.tiktok.com/@a/video/1", "https://www.tiktok.com/@a/video/1#t"]
+        res = await asyncio.gather(*(media.download_shared(u) for u in urls))
+        check("N concurrent mentions -> one download", len(calls) == 1)
+        check("all callers share the same file", len({r.path for r in res}) == 1)
+        check("in-flight lookup uses the canonical URL", media.in_flight(urls[0]))
+        path = res[0].path
+        media.release(res[0]); media.release(res[1])
+        check("file kept while a holder remains", os.path.exists(path))
+        media.release(res[2])
+        check("last release deletes the shared file", not os.path.exists(path))
+        check("flight forgotten after last release", not media.in_flight(urls[0]))
+        # a waiter cancelled mid-download doesn't leak the file it produces
+        t = asyncio.ensure_future(media.download_shared("https://streamable.com/zz"))
+        await asyncio.sleep(0.01); t.cancel()
+        await asyncio.sleep(0.1)
+        check("abandoned download is cleaned up", not media.in_flight("https://streamable.com/zz")
+              and len(calls) == 2)
+
+        # only the caller that starts a download pays for a slot, decided when
+        # the flight is created (no gap for the flight to finish in between)
+        slots = []
+        async def take(who):
+            slots.append(who); await asyncio.sleep(0.01)
+        res = await asyncio.gather(*(media.download_shared("https://v.redd.it/q", acquire=lambda i=i: take(i))
+                                     for i in range(3)))
+        check("only the starting caller acquires a slot", slots == [0] and len(calls) == 3)
+        for r in res: media.release(r)
+        res = await media.download_shared("https://v.redd.it/q", acquire=lambda: take("again"))
+        check("a finished flight's next download acquires again", slots[-1] == "again" and len(calls) == 4)
+        media.release(res)
+        # the starter giving up while queued hands the download to a joiner
+        slots.clear()
+        async def busy():
+            slots.append("busy"); await asyncio.sleep(0.01); raise RuntimeError("queue full")
+        starter = asyncio.ensure_future(media.download_shared("https://v.redd.it/w", acquire=busy))
+        await asyncio.sleep(0)
+        joiner = asyncio.ensure_future(media.download_shared("https://v.redd.it/w", acquire=lambda: take("joiner")))
+        got = await joiner
+        try:
+            await starter
+            raised = False
+        except RuntimeError:
+            raised = True
+        check("a starter that can't get a slot hands the download to a joiner",
+              raised and slots == ["busy", "joiner"] and got.ok and len(calls) == 5)
+        media.release(got)
+        check("no flights left behind", not media._flights)
+
+
+async def test_media_cache():
+    """Downloads are cached by canonical URL + content hash (LRU, cap, TTL)."""
+    from unittest.mock import patch
+    from core.utilities.mediacache import MediaCache
+    root = tempfile.mkdtemp()
+    cache = MediaCache(root=root, max_bytes=10_000, ttl=3600)
+    runs = []
+    def fake_blocking(url, mb):
+        runs.append(url)
+        os.makedirs(media.TEMP_DIR, exist_ok=True)
+        p = os.path.join(media.TEMP_DIR, f"dl{len(runs)}.mp4")
+        with open(p, "wb") as f: f.write(b"clip-bytes" * 100)
+        return media.DownloadResult(True, path=p, title="Clip", source="TikTok", url=url, duration=7)
+    async def fake_safe(url, resolve_dns=True): return True, "ok"
+    with patch.object(media, "media_cache", cache), patch.object(media, "is_available", return_value=True), \
+         patch.object(media, "is_safe_url_async", side_effect=fake_safe), \
+         patch.object(media, "_blocking_download", side_effect=fake_blocking):
+        a = await media.download("https://www.tiktok.com/@a/video/9?utm_source=s")
+        media.cleanup(a.path)                      # caller deletes its temp file as usual
+        b = await media.download("https://www.tiktok.com/@a/video/9")
+        check("second request served from media cache (no yt-dlp)", len(runs) == 1 and b.ok)
+        check("cached result keeps metadata", b.title == "Clip" and b.duration == 7)
+        with open(b.path, "rb") as f:
+            check("cached copy has the full file", f.read() == b"clip-bytes" * 100)
+        media.cleanup(b.path)
+        c = await media.download("https://streamable.com/mirror")   # same bytes, new URL
+        check("identical content stored once (content-addressed)",
+              cache.stats()["blobs"] == 1 and cache.stats()["urls"] == 2)
+        media.cleanup(c.path)
+    for i in range(15):
+        p = os.path.join(tempfile.mkdtemp(), f"v{i}.mp4")
+        with open(p, "wb") as f: f.write(bytes([i]) * 1000)
+        cache.put(f"https://x.com/v/{i}", p)
+    check("media cache stays under its byte cap", cache.stats()["bytes"] <= 10_000)
+    check("LRU evicts the oldest clips", cache.get("https://x.com/v/0", media.TEMP_DIR) is None
+          and cache.get("https://x.com/v/14", media.TEMP_DIR) is not None)
+    fresh = MediaCache(root=root, max_bytes=10_000, ttl=0)
+    check("expired clips are swept at startup", fresh.get("https://x.com/v/14", media.TEMP_DIR) is None
+          and fresh.stats()["blobs"] == 0)
+    check("media cache is off without MEDIA_CACHE_DIR", not MediaCache(root="").enabled)
+
+
+def test_transcode_plan():
+    """Oversized clips get a bitrate/height plan that fits the guild limit."""
+    ten_mb = 10 * 1024 * 1024
+    p = media.transcode_plan(60, ten_mb)
+    total = (p["video_kbps"] + p["audio_kbps"]) * 1000 / 8 * 60
+    check("plan fits 60s into 10 MB", total <= ten_mb)
+    check("tight budget downscales to 480p", p["height"] == 480)
+    check("tighter budget -> 360p", media.transcode_plan(150, ten_mb)["height"] == 360)
+    check("roomy budget keeps 720p", media.transcode_plan(20, 50 * 1024 * 1024)["height"] == 720)
+    check("hopeless budget -> no plan", media.transcode_plan(3600, ten_mb) is None)
+    check("unknown duration -> no plan", media.transcode_plan(None, ten_mb) is None)
+    args = media.transcode_args("in.mp4", "out.mp4", p)
+    check("encode is rate-capped", f"{p['video_kbps']}k" in args and "-maxrate" in args)
+    check("encode never upscales", any("min(480,ih)" in a for a in args))
+
+
+async def test_transcode_to_fit():
+    from unittest.mock import patch
+    src = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4"); src.write(b"x" * 5000); src.close()
+    sizes = [1500, 800]              # first encode overshoots, retry fits
+    seen = []
+    async def fake_tool(tool, args, timeout):
+        seen.append(args)
+        with open(args[-1], "wb") as f: f.write(b"y" * sizes[len(seen) - 1])
+        return 0, b"", b""
+    with patch.object(media, "ffmpeg_available", return_value=True), \
+         patch.object(media, "_run_tool", side_effect=fake_tool), \
+         patch.object(media, "transcode_plan", return_value={"video_kbps": 900, "audio_kbps": 96, "height": 480}):
+        out = await media.transcode_to_fit(src.name, 1000, duration=30)
+    check("oversized video transcoded under the limit", out and os.path.getsize(out) <= 1000)
+    check("overshoot retried with fewer bits", len(seen) == 2 and "720k" in seen[1])
+    check("source file left untouched", os.path.getsize(src.name) == 5000)
+    media.cleanup(out)
+    async def failing(tool, args, timeout): return 1, b"", b"boom"
+    with patch.object(media, "ffmpeg_available", return_value=True), \
+         patch.object(media, "_run_tool", side_effect=failing):
+        out2 = await media.transcode_to_fit(src.name, 10 * 1024 * 1024, duration=30)
+    check("failed transcode returns None", out2 is None)
+    async def cancelled(tool, args, timeout): raise asyncio.CancelledError
+    before = set(os.listdir(media.TEMP_DIR))
+    with patch.object(media, "ffmpeg_available", return_value=True), \
+         patch.object(media, "_run_tool", side_effect=cancelled):
+        try:
+            await media.transcode_to_fit(src.name, 10 * 1024 * 1024, duration=30)
+        except asyncio.CancelledError:
+            pass
+    check("cancelled transcode leaves no temp file", set(os.listdir(media.TEMP_DIR)) <= before)
+    media.cleanup(src.name)
+
+
+async def test_pipe_through():
+    """video->gif plumbing: body streamed to stdin, output read from stdout, capped."""
+    async def body(n, size=1000):
+        for _ in range(n):
+            yield b"v" * size
+    echo = ["-c", "import sys; d = sys.stdin.buffer.read(); sys.stdout.buffer.write(b'GIF89a' + str(len(d)).encode())"]
+    out, _ = await media.pipe_through(sys.executable, echo, body(50),
+                                      max_input=100_000, max_output=1000, timeout=20)
+    check("body streamed through the tool's stdin/stdout", out == b"GIF89a50000")
+    out, why = await media.pipe_through(sys.executable, echo, body(200),
+                                        max_input=100_000, max_output=1000, timeout=20)
+    check("input cap enforced on the stream", out is None and "too large" in why)
+    loud = ["-c", "import sys; sys.stdin.buffer.read(); sys.stdout.buffer.write(b'x' * 50000)"]
+    out, why = await media.pipe_through(sys.executable, loud, body(1),
+                                        max_input=100_000, max_output=1000, timeout=20)
+    check("output cap enforced on the stream", out is None and "too large" in why)
+    early = ["-c", "import sys; sys.stdin.buffer.read(10); sys.stdin.close(); sys.stdout.buffer.write(b'GIF89a')"]
+    out, _ = await media.pipe_through(sys.executable, early, body(500, 64 * 1024),
+                                      max_input=10**9, max_output=1000, timeout=20)
+    check("tool closing stdin early is not an error", out == b"GIF89a")
+    args = media.gif_args("pipe:0", 8)
+    check("gif uses palettegen/paletteuse graph", "palettegen" in args[args.index("-filter_complex") + 1]
+          and "paletteuse" in args[args.index("-filter_complex") + 1])
+    check("gif goes to stdout", args[-1] == "pipe:1" and "pipe:0" in args)
+
+
+async def _spawned(coro_fn):
+    """Run coro_fn, cancel it once its subprocess is up, return that process."""
+    from unittest.mock import patch
+    procs = []
+    real = asyncio.create_subprocess_exec
+    async def spy(*a, **k):
+        procs.append(await real(*a, **k)); return procs[-1]
+    with patch.object(asyncio, "create_subprocess_exec", side_effect=spy):
+        task = asyncio.ensure_future(coro_fn())
+        while not procs:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.1)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    return procs[0]
+
+
+async def test_tool_cancel():
+    """A cancelled job (its message deleted) must not leave the tool running."""
+    slow = ["-c", "import time; time.sleep(30)"]
+    proc = await _spawned(lambda: media._run_tool(sys.executable, slow, timeout=60))
+    check("cancelled _run_tool kills and reaps the tool", proc.returncode is not None)
+    async def trickle():
+        while True:
+            yield b"v"
+            await asyncio.sleep(0.01)
+    proc = await _spawned(lambda: media.pipe_through(
+        sys.executable, slow, trickle(), max_input=10**6, max_output=10**6, timeout=60))
+    check("cancelled pipe_through kills and reaps the tool", proc.returncode is not None)
+    async def broken():
+        yield b"v"
+        raise OSError("source connection reset")
+    procs = []
+    real = asyncio.create_subprocess_exec
+    async def spy(*a, **k):
+        procs.append(await real(*a, **k)); return procs[-1]
+    from unittest.mock import patch
+    with patch.object(asyncio, "create_subprocess_exec", side_effect=spy):
+        try:
+            await media.pipe_through(sys.executable, slow, broken(),
+                                     max_input=10**6, max_output=10**6, timeout=60)
+            raised = False
+        except OSError:
+            raised = True
+    check("a failing source stream kills the tool too", raised and procs[0].returncode is not None)
+
+
 def main():
     print("[test_media_download]")
     test_supported_detection()
@@ -210,6 +438,12 @@ def main():
     test_temp_cleanup()
     check("concurrency + cooldown slots work", asyncio.run(test_concurrency_and_cooldown()))
     test_guild_limit()
+    asyncio.run(test_single_flight())
+    asyncio.run(test_media_cache())
+    test_transcode_plan()
+    asyncio.run(test_transcode_to_fit())
+    asyncio.run(test_pipe_through())
+    asyncio.run(test_tool_cancel())
     print(f"\n  RESULT: {len(PASS)} passed, {len(FAIL)} failed")
     if FAIL:
         print("  FAILURES:", FAIL); sys.exit(1)
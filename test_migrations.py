@@ -6,6 +6,14 @@ Scenarios:
   B. Existing DB already at migration 209 (the shipped database_dev): the new
      ALTER/CREATE migrations (210-214) apply without error and are idempotent.
   C. Re-running connect() twice is a no-op (idempotent).
+  D. economy_snapshots keyed by TEXT day (pre-220) is rebuilt onto an integer
+     slot, keeping half-hour rows and turning YYYY-MM-DD rows into daily ones.
+  E. economy_ledger / archive with TEXT event types (pre-223) are rebuilt onto
+     interned event ids, keeping every row and the AUTOINCREMENT sequence.
+  F. ledger_rollup (224) is seeded from the hot ledger plus the old archive
+     rollup, which it replaces.
+  G. event names interned from id 35 (pre-225) move to 1000+, with
+     protection_autobalance pinned at 35, across both tiers and the rollup.
 """
 import asyncio
 import os
@@ -46,7 +54,7 @@ async def scenario_fresh():
     assert "credited_amount" in cols["sob_events"], "credited_amount missing on sob_events"
     assert "multiplier_ref" in cols["sob_events"], "multiplier_ref missing"
     assert "charges_remaining" in cols["active_effects"], "charges_remaining missing"
-    assert migs[-1] == 217, f"latest migration should be 217, got {migs[-1]}"
+    assert migs[-1] == 225, f"latest migration should be 225, got {migs[-1]}"
     shutil.rmtree(d)
     print("  A. fresh DB: all new tables/columns present, migrations 200-214 OK")
 
@@ -65,7 +73,7 @@ async def scenario_existing():
     await db.connect()
     await db.close()
     after_cols, after_migs = tables_and_columns(path)
-    assert after_migs[-1] == 217, f"should upgrade to 217, got {after_migs}"
+    assert after_migs[-1] == 225, f"should upgrade to 225, got {after_migs}"
     assert "credited_amount" in after_cols["sob_events"]
     assert "charges_remaining" in after_cols["active_effects"]
     assert "economy_ledger" in after_cols
@@ -81,9 +89,174 @@ async def scenario_existing():
     shutil.rmtree(d)
 
 
+async def scenario_snapshot_slots():
+    d = tempfile.mkdtemp()
+    path = os.path.join(d, "slots.sqlite3")
+    db = Database(path)
+    await db.connect()
+    await db.close()
+    # wind economy_snapshots back to its pre-220 shape
+    c = sqlite3.connect(path)
+    c.executescript("""
+        DROP TABLE economy_snapshots;
+        CREATE TABLE economy_snapshots (
+            guild_id INTEGER NOT NULL, day TEXT NOT NULL,
+            total_sobs INTEGER NOT NULL DEFAULT 0, players INTEGER NOT NULL DEFAULT 0,
+            created_at INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (guild_id, day));
+        INSERT INTO economy_snapshots VALUES (1, '1760000400', 500, 3, 1760000401);
+        INSERT INTO economy_snapshots VALUES (1, '2024-03-01', 200, 2, 0);
+        INSERT INTO economy_snapshots VALUES (1, 'garbage', 1, 1, 0);
+        DELETE FROM schema_migrations WHERE version = 220;
+    """)
+    c.commit()
+    c.close()
+    db = Database(path)
+    await db.connect()
+    await db.close()
+    cols, migs = tables_and_columns(path)
+    assert 220 in migs, f"should re-apply 220, got {migs}"
+    assert "slot" in cols["economy_snapshots"] and "day" not in cols["economy_snapshots"]
+    c = sqlite3.connect(path)
+    rows = c.execute("SELECT slot, resolution, total_sobs FROM economy_snapshots ORDER BY slot").fetchall()
+    c.close()
+    assert rows == [(1709251200, 86400, 200), (1760000400, 1800, 500)], rows
+    shutil.rmtree(d)
+    print("  D. TEXT day snapshots rebuilt onto integer slots (legacy dates -> daily)")
+
+
+async def scenario_ledger_compact():
+    d = tempfile.mkdtemp()
+    path = os.path.join(d, "ledger.sqlite3")
+    db = Database(path)
+    await db.connect()
+    await db.close()
+    # wind both ledger tiers back to their pre-223 shape
+    cols = ("ledger_id INTEGER PRIMARY KEY{}, transaction_id TEXT NOT NULL, guild_id INTEGER NOT NULL, "
+            "created_at INTEGER NOT NULL, event_type TEXT NOT NULL, subject_id INTEGER NOT NULL DEFAULT 0, "
+            "actor_id INTEGER NOT NULL DEFAULT 0, counterparty_id INTEGER NOT NULL DEFAULT 0, "
+            "delta INTEGER NOT NULL DEFAULT 0, balance_before INTEGER NOT NULL DEFAULT 0, "
+            "balance_after INTEGER NOT NULL DEFAULT 0, item_key TEXT NOT NULL DEFAULT '', "
+            "item_name TEXT NOT NULL DEFAULT '', quantity INTEGER NOT NULL DEFAULT 0, "
+            "price INTEGER NOT NULL DEFAULT 0, message_id INTEGER NOT NULL DEFAULT 0, "
+            "game_id TEXT NOT NULL DEFAULT '', tax_amount INTEGER NOT NULL DEFAULT 0, "
+            "treasury_amount INTEGER NOT NULL DEFAULT 0, burned_amount INTEGER NOT NULL DEFAULT 0, "
+            "multiplier_ref TEXT NOT NULL DEFAULT '', metadata TEXT NOT NULL DEFAULT ''")
+    c = sqlite3.connect(path)
+    c.executescript(f"""
+        DROP TABLE economy_ledger;
+        DROP TABLE economy_ledger_archive;
+        DROP TABLE ledger_event_types;
+        CREATE TABLE economy_ledger ({cols.format(" AUTOINCREMENT")});
+        CREATE TABLE economy_ledger_archive ({cols.format("")});
+        INSERT INTO economy_ledger_archive (ledger_id, transaction_id, guild_id, created_at, event_type, delta)
+            VALUES (1, 'aa', 1, 10, 'snitch_wipe', -5), (2, 'bb', 1, 11, 'old_promo', 7);
+        UPDATE sqlite_sequence SET seq = 50 WHERE name = 'economy_ledger';
+        INSERT INTO sqlite_sequence (name, seq) SELECT 'economy_ledger', 50
+            WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'economy_ledger');
+        DELETE FROM schema_migrations WHERE version = 223;
+    """)
+    c.commit()
+    c.close()
+    db = Database(path)
+    await db.connect()
+    await db.close()
+    cols, migs = tables_and_columns(path)
+    assert 223 in migs, f"should re-apply 223, got {migs}"
+    for t in ("economy_ledger", "economy_ledger_archive"):
+        assert "event_id" in cols[t] and "event_type" not in cols[t], cols[t]
+    c = sqlite3.connect(path)
+    rows = c.execute("SELECT l.ledger_id, t.name, l.transaction_id, l.delta FROM economy_ledger_archive l "
+                     "JOIN ledger_event_types t USING (event_id) ORDER BY ledger_id").fetchall()
+    c.execute("INSERT INTO economy_ledger (transaction_id, guild_id, created_at, event_id) VALUES (x'00', 1, 1, 1)")
+    next_id = c.execute("SELECT MAX(ledger_id) FROM economy_ledger").fetchone()[0]
+    c.close()
+    assert rows == [(1, "snitch_wipe", "aa", -5), (2, "old_promo", "bb", 7)], rows
+    assert next_id == 51, f"ledger ids must not be reused after the rebuild, got {next_id}"
+    shutil.rmtree(d)
+    print("  E. TEXT event types rebuilt onto interned ids (rows + id sequence kept)")
+
+
+async def scenario_ledger_rollup():
+    d = tempfile.mkdtemp()
+    path = os.path.join(d, "rollup.sqlite3")
+    db = Database(path)
+    await db.connect()
+    await db.close()
+    # back to pre-224: archive rollup present, no ledger_rollup or trigger
+    c = sqlite3.connect(path)
+    c.executescript("""
+        DROP TRIGGER trg_ledger_rollup_ins;
+        DROP TABLE ledger_rollup;
+        CREATE TABLE ledger_archive_rollup (
+            guild_id INTEGER NOT NULL, subject_id INTEGER NOT NULL, event_type TEXT NOT NULL,
+            earned INTEGER NOT NULL DEFAULT 0, spent INTEGER NOT NULL DEFAULT 0, n INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (guild_id, subject_id, event_type)) WITHOUT ROWID;
+        INSERT INTO ledger_archive_rollup VALUES (1, 7, 'daily_claim', 100, 0, 4);
+        INSERT INTO economy_ledger (transaction_id, guild_id, created_at, event_id, subject_id, delta)
+            VALUES (x'01', 1, 1, 8, 7, 30), (x'02', 1, 1, 12, 7, -20);
+        DELETE FROM schema_migrations WHERE version = 224;
+    """)
+    c.commit()
+    c.close()
+    db = Database(path)
+    await db.connect()
+    await db.close()
+    cols, migs = tables_and_columns(path)
+    assert 224 in migs and "ledger_archive_rollup" not in cols, migs
+    c = sqlite3.connect(path)
+    rows = c.execute("SELECT subject_id, event_id, earned, spent, n FROM ledger_rollup ORDER BY event_id").fetchall()
+    c.close()
+    assert rows == [(7, 8, 130, 0, 5), (7, 12, 0, 20, 1)], rows
+    shutil.rmtree(d)
+    print("  F. ledger_rollup seeded from hot rows + the archive rollup it replaces")
+
+
+async def scenario_event_range():
+    d = tempfile.mkdtemp()
+    path = os.path.join(d, "events.sqlite3")
+    db = Database(path)
+    await db.connect()
+    await db.close()
+    # back to pre-225: names interned straight after the canonical 34
+    c = sqlite3.connect(path)
+    c.executescript("""
+        DELETE FROM ledger_event_types WHERE event_id > 34;
+        INSERT INTO ledger_event_types (event_id, name) VALUES (35, 'old_promo'), (36, 'protection_autobalance');
+        INSERT INTO economy_ledger (transaction_id, guild_id, created_at, event_id, subject_id, delta)
+            VALUES (x'01', 1, 1, 35, 7, 5), (x'02', 1, 1, 36, 7, 0), (x'03', 1, 1, 8, 7, 30);
+        INSERT INTO economy_ledger_archive (ledger_id, transaction_id, guild_id, created_at, event_id, subject_id, delta)
+            VALUES (100, x'04', 1, 1, 36, 8, 0);
+        DELETE FROM schema_migrations WHERE version = 225;
+    """)
+    c.commit()
+    c.close()
+    db = Database(path)
+    await db.connect()
+    await db.close()
+    _, migs = tables_and_columns(path)
+    assert 225 in migs, f"should re-apply 225, got {migs}"
+    c = sqlite3.connect(path)
+    names = dict(c.execute("SELECT name, event_id FROM ledger_event_types WHERE event_id > 34"))
+    hot = c.execute("SELECT t.name, l.delta FROM economy_ledger l JOIN ledger_event_types t USING (event_id) "
+                    "ORDER BY ledger_id").fetchall()
+    cold = c.execute("SELECT event_id FROM economy_ledger_archive").fetchall()
+    rollup = c.execute("SELECT event_id, earned, n FROM ledger_rollup ORDER BY event_id").fetchall()
+    c.close()
+    assert names == {"protection_autobalance": 35, "old_promo": 1035}, names
+    assert hot == [("old_promo", 5), ("protection_autobalance", 0), ("daily_claim", 30)], hot
+    assert cold == [(35,)], cold
+    assert rollup == [(8, 30, 1), (35, 0, 1), (1035, 5, 1)], rollup
+    shutil.rmtree(d)
+    print("  G. interned event ids moved to 1000+, protection_autobalance pinned at 35")
+
+
 async def main():
     print("[test_migrations]")
     await scenario_fresh()
+    await scenario_snapshot_slots()
+    await scenario_ledger_compact()
+    await scenario_ledger_rollup()
+    await scenario_event_range()
     await scenario_existing()
     print("  ✅ migration safety PASSED")
 
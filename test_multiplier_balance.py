@@ -47,6 +47,159 @@ async def test_mature_server_no_overboost():
     check(f"each reaction is a sane value (5-9 sobs, not over-inflated), got {int(val*mult)}", 5 <= int(val*mult) <= 9)
     await db.close()
 
+async def test_supply_counters():
+    """economy_counters stays equal to the live aggregate through every kind of
+    balance write, and verify_counters repairs drift."""
+    db, sob, eco = await setup(3)
+    for u in range(12):
+        await sob.adjust_received(3, u, 5 + u * 3, event_type=ledger.EVT_DAILY)
+    await sob.adjust_received(3, 0, -100, event_type=ledger.EVT_CORRECTION)   # floors at 0
+    await sob.spend(3, 11, 30, event_type=ledger.EVT_CORRECTION)
+    await sob.reset_user(3, 5)
+    await db.execute("DELETE FROM sob_users WHERE guild_id=3 AND user_id=6"); await db.commit()
+    row = await db.fetchone(
+        "SELECT COALESCE(SUM(sobs_received_alltime),0) AS s, COUNT(*) AS c FROM sob_users "
+        "WHERE guild_id=3 AND sobs_received_alltime > 0")
+    act = await db.fetchone(
+        "SELECT COUNT(*) AS n FROM sob_users WHERE guild_id=3 AND sobs_received_alltime >= 10")
+    check("supply counters track every balance write",
+          await eco.total_supply(3) == (int(row["s"]), int(row["c"]))
+          and await eco._active_user_count(3) == int(act["n"]))
+    check("verify finds nothing when counters are in step", await eco.verify_counters() == [])
+    await db.execute("UPDATE economy_counters SET total_supply = total_supply + 7 WHERE guild_id=3")
+    await db.commit()
+    bad = await eco.verify_counters()
+    check("verify detects and repairs drift",
+          len(bad) == 1 and await eco.total_supply(3) == (int(row["s"]), int(row["c"])))
+    check("empty guild reads as zero supply", await eco.total_supply(999) == (0, 0))
+    await db.close()
+
+async def test_reference_percentile():
+    """p65 reference comes from SQL (exact) or the balance histogram (large
+    guilds) and matches the old sort-in-Python answer."""
+    import random
+    import core.economy as E
+    db, sob, eco = await setup(4)
+    rng = random.Random(7)
+    bals = [rng.choice([3, 12, 40, 96, 250, 1200, 4730, 90000]) + rng.randint(0, 9) for _ in range(400)]
+    for u, b in enumerate(bals):
+        await sob.adjust_received(4, u, b, event_type=ledger.EVT_DAILY)
+    active = sorted(b for b in bals if b >= 10)
+    want = active[min(len(active) - 1, int(len(active) * 0.65))]
+    check("exact p65 matches a full sort", await eco.recompute_reference(4) == max(E.REF_FLOOR, want))
+    approx = await eco.histogram_percentile(4, 0.65, min_balance=10)
+    check(f"histogram p65 within one bucket (~10%) of exact ({approx} vs {want})",
+          abs(approx - want) <= want * 0.1)
+    allp = sorted(b for b in bals if b > 0)
+    check("median readout", await eco.median_balance(4) == allp[int(len(allp) * 0.5)])
+    old = E.HISTOGRAM_MIN_PLAYERS
+    E.HISTOGRAM_MIN_PLAYERS = 10
+    try:
+        check("large guilds use the histogram", await eco.balance_percentile(4, 0.65) == approx)
+    finally:
+        E.HISTOGRAM_MIN_PLAYERS = old
+    await sob.reset_user(4, 0)
+    await db.execute("UPDATE balance_histogram SET n = n + 3 WHERE guild_id = 4 AND bucket = 109")
+    await db.commit()
+    bad = await eco.verify_counters(4)
+    check("histogram drift is detected and rebuilt",
+          any(m.get("histogram") for m in bad) and await eco.verify_counters(4) == [])
+    check("bucket bounds", E.bucket_bounds(E.bucket_of(4730)) == (4700, 4800)
+          and E.bucket_bounds(E.bucket_of(7)) == (7, 8))
+    await db.close()
+
+async def test_batched_snapshots():
+    """One record_snapshots call writes every guild's row from the counters,
+    and the due-rebalance lookup is a single settings read."""
+    db, sob, eco = await setup(5)
+    for g in (51, 52, 53):
+        for u in range(g - 50):
+            await sob.adjust_received(g, u, 20, event_type=ledger.EVT_DAILY)
+    n = await eco.record_snapshots([51, 52, 53, 54])
+    rows = await db.fetchall("SELECT guild_id, total_sobs, players FROM economy_snapshots ORDER BY guild_id")
+    check("one snapshot row per guild, from the counters",
+          n == 4 and [(r["guild_id"], r["total_sobs"], r["players"]) for r in rows]
+          == [(51, 20, 1), (52, 40, 2), (53, 60, 3), (54, 0, 0)])
+    await eco.record_snapshots([51])
+    check("same slot is upserted, not duplicated",
+          (await db.fetchone("SELECT COUNT(*) AS n FROM economy_snapshots"))["n"] == 4)
+    import core.economy as E
+    await sob.set_guild_setting(52, E.LAST_REBALANCE_KEY, "2026-01-02")
+    await sob.set_guild_setting(53, E.LAST_REBALANCE_KEY, "2026-01-01")
+    check("guilds already rebalanced today are skipped",
+          await eco.guilds_due_rebalance([51, 52, 53], "2026-01-02") == [51, 53])
+    await db.close()
+
+async def test_snapshot_retention():
+    """Compaction keeps 2 days at 30 min, hourly to 30 days, daily beyond,
+    keeping each bucket's closing value; series pick a coarser step for
+    longer windows."""
+    import time
+    import core.economy as E
+    db, sob, eco = await setup(6)
+    now = int(time.time()) // 86400 * 86400 + 43200          # noon today
+    start = now - 40 * 86400
+    rows = [(6, t, 1800, t // 1800, 1, t) for t in range(start, now + 1, 1800)]
+    await db.executemany(
+        "INSERT INTO economy_snapshots (guild_id, slot, resolution, total_sobs, players, created_at) "
+        "VALUES (?,?,?,?,?,?)", rows)
+    await db.commit()
+    removed = await eco.compact_snapshots(now)
+    res = {r["resolution"]: r["n"] for r in await db.fetchall(
+        "SELECT resolution, COUNT(*) AS n FROM economy_snapshots GROUP BY resolution")}
+    check("recent 2 days stay at full resolution", res.get(1800) == 2 * 48 + 1)
+    check("2-30 days kept hourly", res.get(3600) == 28 * 24 + 12)
+    check("older than 30 days kept daily", res.get(86400) == 10)
+    check("compaction reports what it removed", removed[3600] > 0 and removed[86400] > 0)
+    day = await db.fetchone(
+        "SELECT total_sobs FROM economy_snapshots WHERE guild_id=6 AND slot=?", (start - 43200,))
+    check("a daily point keeps the day's closing value",
+          day is not None and day["total_sobs"] == (start + 43200 - 1800) // 1800)
+    again = await eco.compact_snapshots(now)
+    check("compaction is idempotent", not any(again.values()))
+    recent = [p["slot"] for p in await eco.supply_series(6, 86400)]
+    check("1d window at 30-min points", len(recent) > 1
+          and all(b - a == 1800 for a, b in zip(recent, recent[1:])))
+    week = await eco.supply_series(6, 7 * 86400)
+    check(f"7d window at 3h steps ({len(week)} points)", 50 <= len(week) <= 96)
+    check("all-history window stays under the point cap", 0 < len(await eco.supply_series(6, None)) <= 96)
+    await db.close()
+
+async def test_economy_window():
+    """!economy's status and advice come from the 1d signal whatever window
+    is plotted; the window only changes the graph."""
+    import time
+    from unittest.mock import patch
+    from core.economy_cog import EconomyCog
+    db, sob, eco = await setup(7)
+    await sob.adjust_received(7, 1, 5000, event_type=ledger.EVT_DAILY)
+    now = int(time.time()) // 1800 * 1800
+    await db.executemany(
+        "INSERT INTO economy_snapshots (guild_id, slot, resolution, total_sobs, players, created_at) "
+        "VALUES (?,?,?,?,?,?)",
+        [(7, t, 1800, 1000 if t < now - 20 * 86400 else 5000, 1, t)
+         for t in range(now - 60 * 86400, now, 1800)])
+    await db.commit()
+    cog = EconomyCog.__new__(EconomyCog); cog.eco = eco
+    cards = []
+    class Card:
+        def save(self, buf, format=None): buf.write(b"png")
+    def fake_card(data): cards.append(data); return Card()
+    class Guild: id = 7; name = "g"
+    class Ctx:
+        guild = Guild(); prefix = "!"
+        async def reply(self, *a, **k): pass
+    with patch("core.profile.eco_render.make_economy_card", fake_card):
+        await cog.economy_cmd.callback(cog, Ctx(), "1d")
+        await cog.economy_cmd.callback(cog, Ctx(), "90d")
+    day, quarter = cards
+    check("a long window still plots the long series", len(quarter["points"]) != len(day["points"])
+          and min(quarter["points"]) == 1000 and min(day["points"]) == 5000)
+    check("inflation status and advice don't depend on the plotted window",
+          (quarter["status"], quarter["pct"], quarter["advice"])
+          == (day["status"], day["pct"], day["advice"]) == ("green", 0.0, None))
+    await db.close()
+
 async def test_real_server_value():
     # the actual production export: 330 active, was minting 9/reaction
     import json
@@ -64,6 +217,11 @@ async def main():
     print("[test_multiplier_balance]")
     await test_new_server_boosts()
     await test_mature_server_no_overboost()
+    await test_supply_counters()
+    await test_reference_percentile()
+    await test_batched_snapshots()
+    await test_snapshot_retention()
+    await test_economy_window()
     await test_real_server_value()
     print(f"\n  RESULT: {len(PASS)} passed, {len(FAIL)} failed")
     if FAIL: print("  FAILURES:", FAIL); sys.exit(1)
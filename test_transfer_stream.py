@@ -0,0 +1,177 @@
+"""
+test_transfer_stream.py — the gzipped NDJSON export streams a table section at
+a time and imports back (chunked executemany transactions) to the same data
+as the in-memory JSON path; old .json exports still import.
+"""
+import asyncio, gzip, json, os, tempfile, sys
+sys.path.insert(0, '.')
+from core.db import Database, DatabaseManager
+from core.sob.repo import SobRepo
+from core import ledger, transfer
+GID = 5000
+PASS, FAIL = [], []
+def check(n, c): (PASS if c else FAIL).append(n); print(f"  {'✅' if c else '❌'} {n}")
+
+class _Mgr(DatabaseManager):
+    def __init__(self, db): self._db_obj = db
+    async def get(self): return self._db_obj
+
+async def fresh(d, name):
+    db = Database(os.path.join(d, name)); await db.connect(); return db
+
+async def seed(db):
+    sob = SobRepo(_Mgr(db))
+    for u in range(1, 9):
+        await sob.adjust_received(GID, u, 100 * u, event_type=ledger.EVT_ADMIN_GIVE)
+        await sob.spend(GID, u, 3 * u, event_type=ledger.EVT_SHOP_BASE)
+        await sob.transfer(GID, u, (u % 8) + 1, 5, event_type=ledger.EVT_AUDIT_STEAL)
+        await sob.add_sob(guild_id=GID, message_id=700 + u, reactor_id=(u % 8) + 1,
+                          target_id=u, credited_amount=2)
+    await sob.set_guild_setting(GID, "snitch_threshold", "7")
+
+def tables_of(payload):
+    # the ledger's hot/archive split and ids are storage details; compare content
+    return {t: sorted(json.dumps(r, sort_keys=True, default=str) for r in rows)
+            for t, rows in payload["tables"].items()}
+
+async def test_stream_roundtrip():
+    d = tempfile.mkdtemp()
+    src = await fresh(d, "src.sqlite3"); await seed(src)
+    mem = await transfer.export_guild(src, GID)
+    batches = [len(b) async for b in transfer._table_batches(src, "economy_ledger", GID, batch=7)]
+    check("export reads the ledger off the cursor in bounded batches",
+          max(batches) <= 7 and sum(batches) == len(mem["tables"]["economy_ledger"]))
+
+    path = os.path.join(d, "g.ndjson.gz")
+    counts = await transfer.export_guild_to_file(src, GID, path)
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        lines = [json.loads(l) for l in f]
+    check("file is gzipped NDJSON with a version header",
+          lines[0]["ignio_export_version"] == transfer.STREAM_EXPORT_VERSION and lines[0]["guild_id"] == GID)
+    sections = [l[transfer._SECTION] for l in lines if transfer._SECTION in l]
+    check("one section per table, in order", sections == list(transfer._GUILD_TABLES))
+    check("row counts match the in-memory export",
+          counts == {t: len(r) for t, r in mem["tables"].items()})
+    check("summary trailer carries the reconciliation",
+          lines[-1][transfer._SUMMARY]["reconciliation"] == mem["reconciliation"])
+
+    dst = await fresh(d, "dst.sqlite3")
+    seen = []
+    async def progress(table, done): seen.append((table, done))
+    ins = await transfer.import_guild_from_file(dst, path, mode="replace", progress=progress)
+    back = await transfer.export_guild(dst, GID)
+    check("stream import restores every table", tables_of(back) == tables_of(mem))
+    check("imported books reconcile", back["reconciliation"] == mem["reconciliation"])
+    check("progress is reported per chunk and table",
+          ("economy_ledger", ins["economy_ledger"]) in seen and len(seen) >= len(transfer._GUILD_TABLES))
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        again = await transfer.import_guild_stream(dst, f, mode="merge", chunk=5)
+    check("merge re-import is idempotent", sum(again.values()) == 0)
+
+    # an old plain-JSON export still imports, and can be re-homed
+    old = os.path.join(d, "old.json")
+    with open(old, "w", encoding="utf-8") as f:
+        json.dump(mem, f)
+    other = await fresh(d, "other.sqlite3")
+    ins = await transfer.import_guild_from_file(other, old, mode="replace", target_guild_id=GID + 1)
+    cloned = await transfer.export_guild(other, GID + 1)
+    await other.close()
+    check("legacy JSON import clones into another guild",
+          ins["sob_users"] == len(mem["tables"]["sob_users"])
+          and cloned["reconciliation"]["users_reconciled"] == mem["reconciliation"]["users_reconciled"])
+    try:
+        await transfer.import_guild_stream(dst, iter(['{"ignio_export_version": 9, "guild_id": 1}']))
+        check("unknown stream version is rejected", False)
+    except ValueError:
+        check("unknown stream version is rejected", True)
+    await src.close(); await dst.close()
+
+async def test_import_isolation():
+    d = tempfile.mkdtemp()
+    src = await fresh(d, "src.sqlite3"); await seed(src)
+    async with src.transaction() as conn:
+        await ledger.record_many(conn, [
+            {"event_type": f"custom_evt_{i}", "subject_id": 1, "delta": i}
+            for i in range(1, 6)], guild_id=GID, transaction_id=ledger.new_tx_id())
+    path = os.path.join(d, "g.ndjson.gz")
+    await transfer.export_guild_to_file(src, GID, path)
+    mem = await transfer.export_guild(src, GID)
+
+    # custom event types are interned while other work keeps rolling back
+    dst = await fresh(d, "dst.sqlite3")
+    stop = False
+    async def roller():
+        while not stop:
+            try:
+                async with dst.transaction() as conn:
+                    await conn.execute("INSERT INTO ledger_event_types (name) VALUES ('doomed')")
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            await asyncio.sleep(0)
+    task = asyncio.create_task(roller())
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            await transfer.import_guild_stream(dst, f, mode="replace", chunk=3)
+    finally:
+        stop = True; await task
+    back = await transfer.export_guild(dst, GID)
+    check("custom event types survive concurrent rollbacks", tables_of(back) == tables_of(mem))
+    summary = await ledger.user_summary(dst, GID, 1)
+    check("custom events decode into the summary",
+          all(f"custom_evt_{i}" in summary["by_event"] for i in range(1, 6)))
+
+    # a replace import that fails mid-ledger still rebuilds the checkpoints
+    await ledger.advance_checkpoints(dst)
+    lines = [json.dumps({"ignio_export_version": transfer.STREAM_EXPORT_VERSION, "guild_id": GID}),
+             json.dumps({transfer._SECTION: "economy_ledger"}),
+             json.dumps({"bad col": 1})]
+    try:
+        await transfer.import_guild_stream(dst, iter(lines), mode="replace")
+        check("broken replace import raises", False)
+    except ValueError:
+        check("broken replace import raises", True)
+    net = await ledger.guild_net_by_user(dst, GID)
+    check("checkpoints drop the wiped ledger after a failed import",
+          not any(net.values()))
+    await src.close(); await dst.close()
+
+async def test_export_snapshot():
+    d = tempfile.mkdtemp()
+    src = await fresh(d, "src.sqlite3"); await seed(src)
+    sob = SobRepo(_Mgr(src))
+    stop = False
+    async def writer():
+        i = 0
+        while not stop:
+            i += 1
+            await sob.adjust_received(GID, 1 + i % 8, 1, event_type=ledger.EVT_ADMIN_GIVE)
+            await asyncio.sleep(0)
+    task = asyncio.create_task(writer())
+    try:
+        await asyncio.sleep(0.05)
+        path = os.path.join(d, "live.ndjson.gz")
+        await transfer.export_guild_to_file(src, GID, path)
+    finally:
+        stop = True; await task
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        lines = [json.loads(l) for l in f]
+    summary = lines[-1][transfer._SUMMARY]["reconciliation"]
+    dst = await fresh(d, "dst.sqlite3")
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        await transfer.import_guild_stream(dst, f, mode="replace")
+    check("export taken under live writes is one consistent snapshot",
+          await transfer.reconciliation_report(dst, GID) == summary
+          and summary["users_mismatched"] == 0)
+    await src.close(); await dst.close()
+
+async def main():
+    print("[test_transfer_stream]")
+    await test_stream_roundtrip()
+    await test_import_isolation()
+    await test_export_snapshot()
+    print(f"\n  RESULT: {len(PASS)} passed, {len(FAIL)} failed")
+    if FAIL: print("  FAILURES:", FAIL); sys.exit(1)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -78,6 +78,85 @@ def test_ssrf():
     check("SSRF blocks all internal/loopback/metadata/file/private", True)
     safe, _ = safety.is_safe_url("https://example.com", resolve_dns=False)
     check("SSRF allows normal https", safe)
+    test_ssrf_async()
+
+
+def test_ssrf_async():
+    """Async check: same rules, DNS off the loop, verdicts cached, IPs pinned."""
+    import socket
+    from unittest.mock import patch
+    calls = []
+    def fake_gai(host, *a, **k):
+        calls.append(host)
+        ip = "10.0.0.5" if host == "rebind.test" else "93.184.216.34"
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", (ip, 0))]
+    async def run():
+        out = {}
+        for u in ("http://localhost", "http://127.0.0.1", "file:///etc/passwd", "http://10.0.0.1"):
+            ok, _ = await safety.is_safe_url_async(u)
+            if ok:
+                out["blocked"] = False
+        out.setdefault("blocked", True)
+        with patch("socket.getaddrinfo", side_effect=fake_gai):
+            safety._verdicts.clear()
+            out["ok"], _ = await safety.is_safe_url_async("https://public.test/a")
+            await safety.is_safe_url_async("https://public.test/b")
+            out["cached"] = calls.count("public.test") == 1
+            out["rebind"], _ = await safety.is_safe_url_async("https://rebind.test/")
+            r = safety.VettedResolver()
+            pinned = await r.resolve("public.test", 443, socket.AF_UNSPEC)
+            out["pinned"] = [x["host"] for x in pinned] == ["93.184.216.34"]
+            try:
+                await r.resolve("rebind.test", 443, socket.AF_UNSPEC)
+                out["refused"] = False
+            except OSError:
+                out["refused"] = True
+        safety._verdicts.clear()
+        return out
+    out = asyncio.run(run())
+    check("async SSRF blocks internal/loopback/file/private", out["blocked"])
+    check("async SSRF allows public host", out["ok"])
+    check("async SSRF caches host verdicts", out["cached"])
+    check("async SSRF blocks host resolving private", not out["rebind"])
+    check("resolver pins connection to vetted IP", out["pinned"])
+    check("resolver refuses private resolution", out["refused"])
+
+
+
+def test_redirect_to_ip_literal():
+    """A redirect hop to a private IP literal is refused before it's dialled
+    (aiohttp never asks the resolver about IP literals)."""
+    from unittest.mock import patch
+    from aiohttp import web
+    import aiohttp
+    from core.utilities import sessions as S
+    hits = []
+    async def hop(request):
+        raise web.HTTPFound("http://10.0.0.1/admin")
+    real = S.vetted_addresses
+    async def vetted(host):
+        hits.append(host)
+        # the local test server stands in for a public host
+        return (True, "", (host,)) if host == "127.0.0.1" else await real(host)
+    async def run():
+        app = web.Application(); app.router.add_get("/", hop)
+        runner = web.AppRunner(app); await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0); await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        mgr = S.SessionManager()
+        try:
+            with patch.object(S, "vetted_addresses", side_effect=vetted):
+                s = await mgr.get()
+                try:
+                    async with s.get(f"http://127.0.0.1:{port}/", allow_redirects=True) as r:
+                        return r.status, hits
+                except aiohttp.ClientConnectionError as e:
+                    return str(e), hits
+        finally:
+            await mgr.close(); await runner.cleanup()
+    res, seen = asyncio.run(run())
+    check("redirect to a private IP literal is blocked at connect",
+          "blocked" in str(res) and "10.0.0.1" in seen)
 
 
 def test_resolver():
@@ -266,12 +345,46 @@ def test_animated_caption():
     out, kept = caption_gif(gif, "test")
     data = out.read()
     check("animated caption preserves GIF", kept and data[:6] in (b"GIF87a", b"GIF89a"))
-    # oversized -> first-frame fallback
+    # oversized -> downscaled but still animated
     big = [Image.new("RGB", (1400, 1400), (i*50, 40, 80)) for i in range(2)]
     b2 = _io.BytesIO(); big[0].save(b2, format="GIF", save_all=True, append_images=big[1:], duration=100)
     b2.seek(0); biggif = Image.open(b2)
     out2, kept2 = caption_gif(biggif, "x")
-    check("oversized GIF falls back to first frame", not kept2)
+    res2 = Image.open(out2)
+    check("oversized GIF stays animated (downscaled)", kept2 and max(res2.size) <= 480 and res2.n_frames == 2)
+    # long GIF -> decimated to the frame budget, duplicates merged, timing kept
+    from core.utilities.cards import GIF_MAX_FRAMES
+    long_ = [Image.new("RGB", (120, 90), ((i // 2) * 3 % 255, 40, 80)) for i in range(400)]
+    b3 = _io.BytesIO(); long_[0].save(b3, format="GIF", save_all=True, append_images=long_[1:], duration=40, loop=0)
+    b3.seek(0)
+    out3, kept3 = caption_gif(Image.open(b3), "long")
+    res3 = Image.open(out3)
+    total = 0
+    for k in range(res3.n_frames):
+        res3.seek(k); total += res3.info.get("duration", 0)
+    check("long GIF decimated to frame budget", kept3 and 2 <= res3.n_frames <= GIF_MAX_FRAMES + 1)
+    check("decimated GIF keeps total duration", abs(total - 400 * 40) <= 400)
+    # too big even after budgeting -> first-frame fallback
+    b4 = _io.BytesIO(); big[0].save(b4, format="GIF", save_all=True, append_images=big[1:], duration=100)
+    b4.seek(0)
+    _, kept4 = caption_gif(Image.open(b4), "x", max_bytes=64)
+    check("GIF over byte cap falls back to first frame", not kept4)
+    # a colour that first appears late (per-frame local tables) keeps its hue,
+    # and the caption bar stays pure white
+    from PIL import ImageDraw
+    late = []
+    for i in range(60):
+        im = Image.new("RGB", (240, 180), (30 + i % 7 * 20, 60, 140 - i % 5 * 10))
+        ImageDraw.Draw(im).ellipse([60, 40, 180, 140], fill=(220, 30, 30) if i < 40 else (30, 200, 40))
+        late.append(im)
+    b5 = _io.BytesIO(); late[0].save(b5, format="GIF", save_all=True, append_images=late[1:], duration=40, loop=0)
+    b5.seek(0)
+    out5, kept5 = caption_gif(Image.open(b5), "late colour")
+    res5 = Image.open(out5); W5, H5 = res5.size
+    res5.seek(res5.n_frames - 1); last = res5.convert("RGB")
+    r5, g5, bl5 = last.getpixel((W5 // 2, H5 - 90))
+    check("colour first seen late in the GIF keeps its hue", kept5 and g5 > 150 and r5 < 80 and bl5 < 80)
+    check("caption bar stays pure white", last.getpixel((3, 3)) == (255, 255, 255))
 
 
 def test_media_blocked():
@@ -466,14 +579,13 @@ def test_full_download_streaming():
         async def __aenter__(self): return self
         async def __aexit__(self, *a): return False
     class FakeSession:
-        def __init__(self, *a, **k): pass
-        async def __aenter__(self): return self
-        async def __aexit__(self, *a): return False
         def get(self, *a, **k): return FakeResp()
+    async def fake_get(): return FakeSession()
     async def run():
         bot = commands.Bot(command_prefix="!!", intents=discord.Intents.all())
         cog = UtilitiesCog(bot, None, None)
-        with patch("aiohttp.ClientSession", FakeSession):
+        from core.utilities.sessions import sessions
+        with patch.object(sessions, "get", side_effect=fake_get):
             data = await cog._download_image_bytes("https://media.discordapp.net/x.gif")
         return data
     data = asyncio.run(run())
@@ -494,7 +606,462 @@ def test_youtube_transcript_parsing():
     check("json3 stripped to text", _strip_captions(j) == "foo bar")
 
 
+def test_shared_session():
+    """Providers share one pooled session per loop; close() tears it down."""
+    from core.utilities.sessions import SessionManager, timeout, PROVIDER_TIMEOUTS
+    mgr = SessionManager()
+    async def run():
+        a = await mgr.get(); b = await mgr.get()
+        same = a is b and not a.closed
+        pooled = a.connector.limit_per_host > 0 and a.connector.use_dns_cache
+        await mgr.close()
+        return same, pooled, a.closed
+    same, pooled, closed = asyncio.run(run())
+    check("shared session reused across calls", same)
+    check("connector is pooled with a DNS cache", bool(pooled))
+    check("close() shuts the session", closed)
+    async def fresh():
+        s = await mgr.get(); ok = not s.closed; await mgr.close(); return ok
+    check("new loop gets a fresh session", asyncio.run(fresh()))
+    check("per-provider timeouts", timeout("llm").total == PROVIDER_TIMEOUTS["llm"]
+          and timeout("nope").total != PROVIDER_TIMEOUTS["llm"])
+
+
+def test_map_tiles():
+    """!map tiles: fetched concurrently, cached on disk (LRU + cap), maps memoised."""
+    import io as _io
+    from unittest.mock import patch
+    from core.utilities import providers as P
+    from core.utilities.tilecache import TileCache
+    from core.utilities.sessions import sessions
+    b = _io.BytesIO(); Image.new("RGB", (256, 256), (200, 220, 200)).save(b, format="PNG")
+    tile = b.getvalue()
+    fetched, inflight = [], {"now": 0, "peak": 0}
+    class R:
+        status = 200
+        async def __aenter__(self):
+            inflight["now"] += 1; inflight["peak"] = max(inflight["peak"], inflight["now"])
+            await asyncio.sleep(0.01); return self
+        async def __aexit__(self, *a): inflight["now"] -= 1; return False
+        async def read(self): return tile
+    class S:
+        def get(self, url, **k): fetched.append(url); return R()
+    async def fake_get(): return S()
+    cache = TileCache(root=tempfile.mkdtemp(), max_bytes=len(tile) * 25, ttl=3600)
+    async def run():
+        with patch.object(sessions, "get", side_effect=fake_get), patch.object(P, "tile_cache", cache):
+            P._map_memo.clear()
+            a = await P.static_map_png(47.6, -122.3, 11)
+            n1 = len(fetched)
+            P._map_memo.clear()          # force a re-render from the disk cache
+            b2 = await P.static_map_png(47.6, -122.3, 11)
+            n2 = len(fetched)
+            c = await P.static_map_png(47.6, -122.3, 11)   # memo hit
+            return a, b2, c, n1, n2
+    a, b2, c, n1, n2 = asyncio.run(run())
+    check("map renders PNG from tiles", a and a[:8] == b"\x89PNG\r\n\x1a\n")
+    check("tiles fetched concurrently (bounded)", 1 < inflight["peak"] <= P.TILE_CONCURRENCY)
+    check("cached map renders without network", n2 == n1 and a == b2 == c)
+    for i in range(40):
+        cache.put(3, i, 0, tile)
+    st = cache.stats()
+    check("tile cache stays under its byte cap (LRU)", st["bytes"] <= cache.max_bytes)
+    check("LRU evicts the oldest tiles first", cache.get(3, 39, 0) is not None and cache.get(3, 0, 0) is None)
+    old = TileCache(root=cache.root, max_bytes=cache.max_bytes, ttl=0)
+    check("expired tiles are not served", old.get(3, 39, 0) is None)
+
+
+def test_response_cache():
+    """Provider responses: persistent TTL cache, canonical keys, SWR, size cap."""
+    import time as _time
+    from unittest.mock import patch
+    from core.utilities import providers as P
+    from core.utilities import respcache as RC
+    path = os.path.join(tempfile.mkdtemp(), "responses.sqlite3")
+    calls = []
+    async def fake_geo(place):
+        calls.append(place); return [{"name": place.title(), "lat": 1.0, "lon": 2.0}]
+    async def run(cache):
+        with patch.object(P, "response_cache", cache), patch.object(P, "_geocode", side_effect=fake_geo):
+            a = await P.geocode("Paris")
+            b = await P.geocode("  paris ")
+            return a, b
+    cache = RC.ResponseCache(path=path, max_bytes=1 << 20, enabled=True)
+    a, b = asyncio.run(run(cache))
+    check("repeat geocode served from cache", a == b and len(calls) == 1)
+    cache.close()
+    cache2 = RC.ResponseCache(path=path, max_bytes=1 << 20, enabled=True)
+    a2, _ = asyncio.run(run(cache2))
+    check("cached responses survive a restart", a2 == a and len(calls) == 1)
+    check("url keys ignore tracking params",
+          RC.url_key("https://tenor.com/view/x-1?utm_source=a") == RC.url_key("https://tenor.com/view/x-1"))
+    async def empty():
+        calls.append("empty"); return []
+    async def swr():
+        n = len(calls)
+        await cache2.cached("geocode", "nowhere", empty)
+        await cache2.cached("geocode", "nowhere", empty)
+        misses = len(calls) - n
+        k = cache2._key("geocode", RC.text_key("paris"))
+        v, _f, prov = cache2._memory[k]
+        cache2._memory[k] = (v, _time.time() - RC.PROVIDER_TTLS["geocode"] - 5, prov)
+        async def fresh():
+            calls.append("refresh"); return [{"name": "New"}]
+        stale = await cache2.cached("geocode", RC.text_key("paris"), fresh)
+        await asyncio.sleep(0.05)
+        after = await cache2.cached("geocode", RC.text_key("paris"), fresh)
+        return misses, stale, after
+    misses, stale, after = asyncio.run(swr())
+    check("empty results are never cached", misses == 2)
+    check("stale entry served immediately, refreshed in background",
+          stale == a and after == [{"name": "New"}] and calls.count("refresh") == 1)
+    small = RC.ResponseCache(path=os.path.join(tempfile.mkdtemp(), "r.sqlite3"),
+                             max_bytes=2000, enabled=True)
+    async def fill():
+        for i in range(40):
+            async def f(i=i): return {"text": "x" * 100, "i": i}
+            await small.cached("translate", f"k{i}", f)
+    asyncio.run(fill())
+    check("response cache stays under its byte cap", 0 < small.stats()["bytes"] <= 2000)
+    off = RC.ResponseCache(path=path, enabled=False)
+    async def uncached():
+        await off.cached("geocode", "paris", empty)
+        await off.cached("geocode", "paris", empty)
+    n = len(calls); asyncio.run(uncached())
+    check("disabled cache always fetches", len(calls) - n == 2)
+    cache2.close(); small.close()
+
+
+def test_job_budgets():
+    """JobManager state is LRU-bounded, swept in the background, and reported."""
+    from core.utilities.jobs import JobManager
+    jm = JobManager(max_cooldowns=50, max_cache_entries=8, max_cache_bytes=1000)
+    for uid in range(200):
+        jm.arm_cooldown("t", uid, 30)
+    check("cooldowns capped", len(jm._cooldowns) == 50 and ("t", 199) in jm._cooldowns)
+    jm2 = JobManager(max_cooldowns=10)
+    jm2.arm_cooldown("long", 1, 3600)
+    for uid in range(5):
+        jm2.arm_cooldown("gone", uid, -1)         # already expired
+    for uid in range(100):
+        jm2.arm_cooldown("short", uid, 5)
+    check("cooldown eviction drops expired first, never a longer one for shorter",
+          ("long", 1) in jm2._cooldowns and jm2.evictions == 91
+          and len(jm2._cooldowns) == 10)
+    for i in range(20):
+        jm.cache_put(f"k{i}", b"x" * 10)
+    check("cache entry cap evicts least recently used",
+          jm.stats()["cache_entries"] == 8 and jm.cache_get("k0") is None and jm.cache_get("k19") == b"x" * 10)
+    jm.cache_get("k12")                       # touch -> survives the next evictions
+    for i in range(5):
+        jm.cache_put(f"big{i}", b"y" * 300)
+    st = jm.stats()
+    check("cache byte budget enforced", st["cache_bytes"] <= 1000)
+    jm.cache_put("huge", b"z" * 5000)
+    check("oversized values are not cached", jm.cache_get("huge") is None)
+    check("stats report hit rate and evictions", 0 < st["hit_rate"] < 1 and st["evictions"] > 0)
+    jm2 = JobManager()
+    jm2.arm_cooldown("t", 1, 0); jm2.cache_put("e", "v", ttl=0)
+    async def run():
+        jm2.start_sweeper(interval=0.01)
+        await asyncio.sleep(0.05)
+        jm2.stop_sweeper()
+    time.sleep(0.01); asyncio.run(run())
+    check("background sweeper drops expired entries",
+          not jm2._cooldowns and not jm2._cache and jm2.stats()["cache_bytes"] == 0)
+
+
+def test_image_input():
+    """Image inputs: header sniffing, JPEG reduce-on-decode, still size cap,
+    decompression bombs refused before decoding."""
+    from PIL import Image
+    import io as _io
+    from core.utilities import cards
+    b = _io.BytesIO()
+    Image.new("RGB", (4000, 3000), (120, 30, 200)).save(b, format="JPEG", quality=70)
+    im = cards.open_image(b.getvalue())
+    check("big JPEG decoded small", max(im.size) <= cards.STILL_MAX_SIDE and im.size[0] > im.size[1])
+    b = _io.BytesIO()
+    Image.new("1", (10000, 10000)).save(b, format="PNG")
+    try:
+        cards.open_image(b.getvalue())
+        bomb = False
+    except Image.DecompressionBombError:
+        bomb = True
+    check("decompression bomb refused", bomb and len(b.getvalue()) < 1024 * 1024)
+    try:
+        cards.open_image(b"<!DOCTYPE html><html>nope</html>")
+        sniffed = False
+    except ValueError:
+        sniffed = True
+    check("non-image bytes rejected by header", sniffed
+          and cards.looks_like_markup(b"  <html><body>") and not cards.looks_like_markup(b"GIF89a"))
+    check("webp header sniffed", cards.sniff_image(b"RIFF\x00\x00\x00\x00WEBPVP8 ") == "WEBP")
+    buf = cards.caption_image(Image.new("RGB", (3000, 2000), (9, 9, 9)), "hi")
+    out = Image.open(buf)
+    check("caption of a huge still stays bounded", out.size[0] <= cards.STILL_MAX_SIDE)
+
+
+def test_job_scheduler():
+    """Queued jobs: worker budget, round-robin across guilds, cheap lane first,
+    position updates, cancellation by message id, bounded queues."""
+    from core.utilities.jobs import JobScheduler, BusyError
+
+    async def run():
+        sch = JobScheduler(workers=1, per_guild_queue=2, max_wait=5)
+        order, positions = [], {}
+        gate = asyncio.Event()
+
+        async def job(name, gid, cheap=False, mid=None, hold=None):
+            async def pos(n):
+                positions.setdefault(name, []).append(n)
+            async with sch.run("j", gid, 5, cheap=cheap, message_id=mid, on_position=pos):
+                order.append(name)
+                if hold is not None:
+                    await hold.wait()
+
+        first = asyncio.create_task(job("a1", 1, hold=gate))
+        await asyncio.sleep(0)
+        tasks = [asyncio.create_task(job(n, g, cheap=c, mid=m)) for n, g, c, m in (
+            ("a2", 1, False, None), ("a3", 1, False, 99), ("b1", 2, False, None),
+            ("c1", 3, True, None))]
+        await asyncio.sleep(0.01)
+        busy_ok = sch.stats()["busy"] == 1 and sch.queued() == 4
+        try:
+            await sch.run("j", 1, 5).__aenter__()
+            full_ok = False
+        except BusyError:
+            full_ok = True          # guild 1 already has 2 waiting (the cap)
+        cancelled = sch.cancel_message(99)
+        gate.set()
+        await first
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return busy_ok, full_ok, cancelled, order, positions, sch.stats()
+
+    busy_ok, full_ok, cancelled, order, positions, st = asyncio.run(run())
+    check("scheduler respects the worker budget", busy_ok)
+    check("full guild queue raises BusyError", full_ok)
+    check("deleting the command cancels its queued job", cancelled == 1 and "a3" not in order)
+    check("cheap jobs first, then guilds round-robin", order == ["a1", "c1", "a2", "b1"])
+    check("queued jobs are told their position", positions.get("c1") == [1]
+          and positions.get("b1", [])[-1:] == [1] and len(positions.get("b1", [])) >= 2)
+    check("scheduler drains completely", st["busy"] == 0 and st["queued"] == 0)
+
+    async def timeout():
+        sch = JobScheduler(workers=1, per_guild_queue=3, max_wait=0.05)
+        hold = asyncio.Event()
+        async def holder():
+            async with sch.run("j", 1, 1):
+                await hold.wait()
+        t = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        try:
+            async with sch.run("j", 2, 1):
+                pass
+            ok = False
+        except BusyError:
+            ok = sch.queued() == 0
+        hold.set(); await t
+        return ok
+    check("waiting too long gives up with BusyError", asyncio.run(timeout()))
+
+
+def test_chat_buffer():
+    """!catchup reads a per-channel ring (no history calls) and reuses chunk summaries."""
+    from unittest.mock import patch
+    from core.utilities.chatbuffer import ChatBuffer, chunk_entries, CHUNK_SECONDS
+    from core.utilities import chatbuffer as CB
+    from core.utilities import providers as P
+    from core.utilities.cog import UtilitiesCog
+    import discord
+    from discord.ext import commands
+    buf = ChatBuffer(ring_size=5, max_channels=2)
+    now = time.time()
+    buf._started = now - 10          # pretend we've been listening for a bit
+    for i in range(3):
+        buf.record(1, i, now + i, f"msg {i}")
+    buf.record(1, 99, now, "!rank")
+    check("buffer skips command spam", [e[2] for e in buf.window(1, now - 1)] == ["msg 0", "msg 1", "msg 2"])
+    check("buffer refuses windows older than it saw", buf.window(1, now - 3600) is None)
+    buf.forget(1, 1)
+    check("deleted messages are forgotten", [e[1] for e in buf.window(1, now - 1)] == [0, 2])
+    buf.record(1, 3, now + 3, "msg 3"); buf.record(1, 4, now + 4, "msg 4")
+    buf.forget_many(1, {3, 4})
+    buf.edit(1, 0, "msg 0 (edited)"); buf.edit(1, 2, "")
+    check("purges are forgotten and edits replace or drop the text",
+          [(e[1], e[2]) for e in buf.window(1, now - 1)] == [(0, "msg 0 (edited)")])
+    buf.record(1, 2, now + 2, "msg 2")
+    paused = ChatBuffer(); paused._started = now - 10
+    paused.record(7, 1, now, "before"); paused.pause(7)
+    check("paused channels keep nothing and restart coverage",
+          7 not in paused._rings and paused.window(7, now - 5) is None
+          and paused.covered_since(7) >= now)
+    for i in range(10):
+        buf.record(1, 100 + i, now + 10 + i, f"m{i}")
+    check("ring is bounded; coverage moves forward",
+          len(buf.window(1, buf.covered_since(1))) == 5 and buf.window(1, now - 1) is None)
+    buf.record(2, 1, now, "a"); buf.record(3, 1, now, "b")
+    check("channels are LRU-bounded", len(buf._rings) == 2 and buf.window(1, now - 1) is None)
+    ents = [(0, 1, "a"), (CHUNK_SECONDS + 1, 2, "b"), (CHUNK_SECONDS + 2, 3, "c")]
+    check("entries group into clock-aligned chunks",
+          chunk_entries(ents) == [(0, ["a"]), (CHUNK_SECONDS, ["b", "c"])])
+
+    calls = {"map": 0, "reduce": 0, "history": 0}
+    async def fake_llm(system, user, max_tokens=400):
+        calls["map" if system.startswith("Condense") else "reduce"] += 1
+        return "note one\nnote two"
+    class Hist:
+        def __init__(self, msgs): self.msgs = msgs
+        def __aiter__(self):
+            async def gen():
+                calls["history"] += 1
+                for m in self.msgs: yield m
+            return gen()
+    class Author: bot = False
+    class Msg:
+        def __init__(self, i, ts):
+            self.id = i; self.author = Author(); self.content = f"line {i} " + "x" * 120
+            import datetime as _dt
+            self.created_at = _dt.datetime.fromtimestamp(ts, _dt.timezone.utc)
+    base = (int(time.time()) // CHUNK_SECONDS) * CHUNK_SECONDS - 3 * CHUNK_SECONDS
+    history = [Msg(i, base + i * 20) for i in range(60)]    # ~3 busy chunks
+    class Chan:
+        id = 4242
+        def history(self, **k): return Hist(history)
+    async def run():
+        bot = commands.Bot(command_prefix="!!", intents=discord.Intents.all())
+        cog = UtilitiesCog(bot, None, None)
+        fresh = ChatBuffer()
+        fresh._started = base - 10
+        with patch.object(CB, "chat_buffer", fresh), patch("core.utilities.cog.chat_buffer", fresh), \
+             patch.object(P, "llm_key", return_value="k"), patch.object(P, "llm_complete", side_effect=fake_llm):
+            ents = await cog._recent_entries(Chan(), 60, 400)
+            first = await cog._summarize_window(Chan.id, ents, "1h")
+            after_first = dict(calls)
+            again = await cog._summarize_window(Chan.id, await cog._recent_entries(Chan(), 60, 400), "1h")
+            after_again = dict(calls)
+            for i in range(60, 70):         # new chat lands in the newest chunk only
+                m = Msg(i, base + 3 * CHUNK_SECONDS + i)
+                fresh.record(Chan.id, m.id, m.created_at.timestamp(), m.content)
+            third = await cog._summarize_window(Chan.id, await cog._recent_entries(Chan(), 60, 400), "1h")
+            return first, again, third, after_first, after_again
+    first, again, third, a1, a2 = asyncio.run(run())
+    check("catchup summary produced via map-reduce", first == "note one\nnote two" and a1["map"] >= 2 and a1["reduce"] == 1)
+    check("history read once, then served from the buffer", calls["history"] == 1)
+    check("repeat catchup costs no LLM calls", again == first and a2 == a1)
+    check("overlapping catchup only re-maps the changed chunk",
+          calls["map"] - a2["map"] == 1 and calls["reduce"] - a2["reduce"] == 1)
+
+    from core.utilities import cog as C
+    from core.utilities import health as H
+    busy = [Msg(i, base - 5 * CHUNK_SECONDS + i * CHUNK_SECONDS // 10) for i in range(80)]  # 8 busy chunks
+    class BusyChan:
+        id = 4343
+        def history(self, **k): return Hist(busy)
+    flight = {"now": 0, "peak": 0, "map": 0}
+    async def slow_llm(system, user, max_tokens=400):
+        if system.startswith("Condense"):
+            flight["map"] += 1; flight["now"] += 1
+            flight["peak"] = max(flight["peak"], flight["now"])
+            await asyncio.sleep(0.01)
+            flight["now"] -= 1
+        return "note"
+    async def tripping_llm(system, user, max_tokens=400):
+        if system.startswith("Condense"):
+            flight["map"] += 1
+            await asyncio.sleep(0.01)
+            for _ in range(H.FAILURE_THRESHOLD):
+                reg.breaker("llm").record(False, 1.0, "boom")
+            raise TimeoutError("slow")
+        return "note"
+    reg = H.ProviderHealth()
+    async def fan_out(llm, chan_id):
+        bot = commands.Bot(command_prefix="!!", intents=discord.Intents.all())
+        cog = UtilitiesCog(bot, None, None)
+        fresh = ChatBuffer()
+        fresh._started = base - 10 * CHUNK_SECONDS
+        BusyChan.id = chan_id
+        with patch.object(CB, "chat_buffer", fresh), patch("core.utilities.cog.chat_buffer", fresh), \
+             patch.object(C, "health", reg), \
+             patch.object(P, "llm_key", return_value="k"), patch.object(P, "llm_complete", side_effect=llm):
+            return await cog._summarize_window(chan_id, await cog._recent_entries(BusyChan(), 240, 400), "4h")
+    asyncio.run(fan_out(slow_llm, 4343))
+    check("catchup map step keeps at most MAP_CONCURRENCY chunk calls in flight",
+          flight["map"] >= 8 and flight["peak"] == C.MAP_CONCURRENCY)
+    flight["map"] = 0
+    asyncio.run(fan_out(tripping_llm, 4444))
+    check("catchup map step stops calling the LLM once its breaker opens",
+          flight["map"] == C.MAP_CONCURRENCY)
+
+
+def test_provider_health():
+    """Circuit breakers fail fast, half-open after cooldown; geocoding is hedged."""
+    from unittest.mock import patch
+    from core.utilities import health as H
+    from core.utilities import providers as P
+    reg = H.ProviderHealth()
+    async def boom():
+        async with reg.guard("mymemory"):
+            raise TimeoutError("slow")
+    async def bad_status():
+        async with reg.guard("mymemory") as o:
+            o.fail("HTTP 503")
+    async def good():
+        async with reg.guard("mymemory"):
+            await asyncio.sleep(0)
+    async def run():
+        for _ in range(H.FAILURE_THRESHOLD - 1):
+            try: await boom()
+            except TimeoutError: pass
+        await bad_status()
+        b = reg.breaker("mymemory")
+        opened = b.state == "open"
+        try:
+            await good(); fast = False
+        except H.CircuitOpenError:
+            fast = True
+        b.open_until = 0                      # cooldown elapsed
+        await good()                          # the half-open probe
+        return opened, fast, b.state
+    opened, fast, state = asyncio.run(run())
+    check("breaker opens after repeated failures", opened)
+    check("open breaker fails fast", fast)
+    check("successful half-open probe closes it", state == "closed")
+    snap = reg.snapshot()["mymemory"]
+    check("health readout has errors + latency", snap["errors"] == H.FAILURE_THRESHOLD
+          and snap["rejected"] == 1 and snap["p95_ms"] is not None)
+    hist = H.LatencyHistogram()
+    for ms in [10] * 90 + [3000] * 10:
+        hist.add(ms)
+    check("latency histogram percentiles", hist.percentile(0.5) == 50 and hist.percentile(0.95) == 5000)
+    check("5xx/429 count as outages, 404 doesn't",
+          H.failed_status(503) and H.failed_status(429) and not H.failed_status(404))
+
+    async def slow_osm(place):
+        await asyncio.sleep(2); return [{"display_name": "Slow", "lat": 0.0, "lon": 0.0}]
+    async def fast_meteo(place):
+        return [{"name": "Lyon", "lat": 45.7, "lon": 4.8, "country": "France", "admin1": "Auvergne"}]
+    async def hedge():
+        with patch.object(P, "geocode_osm", side_effect=slow_osm), \
+             patch.object(P, "geocode", side_effect=fast_meteo), \
+             patch.object(P, "_hedge_delay", return_value=0.05):
+            t0 = time.monotonic()
+            res = await P.geocode_hedged("lyon", prefer="nominatim")
+            return res, time.monotonic() - t0
+    res, took = asyncio.run(hedge())
+    check("hedged geocode answers from the backup when the primary stalls",
+          took < 1 and res[0]["display_name"] == "Lyon, Auvergne, France" and res[0]["importance"] > 0.55)
+
+
 def _extra_main():
+    test_image_input()
+    test_job_scheduler()
+    test_provider_health()
+    test_chat_buffer()
+    test_job_budgets()
+    test_response_cache()
+    test_map_tiles()
+    test_shared_session()
     test_xray_logic()
     test_translate_parsing()
     test_catchup_command_filter()
@@ -523,6 +1090,7 @@ if __name__ == "__main__":
         check("concurrency cap works", asyncio.run(test_concurrency()))
         check("temp files cleaned up", test_tempfiles())
         test_ssrf()
+        test_redirect_to_ip_literal()
         test_resolver()
         test_cards()
         test_windows()